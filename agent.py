@@ -1,26 +1,74 @@
 # agent.py
 import torch
 import torch
+import threading
 from pag.model import PAG_Model
 from asc.core import AffectiveStateCore
 from swhor.regulator import SWHoR
 from vigilance.subsystem import VigilanceSubsystem
 from memory.subsystem import MemorySubsystem
-from modulation.functions import modulate_temperature
-from typing import List, Dict, Any
-from perception.subsystem import PerceptionSubsystem
+from modulation.functions import modulate_temperature, calculate_layer_drop_rate, calculate_token_budget
+from typing import List, Dict, Any, Callable, Optional
+
+
+class StreamPrinter:
+    """
+    Gibt eine gestreamte Antwort fortlaufend auf der Konsole aus.
+    Der Präfix erscheint erst mit dem ersten Textstück, damit er nicht
+    zwischen den Status-Ausgaben des Denkprozesses landet.
+    """
+
+    def __init__(self, prefix: str = "Agent > "):
+        self.prefix = prefix
+        self.started = False
+
+    def __call__(self, piece: str):
+        if not self.started:
+            print(self.prefix, end="", flush=True)
+            self.started = True
+        print(piece, end="", flush=True)
+
+    def finish(self, final_answer: str):
+        """Ohne gestreamte Stücke (z.B. leere Antwort) wird die Antwort nachträglich ausgegeben."""
+        if not self.started:
+            print(f"{self.prefix}{final_answer}")
 
 
 class CAPA_Agent:
-    def __init__(self, pag_model: PAG_Model, asc: AffectiveStateCore):
+    SYNTHESIS_TEMPERATURE = 0.5
+    # Die Synthese im Schlaf soll genau einen Satz liefern.
+    SYNTHESIS_MAX_NEW_TOKENS = 64
+    # Die externe Antwort darf länger sein als der interne Gedanke.
+    FINAL_RESPONSE_BUDGET_FACTOR = 2
+    # Nach jeder Synthese werden nahezu identische Erinnerungen zusammengefasst.
+    COMPACT_DURING_SLEEP = True
+
+    def __init__(self, pag_model: PAG_Model, asc: AffectiveStateCore,
+                 memory: Optional[MemorySubsystem] = None, perception=None):
             self.pag = pag_model
             self.asc = asc
             self.swhor = SWHoR()
             self.vigilance = VigilanceSubsystem()
-            self.memory = MemorySubsystem()  # Ruft die korrekte, persistente DB auf
+            # Ohne übergebenes Gedächtnis wird die korrekte, persistente DB aufgerufen.
+            self.memory = memory if memory is not None else MemorySubsystem()
             self.experience_buffer: List[Dict[str, Any]] = []
-            self.perception = PerceptionSubsystem()
+            # Die Wahrnehmung (Kamera, Mikrofon, BLIP, Whisper) wird erst beim ersten Zugriff erstellt.
+            self._perception = perception
             self._previous_y = self.asc.get_state()['y']
+            # Wird gesetzt, um eine laufende gestreamte Inferenz abzubrechen.
+            self._cancel_event = threading.Event()
+
+    @property
+    def perception(self):
+        if self._perception is None:
+            # Erst hier importieren: reine Text-Sitzungen brauchen weder cv2 noch sounddevice.
+            from perception.subsystem import PerceptionSubsystem
+            self._perception = PerceptionSubsystem()
+        return self._perception
+
+    @perception.setter
+    def perception(self, perception):
+        self._perception = perception
 
     def _consolidate_and_synthesize_memories(self):
         print("\n=== BEGINN DER SCHLAFPHASE: KONSOLIDIERUNG & SYNTHESE ===")
@@ -31,8 +79,7 @@ class CAPA_Agent:
 
         print(f"Konsolidiere {len(self.experience_buffer)} Erlebnisse aus dem Kurzzeitgedächtnis...")
         current_state_on_sleep = self.asc.get_state()
-        for experience in self.experience_buffer:
-            self.memory.add_experience(experience['text'], experience['metadata'])
+        self.memory.add_experiences(self.experience_buffer)
 
         print("Kurzzeitgedächtnis erfolgreich ins Langzeitgedächtnis verschoben.")
         self.experience_buffer.clear()
@@ -40,11 +87,40 @@ class CAPA_Agent:
         print("Beginne Synthese-Phase (Träumen)...")
         recent_memories = self.memory.get_latest_memories(n_results=10)
 
+        synthesis_prompt = self._construct_synthesis_prompt(recent_memories)
+
+        # Gestreamt, damit ein gefährlicher Reiz (`handle_stimulus`) das Träumen abbrechen kann.
+        self._cancel_event.clear()
+        learned_lesson = self._infer_streaming(
+            synthesis_prompt, self.SYNTHESIS_TEMPERATURE,
+            {'max_new_tokens': self.SYNTHESIS_MAX_NEW_TOKENS, 'stop_at_sentence_end': True})
+        if self._cancel_event.is_set():
+            print("Synthese abgebrochen: Der Agent wurde geweckt. Die unvollständige Lektion wird verworfen.")
+            print("===================== ENDE DER SCHLAFPHASE =====================")
+            return
+
+        print(f"Synthese abgeschlossen. Gelernte Lektion: '{learned_lesson}'")
+        self.memory.add_experience(
+            learned_lesson,
+            metadata={'type': 'synthesis', 'x': current_state_on_sleep['x'], 'y': current_state_on_sleep['y']}
+        )
+        print("Gelernte Lektion als neue Kern-Erinnerung gespeichert.")
+
+        if self.COMPACT_DURING_SLEEP:
+            print("Kompaktiere das Langzeitgedächtnis (Duplikate zusammenfassen)...")
+            report = self.memory.compact()
+            print(f"Kompaktierung: {report['removed']} Duplikate in {report['clusters']} Clustern entfernt, "
+                  f"{report['bytes_reclaimed'] / 1024:.1f} KB freigegeben, "
+                  f"Abfrage {report['query_ms_before']:.2f} ms -> {report['query_ms_after']:.2f} ms.")
+        print("===================== ENDE DER SCHLAFPHASE =====================")
+
+    def _construct_synthesis_prompt(self, recent_memories: List[Dict[str, Any]]) -> str:
+        """Baut den Prompt für die Synthese-Phase (Träumen) im Schlaf."""
         # KORREKTUR 1: f-string-Syntaxfehler behoben
         memory_texts = [f"- {mem['text']}" for mem in recent_memories]
         memory_list_as_string = "\n".join(memory_texts)
 
-        synthesis_prompt = (
+        return (
             "You are in a sleep state, processing recent memories to find patterns.\n\n"
             "## RECENT EXPERIENCES ##\n"
             f"{memory_list_as_string}\n\n"
@@ -52,16 +128,6 @@ class CAPA_Agent:
             "Analyze these experiences. Summarize the single most important lesson or recurring pattern in one concise sentence. This summary will become a new core memory."
         )
 
-        learned_lesson = self.pag.infer(prompt=synthesis_prompt, temperature=0.5)
-
-        print(f"Synthese abgeschlossen. Gelernte Lektion: '{learned_lesson}'")
-        self.memory.add_experience(
-            learned_lesson,
-            metadata={'type': 'synthesis', 'x': current_state_on_sleep['x'], 'y': current_state_on_sleep['y']}
-        )
-        print("Gelernte Lektion als neue Kern-Erinnerung gespeichert.")
-        print("===================== ENDE DER SCHLAFPHASE =====================")
-
     def _update_arousal_from_valence_change(self):
             """
             FINALE KORREKTUR 2: Diese Methode wurde hinzugefügt.
@@ -81,10 +147,11 @@ class CAPA_Agent:
 
             self._previous_y = current_y
 
-    def update(self, verbose: bool = False, text_override: str = None):
+    def update(self, verbose: bool = False, text_override: str = None, stream: bool = False):
         """
         FINALE ARCHITEKTUR: Die zentrale "Bewusstseins"-Schleife.
         Trennt nun korrekt zwischen wachen und schlafenden Zuständen.
+        Mit stream=True wird die Antwort fortlaufend ausgegeben, während sie entsteht.
         """
         # 1. Autonome, unbewusste Prozesse (Herzschlag, Müdigkeit, Reflexe)
         self._run_background_processes()
@@ -101,19 +168,23 @@ class CAPA_Agent:
             vision_report = self.perception._perceive_vision()
             sound_report = "I hear ambient sounds like: Speech."
             speech_report = f"I hear someone say: '{text_override}'"
-            sensory_report = f"Sensory Input:\n- {vision_report}\n- {sound_report}\n- {speech_report}"
-            print(sensory_report)
+            sensory_report = {"vision": vision_report, "sound": sound_report, "speech": speech_report}
+            print(f"Sensory Input:\n- {vision_report}\n- {sound_report}\n- {speech_report}")
         else:
             sensory_report = self.perception.perceive()
 
-        final_answer, full_prompt = self.run_inference_cycle(sensory_report)
+        printer = StreamPrinter() if stream else None
+        final_answer, full_prompt = self.run_inference_cycle(sensory_report, on_token=printer)
 
         if verbose:
             print("\n" + "=" * 20 + " DEBUG: VOLLSTÄNDIGER PROMPT " + "=" * 20)
             print(full_prompt)
             print("=" * 66 + "\n")
 
-        print(f"Agent > {final_answer}")
+        if printer:
+            printer.finish(final_answer)
+        else:
+            print(f"Agent > {final_answer}")
 
     def _run_background_processes(self):
         """FINALE KORREKTUR: Stellt die korrekte Reihenfolge der Schlaf-Logik sicher."""
@@ -167,13 +238,17 @@ class CAPA_Agent:
         task = f"\nTask: Based on your personality, thought, and memories, what is your immediate, direct response to the user's statement?\nUser's Statement: '{main_situation}'\nYour Response:"
         return f"{persona}\n\n{context}\n\n{task}"
 
-    def run_inference_cycle(self, sensory_data: dict) -> (str, str):
+    def _prepare_inference_cycle(self, sensory_data: dict) -> Dict[str, Any]:
         """
-        FINALE VERSION: Implementiert die Fokus-Logik.
+        Findet den Fokus, ruft Erinnerungen ab und baut den Prompt für den internen Monolog.
+        Gibt einen Zyklus-Kontext zurück, den die Inferenz-Schritte weiterverwenden.
         """
-        print("\n--- Beginn des Zwei-Stufen-Denkprozesses ---")
         current_state = self.asc.get_state()
         temp = modulate_temperature(current_state['x'], current_state['y'])
+        # Bei extremem Arousal überspringt der PAG Decoder-Layer ("Tunnelblick")
+        # und die Gedanken werden kürzer.
+        layer_drop_rate = calculate_layer_drop_rate(current_state['x'])
+        token_budget = calculate_token_budget(current_state['x'], current_state['y'])
 
         # SCHRITT 1: FOKUS FINDEN (Priorisierung der Wahrnehmung)
         vision_text = sensory_data.get("vision", "")
@@ -198,26 +273,168 @@ class CAPA_Agent:
         print(f"[2] Rufe relevante Erinnerungen für den Fokus ab: '{main_situation}'...")
         relevant_memories = self.memory.query_relevant_memories(main_situation, n_results=3)
 
-        # Schritt 3a: Kognitiver Schritt 1 - INTERNER MONOLOG
-        print("[3a] Formuliere internen Gedanken...")
         internal_prompt = self._construct_internal_monologue_prompt(main_situation, context_str, current_state)
-        internal_thought = self.pag.infer(prompt=internal_prompt, temperature=temp)
+        return {
+            'state': current_state,
+            'temperature': temp,
+            'internal_options': {'layer_drop_rate': layer_drop_rate, 'max_new_tokens': token_budget},
+            'final_options': {'layer_drop_rate': layer_drop_rate,
+                              'max_new_tokens': min(127, token_budget * self.FINAL_RESPONSE_BUDGET_FACTOR)},
+            'main_situation': main_situation,
+            'memories': relevant_memories,
+            'internal_prompt': internal_prompt,
+        }
+
+    def _finish_inference_cycle(self, cycle: Dict[str, Any], internal_thought: str, final_answer: str):
+        """Schritt 4 & 5: Aktion & Lernen - legt das Erlebnis im Kurzzeitgedächtnis ab."""
+        print("[5] Kognitiver Prozess abgeschlossen. Erlebnis wird im Puffer gespeichert.")
+        experience_summary = f"In the situation '{cycle['main_situation']}', I thought '{internal_thought}' and responded: '{final_answer}'"
+        # Schon vor dem Konsolidieren im Schlaf über die heiße Stufe des Gedächtnisses auffindbar.
+        memory_id = self.memory.remember_short_term(experience_summary, cycle['state'])
+        self.experience_buffer.append({'id': memory_id, 'text': experience_summary, 'metadata': cycle['state']})
+
+    def _infer_streaming(self, prompt: str, temperature: float, options: Dict[str, Any],
+                         on_token: Optional[Callable[[str], None]] = None) -> str:
+        """
+        Gestreamte, abbrechbare Inferenz; sammelt die Stücke zur vollständigen Antwort.
+        Nach dem letzten Stück erhält `on_token` einen Zeilenumbruch als Abschluss.
+        """
+        pieces = []
+        try:
+            for piece in self.pag.infer_stream(prompt, temperature, cancel_event=self._cancel_event, **options):
+                pieces.append(piece)
+                if on_token:
+                    on_token(piece)
+        finally:
+            if on_token and pieces:
+                on_token("\n")
+        return "".join(pieces).strip()
+
+    def _report_layer_drop(self, layer_drop_rate: float):
+        """Zeigt an, wie viele Decoder-Layer übersprungen wurden und wie viel Zeit das gespart hat."""
+        if layer_drop_rate <= 0:
+            return
+        last_call = self.pag.get_stats().get('last_call') if hasattr(self.pag, 'get_stats') else None
+        if last_call:
+            print(f"[Tunnelblick] {last_call['skipped_layers']}/{last_call['total_layers']} Decoder-Layer übersprungen, "
+                  f"Latenz {last_call['latency_s']:.2f}s, geschätzte Ersparnis {last_call['estimated_savings_s']:.2f}s.")
+
+    def shutdown(self):
+        """Schreibt ausstehende Erinnerungen und gibt Kamera und Mikrofon frei."""
+        try:
+            self.memory.shutdown()
+        finally:
+            # Auch nach einem Schreibfehler Kamera, Mikrofon und Threads freigeben.
+            if self._perception is not None and hasattr(self._perception, 'close'):
+                self._perception.close()
+
+    def cancel_inference(self):
+        """Bricht eine laufende gestreamte Inferenz (auch die Synthese im Schlaf) nach dem aktuellen Token ab."""
+        self._cancel_event.set()
+
+    def run_inference_cycle(self, sensory_data: dict,
+                            on_token: Optional[Callable[[str], None]] = None) -> (str, str):
+        """
+        FINALE VERSION: Implementiert die Fokus-Logik.
+
+        Wird `on_token` übergeben, werden beide Schritte gestreamt und abbrechbar
+        ausgeführt; die Stücke der externen Antwort gehen laufend an `on_token`.
+        """
+        print("\n--- Beginn des Zwei-Stufen-Denkprozesses ---")
+        self._cancel_event.clear()
+        cycle = self._prepare_inference_cycle(sensory_data)
+        temp = cycle['temperature']
+        internal_options, final_options = cycle['internal_options'], cycle['final_options']
+
+        # Schritt 3a: Kognitiver Schritt 1 - INTERNER MONOLOG
+        print(f"[3a] Formuliere internen Gedanken (Budget: {internal_options['max_new_tokens']} Tokens)...")
+        if on_token:
+            internal_thought = self._infer_streaming(cycle['internal_prompt'], temp, internal_options)
+        else:
+            internal_thought = self.pag.infer(prompt=cycle['internal_prompt'], temperature=temp, **internal_options)
+        self._report_layer_drop(internal_options['layer_drop_rate'])
 
         # Schritt 3b: Kognitiver Schritt 2 - EXTERNE ANTWORT
         print("[3b] Formuliere externe Antwort basierend auf dem Gedanken...")
-        final_prompt = self._construct_final_response_prompt(main_situation, internal_thought, relevant_memories)
-        final_answer = self.pag.infer(prompt=final_prompt, temperature=temp)
+        final_prompt = self._construct_final_response_prompt(cycle['main_situation'], internal_thought, cycle['memories'])
+        if on_token:
+            final_answer = self._infer_streaming(final_prompt, temp, final_options, on_token=on_token)
+        else:
+            final_answer = self.pag.infer(prompt=final_prompt, temperature=temp, **final_options)
+        self._report_layer_drop(final_options['layer_drop_rate'])
 
-        # Schritt 4 & 5: Aktion & Lernen
-        print("[5] Kognitiver Prozess abgeschlossen. Erlebnis wird im Puffer gespeichert.")
-        experience_summary = f"In the situation '{main_situation}', I thought '{internal_thought}' and responded: '{final_answer}'"
-        self.experience_buffer.append({'text': experience_summary, 'metadata': current_state})
+        if self._cancel_event.is_set():
+            # Eine abgeschnittene Antwort ist kein Erlebnis, aus dem der Agent lernen soll.
+            print("\n[Agent] Gedankenprozess abgebrochen. Das Erlebnis wird nicht gespeichert.")
+            return final_answer, final_prompt
 
+        self._finish_inference_cycle(cycle, internal_thought, final_answer)
         return final_answer, final_prompt
 
+    @staticmethod
+    def run_inference_cycles_batched(agents: List['CAPA_Agent'], sensory_data: List[dict]) -> List[tuple]:
+        """
+        Führt den Zwei-Stufen-Denkprozess für mehrere Agenten gleichzeitig aus.
+
+        Alle Agenten müssen sich dasselbe PAG_Model teilen. Jeder der beiden
+        Schritte (interner Monolog, externe Antwort) wird für alle Agenten in
+        einem einzigen `infer_batch`-Aufruf erzeugt, jeweils mit der
+        Temperatur aus dem ASC des jeweiligen Agenten.
+
+        Returns:
+            List[tuple]: Ein (final_answer, final_prompt)-Paar pro Agent, in Eingabereihenfolge.
+        """
+        if len(agents) != len(sensory_data):
+            raise ValueError("Für jeden Agenten muss genau ein Sinnes-Input angegeben werden.")
+        if not agents:
+            return []
+        pag = agents[0].pag
+        if any(agent.pag is not pag for agent in agents):
+            raise ValueError("Gebündelte Inferenz erfordert ein gemeinsames PAG_Model.")
+
+        print(f"\n--- Beginn des gebündelten Zwei-Stufen-Denkprozesses ({len(agents)} Agenten) ---")
+        cycles = [agent._prepare_inference_cycle(data) for agent, data in zip(agents, sensory_data)]
+        temperatures = [cycle['temperature'] for cycle in cycles]
+
+        print("[3a] Formuliere interne Gedanken (gebündelt)...")
+        internal_thoughts = CAPA_Agent._infer_batch_grouped(
+            pag, [cycle['internal_prompt'] for cycle in cycles], temperatures,
+            [cycle['internal_options'] for cycle in cycles])
+
+        print("[3b] Formuliere externe Antworten (gebündelt)...")
+        final_prompts = [
+            agent._construct_final_response_prompt(cycle['main_situation'], thought, cycle['memories'])
+            for agent, cycle, thought in zip(agents, cycles, internal_thoughts)
+        ]
+        final_answers = CAPA_Agent._infer_batch_grouped(
+            pag, final_prompts, temperatures, [cycle['final_options'] for cycle in cycles])
+
+        for agent, cycle, thought, answer in zip(agents, cycles, internal_thoughts, final_answers):
+            agent._finish_inference_cycle(cycle, thought, answer)
+        return list(zip(final_answers, final_prompts))
+
+    @staticmethod
+    def _infer_batch_grouped(pag, prompts: List[str], temperatures: List[float],
+                             options: List[Dict[str, Any]]) -> List[str]:
+        """
+        Ein Batch teilt sich Decoder-Tiefe und Token-Budget; daher wird nach
+        identischen Generierungsoptionen gruppiert.
+        """
+        results = [None] * len(prompts)
+        groups: Dict[tuple, List[int]] = {}
+        for i, opts in enumerate(options):
+            groups.setdefault(tuple(sorted(opts.items())), []).append(i)
+        for key, indices in groups.items():
+            outputs = pag.infer_batch([prompts[i] for i in indices], [temperatures[i] for i in indices],
+                                      **dict(key))
+            for i, output in zip(indices, outputs):
+                results[i] = output
+        return results
+
     def handle_stimulus(self, stimulus: dict):
         if self.swhor.is_sleeping:
             is_danger = self.vigilance.filter_stimulus(stimulus)
             if is_danger:
+                self.cancel_inference()
                 self.swhor.interrupt_sleep()
                 self.asc.set_state(x=90, y=-80)
\ No newline at end of file
@@ -6,7 +6,7 @@ import argparse
 # Stellen Sie sicher, dass die Haupt-Module importiert werden können
 sys.path.append('.')
 
-from agent import CAPA_Agent
+from agent import CAPA_Agent, StreamPrinter
 from pag.model import PAG_Model
 from asc.core import AffectiveStateCore
 
@@ -25,6 +25,7 @@ def print_help():
     print("  status                  : Zeigt den aktuellen Zustand des Agenten an.")
     print("  tick <n>                : Simuliert <n> Zeitschritte für interne Systeme.")
     print("  add_mem <text>          : Fügt eine manuelle Erinnerung hinzu.")
+    print("  compact                 : Fasst nahezu identische Erinnerungen zusammen.")
     print("  infer [--verbose] <text>: Startet den Gedankenprozess mit einem Text-Input.")
     print("  reward <wert>           : Erhöht die Valenz (y) um einen Wert.")
     print("  punish <wert>           : Verringert die Valenz (y) um einen Wert.")
@@ -46,6 +47,10 @@ def main():
     pag = PAG_Model()
     asc = AffectiveStateCore()
     agent = CAPA_Agent(pag_model=pag, asc=asc)
+    # Sprach- und Embedding-Modell laden im Hintergrund, während die Arena schon Befehle annimmt.
+    # Die Wahrnehmungsmodelle werden in der Arena nie benötigt und daher nicht geladen.
+    pag.preload()
+    agent.memory.preload()
 
     # Argument-Parser für eine saubere Befehlsverarbeitung
     parser = argparse.ArgumentParser(description="CAPA Arena CLI", add_help=False)
@@ -78,6 +83,7 @@ def main():
     mem_parser = subparsers.add_parser("add_mem", help="Fügt eine manuelle Erinnerung hinzu.")
     mem_parser.add_argument("text", nargs='+', help="Der Text der Erinnerung.")
 
+    subparsers.add_parser("compact", help="Fasst nahezu identische Erinnerungen zusammen.")
     subparsers.add_parser("buffer", help="Zeigt den Inhalt des Kurzzeitgedächtnisses an.")
     view_mem_parser = subparsers.add_parser("view_mem", help="Zeigt Erinnerungen aus dem Langzeitgedächtnis an.")
     view_mem_parser.add_argument("--latest", type=int, nargs='?', const=1, default=None, help="Zeigt die n neuesten Erinnerungen an (Standard: 1).")
@@ -111,6 +117,8 @@ def main():
 
             if args.command == "exit":
                 print("Fahre die Arena herunter. Auf Wiedersehen.")
+                # Eingereihte Erinnerungen werden vor dem Beenden noch geschrieben.
+                agent.shutdown()
                 break
 
             elif args.command == "help":
@@ -150,6 +158,15 @@ def main():
                 current_state = agent.asc.get_state()
                 agent.memory.add_experience(text, metadata=current_state)
 
+            elif args.command == "compact":
+                report = agent.memory.compact()
+                print(f"Erinnerungen: {report['memories_before']} -> {report['memories_after']} "
+                      f"({report['removed']} Duplikate in {report['clusters']} Clustern)")
+                print(f"Speicher: {report['bytes_before'] / 1024:.1f} KB -> {report['bytes_after'] / 1024:.1f} KB "
+                      f"({report['bytes_reclaimed'] / 1024:.1f} KB freigegeben)")
+                print(f"Abfrage: {report['query_ms_before']:.2f} ms -> {report['query_ms_after']:.2f} ms "
+                      f"(Dauer {report['duration_s']:.2f}s)")
+
             elif args.command == "buffer":
                 print(f"--- Kurzzeitgedächtnis ({len(agent.experience_buffer)} Einträge) ---")
                 if not agent.experience_buffer:
@@ -170,15 +187,16 @@ def main():
 
             elif args.command == "infer":
                 situation_text = " ".join(args.text)
-                final_answer, full_prompt = agent.run_inference_cycle(situation_text)
+                # Die Antwort wird fortlaufend ausgegeben, während sie entsteht.
+                printer = StreamPrinter()
+                final_answer, full_prompt = agent.run_inference_cycle({"speech": situation_text}, on_token=printer)
+                printer.finish(final_answer)
 
                 if args.verbose:
                     print("\n" + "=" * 20 + " DEBUG: VOLLSTÄNDIGER PROMPT " + "=" * 20)
                     print(full_prompt)
                     print("=" * 66 + "\n")
 
-                print(f"Agent > {final_answer}")
-
         except Exception as e:
             print(f"Ein unerwarteter Fehler ist aufgetreten: {e}")
 
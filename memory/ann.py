@@ -0,0 +1,269 @@
+# memory/ann.py
+import os
+import threading
+import time
+from typing import Callable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+def spherical_kmeans(vectors: np.ndarray, k: int, iterations: int = 10, seed: int = 0) -> np.ndarray:
+    """
+    k-Means auf normierten Vektoren (Zuordnung über das Skalarprodukt).
+
+    Returns:
+        np.ndarray: (k, dim) normierte Zentroide.
+    """
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), size=k, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = np.argmax(vectors @ centroids.T, axis=1)
+        counts = np.bincount(assignment, minlength=k)
+        # Summen je Zelle über die nach Zelle sortierten Vektoren (deutlich schneller als np.add.at).
+        order = np.argsort(assignment, kind="stable")
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+        sums = np.zeros_like(centroids)
+        filled = counts > 0
+        sums[filled] = np.add.reduceat(vectors[order], starts[filled], axis=0)
+        # Leere Zellen werden mit zufälligen Punkten neu besetzt.
+        empty = counts == 0
+        if empty.any():
+            sums[empty] = vectors[rng.choice(len(vectors), size=int(empty.sum()), replace=False)]
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        centroids = sums / np.where(norms > 0, norms, 1.0)
+    return centroids.astype(np.float32)
+
+
+class IVFIndex:
+    """
+    Invertierter Dateiindex (IVF) für die approximative Suche im Langzeitgedächtnis.
+
+    Die Vektoren werden per k-Means in `nlist` Zellen eingeteilt. Eine Anfrage
+    vergleicht sich zuerst mit den Zentroiden und durchsucht dann nur die
+    `nprobe` nächsten Zellen, also etwa `n * nprobe / nlist` statt n Zeilen.
+    `nprobe` ist der Regler zwischen Recall und Latenz und kann jederzeit
+    geändert werden.
+
+    Neue Zeilen werden sofort ihrer nächsten Zelle zugeordnet. Ist der Speicher
+    seit dem letzten Training um `rebuild_growth` gewachsen, werden die Zentroide
+    in einem Hintergrund-Thread neu trainiert; bis dahin bleibt der alte Index
+    aktiv. Die Vektoren selbst liegen weiterhin beim Backend (`vectors_fn`).
+    """
+
+    def __init__(self, vectors_fn: Callable[[], np.ndarray], path: Optional[str] = None, nlist: Optional[int] = None,
+                 nprobe: int = 8, min_train_size: int = 2048, rebuild_growth: float = 2.0,
+                 train_sample_size: int = 65536):
+        """
+        Args:
+            vectors_fn (Callable): Liefert die aktuelle (normierte) Vektormatrix des Backends.
+            path (str, optional): Datei (.npz) für Zentroide und Zuordnungen. None hält den Index nur im Arbeitsspeicher.
+            nlist (int, optional): Anzahl der Zellen. None wählt bei jedem Training sqrt(n).
+            nprobe (int): Anzahl der pro Anfrage durchsuchten Zellen.
+            min_train_size (int): Ab dieser Größe wird der Index trainiert; darunter wird exakt gesucht.
+            rebuild_growth (float): Wachstumsfaktor seit dem letzten Training, der ein Neutraining auslöst.
+            train_sample_size (int): Maximale Anzahl Zeilen, auf denen k-Means trainiert wird.
+        """
+        self.vectors_fn = vectors_fn
+        self.path = path
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.min_train_size = min_train_size
+        self.rebuild_growth = rebuild_growth
+        self.train_sample_size = train_sample_size
+
+        self.size = 0  # Anzahl bekannter Zeilen (Zeilen sind fortlaufend nummeriert).
+        self.trained_size = 0
+        self.centroids: Optional[np.ndarray] = None
+        self._assignment = np.zeros(0, dtype=np.int32)
+        self._lists: List[np.ndarray] = []
+        self._lock = threading.Lock()
+        # Ein Training zur Zeit; `_rebuilt` ist gesetzt, solange keines läuft.
+        self._rebuilding = False
+        self._rebuilt = threading.Event()
+        self._rebuilt.set()
+        self._rebuild_thread: Optional[threading.Thread] = None
+        self.rebuilds = 0
+        self.last_build_s = 0.0
+        self.queries = 0
+
+    @property
+    def ready(self) -> bool:
+        return self.centroids is not None
+
+    def load(self, size: int) -> bool:
+        """
+        Lädt Zentroide und Zuordnungen von der Festplatte. Zeilen, die nach dem
+        Speichern hinzukamen, werden neu zugeordnet.
+        """
+        if self.path is None or not os.path.exists(self.path):
+            return False
+        try:
+            with np.load(self.path) as data:
+                centroids, assignment = data['centroids'], data['assignment']
+                trained_size = int(data['trained_size'])
+        except (OSError, ValueError, KeyError) as e:
+            print(f"WARNUNG: ANN-Index '{self.path}' ist unlesbar und wird neu trainiert: {e}")
+            return False
+        if len(assignment) > size:
+            return False  # Der Speicher wurde zurückgesetzt.
+        with self._lock:
+            self._install(centroids, assignment, trained_size)
+            self.size = len(assignment)
+        self.add(range(len(assignment), size))
+        return True
+
+    def save(self):
+        if self.path is None or not self.ready:
+            return
+        with self._lock:
+            centroids, assignment, trained_size = self.centroids, self._assignment[:self.size].copy(), self.trained_size
+        tmp_path = self.path + ".tmp.npz"
+        np.savez(tmp_path, centroids=centroids, assignment=assignment, trained_size=trained_size)
+        os.replace(tmp_path, self.path)
+
+    def _install(self, centroids: np.ndarray, assignment: np.ndarray, trained_size: int):
+        """Übernimmt einen fertigen Index (Lock muss gehalten werden)."""
+        order = np.argsort(assignment, kind="stable")
+        bounds = np.searchsorted(assignment[order], np.arange(len(centroids) + 1))
+        self.centroids = centroids
+        self._assignment = assignment.astype(np.int32)
+        self._lists = [order[bounds[i]:bounds[i + 1]] for i in range(len(centroids))]
+        self.trained_size = trained_size
+
+    def _assign(self, vectors: np.ndarray, centroids: np.ndarray, chunk: int = 16384) -> np.ndarray:
+        assignment = np.empty(len(vectors), dtype=np.int32)
+        for start in range(0, len(vectors), chunk):
+            assignment[start:start + chunk] = np.argmax(vectors[start:start + chunk] @ centroids.T, axis=1)
+        return assignment
+
+    def add(self, rows: Sequence[int]):
+        """Ordnet neu eingefügte Zeilen ihren Zellen zu und stößt bei Bedarf ein Neutraining an."""
+        rows = np.asarray(rows, dtype=np.int64)
+        with self._lock:
+            if len(rows):
+                self.size = max(self.size, int(rows[-1]) + 1)
+            if self.ready and len(rows):
+                assignment = self._assign(self.vectors_fn()[rows], self.centroids)
+                if len(self._assignment) < self.size:
+                    self._assignment = np.concatenate(
+                        [self._assignment, np.zeros(max(self.size, 2 * len(self._assignment)) - len(self._assignment), dtype=np.int32)])
+                self._assignment[rows] = assignment
+                for cell in np.unique(assignment):
+                    self._lists[cell] = np.concatenate([self._lists[cell], rows[assignment == cell]])
+            needs_rebuild = self.size >= self.min_train_size and (
+                not self.ready or self.size >= self.trained_size * self.rebuild_growth)
+        if needs_rebuild:
+            self.rebuild(background=True)
+
+    def rebuild(self, background: bool = True) -> Optional[threading.Thread]:
+        """Trainiert die Zentroide neu (standardmäßig im Hintergrund); läuft bereits ein Training, passiert nichts."""
+        with self._lock:
+            if self._rebuilding:
+                return self._rebuild_thread
+            self._rebuilding = True
+            self._rebuilt.clear()
+            thread = threading.Thread(target=self._run_rebuild, args=(True,), name="ivf-rebuild", daemon=True) if background else None
+            self._rebuild_thread = thread
+        if thread is None:
+            self._run_rebuild(background=False)
+            return None
+        thread.start()
+        return thread
+
+    def _run_rebuild(self, background: bool):
+        try:
+            self._rebuild()
+        except Exception as e:
+            # Im Hintergrund-Thread ginge der Fehler sonst unbemerkt verloren.
+            print(f"WARNUNG: Neutraining des ANN-Index fehlgeschlagen, die alten Zellen bleiben aktiv: {e}")
+            if not background:
+                raise
+        finally:
+            with self._lock:
+                self._rebuilding = False
+                self._rebuild_thread = None
+                self._rebuilt.set()
+
+    def _rebuild(self):
+        start = time.perf_counter()
+        with self._lock:
+            n = self.size
+        if n == 0:
+            return
+        vectors = self.vectors_fn()[:n]
+        nlist = min(n, self.nlist or max(1, int(np.sqrt(n))))
+        rng = np.random.default_rng(self.rebuilds)
+        sample = np.asarray(vectors[np.sort(rng.choice(n, size=min(n, self.train_sample_size), replace=False))])
+        centroids = spherical_kmeans(sample, nlist, seed=self.rebuilds)
+        assignment = self._assign(vectors, centroids)
+        with self._lock:
+            # Während des Trainings hinzugekommene Zeilen werden noch zugeordnet.
+            if self.size > n:
+                assignment = np.concatenate([assignment, self._assign(self.vectors_fn()[n:self.size], centroids)])
+            self._install(centroids, assignment, trained_size=n)
+            self.rebuilds += 1
+            self.last_build_s = time.perf_counter() - start
+        print(f"ANN-Index neu trainiert: {n} Einträge, {nlist} Zellen in {self.last_build_s:.2f}s.")
+        self.save()
+
+    def wait_for_rebuild(self, timeout: Optional[float] = None):
+        self._rebuilt.wait(timeout)
+
+    def search(self, query: np.ndarray, k: int, alive: np.ndarray,
+               nprobe: Optional[int] = None) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Sucht die k ähnlichsten lebenden Zeilen in den `nprobe` nächsten Zellen.
+
+        Returns:
+            (rows, scores) absteigend nach Ähnlichkeit, oder None, falls der Index
+            nicht bereit ist oder die Zellen weniger als k lebende Zeilen enthalten.
+        """
+        with self._lock:
+            if not self.ready or k <= 0:
+                return None
+            nprobe = min(nprobe or self.nprobe, len(self.centroids))
+            centroid_scores = self.centroids @ query
+            cells = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe]
+            rows = np.concatenate([self._lists[cell] for cell in cells])
+            self.queries += 1
+        rows = rows[alive[rows]]
+        if len(rows) < k:
+            return None
+        scores = self.vectors_fn()[rows] @ query
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return rows[top], scores[top]
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {
+                'ready': self.ready,
+                'nlist': len(self.centroids) if self.ready else 0,
+                'nprobe': self.nprobe,
+                'indexed_rows': self.size,
+                'trained_size': self.trained_size,
+                'rebuilds': self.rebuilds,
+                'rebuilding': self._rebuilding,
+                'last_build_s': self.last_build_s,
+                'queries': self.queries,
+            }
+
+
+def recall_at_k(backend, queries: Sequence[Sequence[float]], k: int = 10, nprobe: Optional[int] = None) -> float:
+    """
+    Anteil der exakten Top-k, die die approximative Suche ebenfalls findet,
+    gemittelt über alle Anfragen (auf denselben Daten).
+
+    Args:
+        backend: Ein `NumpyBackend` mit aktivem ANN-Index.
+        queries: Die Anfrage-Embeddings.
+        k (int): Anzahl der verglichenen Treffer.
+        nprobe (int, optional): Überschreibt `nprobe` für diese Messung.
+    """
+    found = total = 0
+    for query in queries:
+        exact = set(backend.query(query, n_results=k, exact=True)['ids'])
+        approx = set(backend.query(query, n_results=k, nprobe=nprobe)['ids'])
+        found += len(exact & approx)
+        total += len(exact)
+    return found / total if total else 1.0
@@ -0,0 +1,486 @@
+# memory/backends.py
+import abc
+import json
+import os
+import threading
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from memory.ann import IVFIndex
+from memory.index import AffectIndex
+
+
+def matches_where(metadata: Dict[str, Any], where: Optional[Dict[str, Any]]) -> bool:
+    """
+    Prüft Metadaten gegen einen Filter in Chroma-Syntax, z.B. {"type": "synthesis"},
+    {"seq": {"$gte": 10}} oder {"$and": [...]}.
+    """
+    if not where:
+        return True
+    for key, condition in where.items():
+        if key == "$and":
+            if not all(matches_where(metadata, sub) for sub in condition): return False
+            continue
+        if key == "$or":
+            if not any(matches_where(metadata, sub) for sub in condition): return False
+            continue
+        value = metadata.get(key)
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+        for op, operand in condition.items():
+            if op == "$eq": ok = value == operand
+            elif op == "$ne": ok = value != operand
+            elif op == "$in": ok = value in operand
+            elif op == "$nin": ok = value not in operand
+            elif value is None: ok = False
+            elif op == "$gt": ok = value > operand
+            elif op == "$gte": ok = value >= operand
+            elif op == "$lt": ok = value < operand
+            elif op == "$lte": ok = value <= operand
+            else: raise ValueError(f"Unbekannter Filter-Operator '{op}'.")
+            if not ok: return False
+    return True
+
+
+class MemoryBackend(abc.ABC):
+    """
+    Schnittstelle der Speicher-Backends des Langzeitgedächtnisses.
+
+    `get` und `query` liefern Dictionaries mit flachen Listen unter 'ids',
+    'documents', 'metadatas' (und bei `query` zusätzlich 'distances',
+    aufsteigend sortiert). Die Reihenfolge von `get` ist nicht festgelegt.
+    """
+
+    # Maximale Anzahl an Einträgen pro `add`-Aufruf.
+    max_batch_size = 10000
+    # Bedeutung von 'distances' in `query`: "cosine" (1 - Kosinus) oder "l2" (quadrierter euklidischer Abstand).
+    distance_metric = "cosine"
+
+    @abc.abstractmethod
+    def add(self, ids: List[str], embeddings: List[List[float]], metadatas: List[dict], documents: List[str]):
+        pass
+
+    @abc.abstractmethod
+    def get(self, ids: Optional[List[str]] = None, where: Optional[dict] = None,
+            include_documents: bool = True, include_embeddings: bool = False) -> Dict[str, list]:
+        pass
+
+    @abc.abstractmethod
+    def query(self, embedding: List[float], n_results: int, where: Optional[dict] = None) -> Dict[str, list]:
+        pass
+
+    @abc.abstractmethod
+    def update(self, ids: List[str], metadatas: List[dict]):
+        pass
+
+    @abc.abstractmethod
+    def delete(self, ids: List[str]):
+        pass
+
+    @abc.abstractmethod
+    def count(self) -> int:
+        pass
+
+    @abc.abstractmethod
+    def reset(self):
+        pass
+
+    def compact(self):
+        """Gibt den Platz gelöschter Einträge frei und baut interne Indizes neu auf (optional)."""
+        pass
+
+    def get_stats(self) -> dict:
+        return {}
+
+    def close(self):
+        pass
+
+
+class ChromaBackend(MemoryBackend):
+    """Das bisherige Backend: eine persistente ChromaDB-Collection."""
+
+    # Die Collection wird ohne 'hnsw:space' angelegt, Chroma nutzt dann L2.
+    distance_metric = "l2"
+
+    def __init__(self, path: str, collection_name: str = "capa_memory"):
+        # Erst hier importieren, damit das NumPy-Backend ohne chromadb auskommt.
+        import chromadb
+        from chromadb.config import Settings
+        self.client = chromadb.PersistentClient(path=path, settings=Settings(anonymized_telemetry=False, allow_reset=True))
+        self.collection = self.client.get_or_create_collection(name=collection_name)
+        self.max_batch_size = self.client.max_batch_size
+
+    def add(self, ids, embeddings, metadatas, documents):
+        self.collection.add(ids=ids, embeddings=embeddings, metadatas=metadatas, documents=documents)
+
+    def get(self, ids=None, where=None, include_documents=True, include_embeddings=False):
+        include = ["metadatas"] + (["documents"] if include_documents else []) + (["embeddings"] if include_embeddings else [])
+        results = self.collection.get(ids=ids, where=where, include=include)
+        return {'ids': results['ids'], 'metadatas': results['metadatas'],
+                'documents': results['documents'] if include_documents else None,
+                'embeddings': results['embeddings'] if include_embeddings else None}
+
+    def query(self, embedding, n_results, where=None):
+        results = self.collection.query(query_embeddings=[embedding], n_results=n_results, where=where)
+        if not results['ids']:
+            return {'ids': [], 'documents': [], 'metadatas': [], 'distances': []}
+        return {key: results[key][0] for key in ('ids', 'documents', 'metadatas', 'distances')}
+
+    def update(self, ids, metadatas):
+        self.collection.update(ids=ids, metadatas=metadatas)
+
+    def delete(self, ids):
+        if ids:
+            self.collection.delete(ids=ids)
+
+    def count(self):
+        return self.collection.count()
+
+    def reset(self):
+        self.client.reset()
+
+
+class NumpyBackend(MemoryBackend):
+    """
+    Reines NumPy-Backend für Einzelrechner-Betrieb.
+
+    - vectors.f32: Memory-mapped float32-Matrix der (normierten) Embeddings,
+      eine Zeile pro Erinnerung. Die Kapazität wird bei Bedarf verdoppelt.
+    - log.jsonl: Append-only-Log aller Einfügungen, Metadaten-Änderungen und
+      Löschungen. Beim Start wird es einmal abgespielt; Dokumente bleiben auf
+      der Platte und werden über ihren Datei-Offset gelesen.
+    - vectors.json: Dimension, Kapazität und die Namen der aktuellen Dateien.
+      `compact` schreibt neue Dateien ohne gelöschte Einträge; das Ersetzen
+      dieser Datei schaltet atomar auf sie um.
+
+    Die Suche ist ein vektorisiertes Skalarprodukt (Kosinus-Ähnlichkeit) über
+    alle Zeilen plus `argpartition` für die Top-k. Mit `ann=True` läuft sie
+    stattdessen über einen IVF-Index (siehe `IVFIndex`), sobald genug
+    Erinnerungen für das Training vorhanden sind. Filter auf x, y und type
+    grenzen die Zeilen vorab über einen `AffectIndex` ein; nur diese werden
+    anschließend mit der Anfrage verglichen.
+    """
+
+    INITIAL_CAPACITY = 1024
+
+    def __init__(self, path: str, ann: bool = False, nlist: Optional[int] = None, nprobe: int = 8,
+                 min_train_size: int = 2048):
+        """
+        Args:
+            path (str): Verzeichnis des Speichers.
+            ann (bool): Approximative Suche über einen IVF-Index statt der exakten Suche.
+            nlist, nprobe, min_train_size: Parameter des IVF-Index (siehe `IVFIndex`).
+        """
+        self.path = path
+        if not os.path.exists(path): os.makedirs(path)
+        self._meta_path = os.path.join(path, "vectors.json")
+        self._ann_path = os.path.join(path, "ivf.npz")
+        self._ann_params = {'nlist': nlist, 'nprobe': nprobe, 'min_train_size': min_train_size} if ann else None
+        self._lock = threading.RLock()
+        self._open()
+
+    def _open(self):
+        self.dim: Optional[int] = None
+        self.capacity = 0
+        self.generation = 0
+        self._vectors_path = os.path.join(self.path, "vectors.f32")
+        self._log_path = os.path.join(self.path, "log.jsonl")
+        self._vectors: Optional[np.memmap] = None
+        self._ids: List[str] = []
+        self._row_of: Dict[str, int] = {}
+        self._metadatas: List[Optional[dict]] = []
+        self._doc_offsets: List[int] = []
+        self._alive = np.zeros(0, dtype=bool)
+        self._affect = AffectIndex()
+
+        if os.path.exists(self._meta_path):
+            with open(self._meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            self.dim, self.capacity = meta['dim'], meta['capacity']
+            self.generation = meta.get('generation', 0)
+            self._vectors_path = os.path.join(self.path, meta.get('vectors_file', "vectors.f32"))
+            self._log_path = os.path.join(self.path, meta.get('log_file', "log.jsonl"))
+            self._vectors = np.memmap(self._vectors_path, dtype=np.float32, mode="r+", shape=(self.capacity, self.dim))
+            self._alive = np.zeros(self.capacity, dtype=bool)
+        if os.path.exists(self._log_path):
+            self._replay_log()
+        self._log = open(self._log_path, "ab")
+        self._reader = open(self._log_path, "rb")
+
+        self.ann: Optional[IVFIndex] = None
+        if self._ann_params is not None:
+            self.ann = IVFIndex(lambda: self._vectors, path=self._ann_path, **self._ann_params)
+            if not self.ann.load(len(self._ids)):
+                self.ann.add(range(len(self._ids)))
+
+    def _replay_log(self):
+        offset = 0
+        with open(self._log_path, "rb") as f:
+            for line in f:
+                line_offset, offset = offset, offset + len(line)
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break  # Unvollständige letzte Zeile nach einem Absturz.
+                op = record['op']
+                if op == "add":
+                    row = record['row']
+                    while len(self._ids) <= row:
+                        self._ids.append(None); self._metadatas.append(None); self._doc_offsets.append(-1)
+                    self._ids[row] = record['id']
+                    self._metadatas[row] = record['metadata']
+                    self._doc_offsets[row] = line_offset
+                    self._row_of[record['id']] = row
+                    self._alive[row] = True
+                    self._affect.add(row, record['metadata'])
+                elif op == "update" and record['id'] in self._row_of:
+                    row = self._row_of[record['id']]
+                    self._metadatas[row] = record['metadata']
+                    self._affect.update(row, record['metadata'])
+                elif op == "delete" and record['id'] in self._row_of:
+                    row = self._row_of.pop(record['id'])
+                    self._alive[row] = False
+                    self._affect.remove(row)
+
+    def _ensure_capacity(self, rows: int, dim: int):
+        if self.dim is None:
+            self.dim = dim
+        elif dim != self.dim:
+            raise ValueError(f"Embedding-Dimension {dim} passt nicht zum Speicher ({self.dim}).")
+        if rows <= self.capacity:
+            return
+        capacity = max(self.INITIAL_CAPACITY, self.capacity)
+        while capacity < rows:
+            capacity *= 2
+        if self._vectors is not None:
+            self._vectors.flush()
+        with open(self._vectors_path, "ab") as f:
+            f.truncate(capacity * self.dim * 4)
+        # In einem Schritt ersetzen, nie auf None: ein Neutraining im Hintergrund liest
+        # `_vectors` ohne den Lock und arbeitet dann auf der alten, weiterhin gültigen Abbildung.
+        self._vectors = np.memmap(self._vectors_path, dtype=np.float32, mode="r+", shape=(capacity, self.dim))
+        self._alive = np.concatenate([self._alive, np.zeros(capacity - self.capacity, dtype=bool)])
+        self.capacity = capacity
+        self._write_meta()
+
+    def _write_meta(self):
+        data = {'dim': self.dim, 'capacity': self.capacity, 'generation': self.generation,
+                'vectors_file': os.path.basename(self._vectors_path), 'log_file': os.path.basename(self._log_path)}
+        tmp_path = self._meta_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self._meta_path)
+
+    def _append_log(self, records: Sequence[dict]) -> List[int]:
+        """Hängt Datensätze an das Log an und liefert ihre Datei-Offsets."""
+        offset = self._log.tell()
+        offsets = []
+        lines = []
+        for record in records:
+            line = (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+            offsets.append(offset)
+            offset += len(line)
+            lines.append(line)
+        self._log.write(b"".join(lines))
+        self._log.flush()
+        return offsets
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        return vectors / np.where(norms > 0, norms, 1.0)
+
+    def add(self, ids, embeddings, metadatas, documents):
+        if not ids:
+            return
+        vectors = self._normalize(np.asarray(embeddings, dtype=np.float32).reshape(len(ids), -1))
+        with self._lock:
+            duplicates = [id_ for id_ in ids if id_ in self._row_of]
+            if duplicates:
+                raise ValueError(f"IDs existieren bereits: {duplicates[:3]}")
+            start = len(self._ids)
+            self._ensure_capacity(start + len(ids), vectors.shape[1])
+            # Erst die Vektoren, dann das Log: ein Log-Eintrag verweist nie auf eine ungeschriebene Zeile.
+            self._vectors[start:start + len(ids)] = vectors
+            self._vectors.flush()
+            records = [{'op': 'add', 'id': id_, 'row': start + i, 'metadata': meta, 'document': doc}
+                       for i, (id_, meta, doc) in enumerate(zip(ids, metadatas, documents))]
+            offsets = self._append_log(records)
+            for record, offset in zip(records, offsets):
+                self._ids.append(record['id'])
+                self._metadatas.append(record['metadata'])
+                self._doc_offsets.append(offset)
+                self._row_of[record['id']] = record['row']
+                self._alive[record['row']] = True
+                self._affect.add(record['row'], record['metadata'])
+            if self.ann is not None:
+                self.ann.add(range(start, start + len(ids)))
+
+    def _document(self, row: int) -> str:
+        self._reader.seek(self._doc_offsets[row])
+        return json.loads(self._reader.readline())['document']
+
+    def _rows(self, ids: Optional[List[str]], where: Optional[dict]) -> List[int]:
+        if ids is not None:
+            rows = [self._row_of[id_] for id_ in ids if id_ in self._row_of]
+            if where:
+                rows = [row for row in rows if matches_where(self._metadatas[row], where)]
+            return rows
+        # Bedingungen auf x, y und type beantwortet der Index; nur der Rest wird zeilenweise geprüft.
+        conditions, residual = AffectIndex.split_where(where)
+        candidates = self._affect.candidates(conditions)
+        if candidates is None:
+            rows = np.flatnonzero(self._alive).tolist()
+        else:
+            rows = candidates[self._alive[candidates]].tolist()
+        if residual:
+            rows = [row for row in rows if matches_where(self._metadatas[row], residual)]
+        return rows
+
+    def _collect(self, rows: List[int], include_documents: bool = True) -> Dict[str, list]:
+        return {
+            'ids': [self._ids[row] for row in rows],
+            'metadatas': [dict(self._metadatas[row]) for row in rows],
+            'documents': [self._document(row) for row in rows] if include_documents else None,
+        }
+
+    def get(self, ids=None, where=None, include_documents=True, include_embeddings=False):
+        with self._lock:
+            rows = self._rows(ids, where)
+            results = self._collect(rows, include_documents)
+            results['embeddings'] = None
+            if include_embeddings:
+                results['embeddings'] = np.asarray(self._vectors[rows]) if rows else np.zeros((0, self.dim or 0), np.float32)
+            return results
+
+    def query(self, embedding, n_results, where=None, exact: bool = False, nprobe: Optional[int] = None):
+        """
+        Args:
+            exact (bool): Erzwingt die exakte Suche, auch wenn ein ANN-Index aktiv ist.
+            nprobe (int, optional): Überschreibt `nprobe` des ANN-Index für diese Anfrage.
+        """
+        with self._lock:
+            n = len(self._ids)
+            if n == 0 or self.dim is None:
+                return {'ids': [], 'documents': [], 'metadatas': [], 'distances': []}
+            query = self._normalize(np.asarray(embedding, dtype=np.float32).reshape(-1))
+            found = None
+            if self.ann is not None and not where and not exact:
+                found = self.ann.search(query, min(n_results, self.count()), self._alive, nprobe=nprobe)
+            if found is not None:
+                rows, scores = found
+                results = self._collect(rows.tolist())
+                results['distances'] = (1.0 - scores).tolist()
+                return results
+            if where:
+                rows = np.asarray(self._rows(None, where), dtype=np.int64)
+                scores = self._vectors[rows] @ query
+            else:
+                rows = np.flatnonzero(self._alive[:n])
+                scores = self._vectors[:n] @ query
+                if len(rows) < n:
+                    scores = scores[rows]
+            k = min(n_results, len(rows))
+            if k == 0:
+                return {'ids': [], 'documents': [], 'metadatas': [], 'distances': []}
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top], kind="stable")]
+            results = self._collect(rows[top].tolist())
+            # Kosinus-Distanz, wie bei Chroma aufsteigend sortiert.
+            results['distances'] = (1.0 - scores[top]).tolist()
+            return results
+
+    def update(self, ids, metadatas):
+        with self._lock:
+            pairs = [(id_, meta) for id_, meta in zip(ids, metadatas) if id_ in self._row_of]
+            self._append_log([{'op': 'update', 'id': id_, 'metadata': meta} for id_, meta in pairs])
+            for id_, meta in pairs:
+                self._metadatas[self._row_of[id_]] = meta
+                self._affect.update(self._row_of[id_], meta)
+
+    def delete(self, ids):
+        with self._lock:
+            ids = [id_ for id_ in ids if id_ in self._row_of]
+            self._append_log([{'op': 'delete', 'id': id_} for id_ in ids])
+            for id_ in ids:
+                row = self._row_of.pop(id_)
+                self._alive[row] = False
+                self._affect.remove(row)
+
+    def count(self):
+        return len(self._row_of)
+
+    def get_stats(self):
+        return {'ann': self.ann.get_stats() if self.ann is not None else None}
+
+    def compact(self):
+        """
+        Schreibt Vektoren und Log ohne gelöschte Einträge und ohne überholte
+        Metadaten-Änderungen neu. Die Zeilen werden dabei neu nummeriert, daher
+        wird ein ANN-Index verworfen und neu aufgebaut.
+        """
+        with self._lock:
+            if self.dim is None:
+                return
+            if self.ann is not None:
+                self.ann.wait_for_rebuild()
+            rows = np.flatnonzero(self._alive[:len(self._ids)])
+            generation = self.generation + 1
+            vectors_path = os.path.join(self.path, f"vectors-{generation}.f32")
+            log_path = os.path.join(self.path, f"log-{generation}.jsonl")
+            capacity = self.INITIAL_CAPACITY
+            while capacity < len(rows):
+                capacity *= 2
+
+            vectors = np.memmap(vectors_path, dtype=np.float32, mode="w+", shape=(capacity, self.dim))
+            step = 10000
+            with open(log_path, "wb") as log:
+                for start in range(0, len(rows), step):
+                    chunk = rows[start:start + step]
+                    vectors[start:start + len(chunk)] = self._vectors[chunk]
+                    log.write(b"".join(
+                        (json.dumps({'op': 'add', 'id': self._ids[row], 'row': start + i,
+                                     'metadata': self._metadatas[row], 'document': self._document(row)},
+                                    ensure_ascii=False) + "\n").encode("utf-8")
+                        for i, row in enumerate(chunk.tolist())))
+            vectors.flush()
+            del vectors
+
+            old_paths = [self._vectors_path, self._log_path, self._ann_path]
+            self._close_files()
+            self._vectors_path, self._log_path = vectors_path, log_path
+            self.capacity, self.generation = capacity, generation
+            # Umschalten auf die neuen Dateien; bis hierhin bleibt der alte Stand gültig.
+            self._write_meta()
+            for path in old_paths:
+                if os.path.exists(path): os.remove(path)
+            self._open()
+
+    def reset(self):
+        with self._lock:
+            self.close()
+            for path in (self._vectors_path, self._meta_path, self._log_path, self._ann_path):
+                if os.path.exists(path): os.remove(path)
+            self._open()
+
+    def _close_files(self):
+        if self._vectors is not None:
+            self._vectors.flush()
+            self._vectors = None
+        self._log.close()
+        self._reader.close()
+
+    def close(self):
+        with self._lock:
+            if self.ann is not None:
+                self.ann.wait_for_rebuild()
+                self.ann.save()
+            self._close_files()
+
+
+BACKENDS = {
+    'chroma': ChromaBackend,
+    'numpy': NumpyBackend,
+    'numpy_ivf': lambda path: NumpyBackend(path, ann=True),
+}
@@ -0,0 +1,304 @@
+# memory/benchmark.py
+import argparse
+import multiprocessing
+import resource
+import shutil
+import tempfile
+import time
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+from memory.ann import recall_at_k
+from memory.backends import BACKENDS, NumpyBackend
+from memory.subsystem import MemorySubsystem
+
+DEFAULT_SIZES = (10, 100, 1000)
+DEFAULT_BACKEND_SIZES = (1000, 100000, 1000000)
+DEFAULT_ANN_SIZES = (10000, 100000)
+DEFAULT_FILTER_SIZES = (10000, 100000)
+# Dimension von all-MiniLM-L6-v2.
+EMBEDDING_DIM = 384
+
+
+def _make_experiences(n: int, offset: int = 0) -> List[dict]:
+    """Eindeutige Erlebnisse im Format des Kurzzeitpuffers (keine Cache-Treffer möglich)."""
+    return [
+        {
+            'text': f"In the situation 'I hear someone say: message {offset + i}', I thought 'note {i}' "
+                    f"and responded: 'answer {i}'",
+            'metadata': {'x': float(i % 100), 'y': float(-(i % 50))},
+        }
+        for i in range(n)
+    ]
+
+
+def _timed_insert(experiences: List[dict], bulk: bool) -> float:
+    db_path = tempfile.mkdtemp(prefix="capa_memory_bench_")
+    try:
+        # Ohne Embedding-Cache und synchron, damit beide Pfade jeden Text selbst kodieren müssen.
+        memory = MemorySubsystem(db_path=db_path, embedding_cache_mb=0, write_behind=False)
+        memory.embedding_model.encode("warmup")
+        start = time.perf_counter()
+        if bulk:
+            memory.add_experiences(experiences)
+        else:
+            for experience in experiences:
+                memory.add_experience(experience['text'], experience['metadata'])
+        elapsed = time.perf_counter() - start
+        assert memory.get_memory_count() == len(experiences)
+        return elapsed
+    finally:
+        shutil.rmtree(db_path, ignore_errors=True)
+
+
+def benchmark_consolidation(sizes: Sequence[int] = DEFAULT_SIZES) -> Dict[int, dict]:
+    """
+    Misst die Konsolidierung des Kurzzeitpuffers einzeln (`add_experience` in
+    einer Schleife) gegen gebündelt (`add_experiences`).
+
+    Returns:
+        Dict[int, dict]: Pro Puffergröße die Dauer beider Pfade in Sekunden und den Speedup.
+    """
+    results = {}
+    for n in sizes:
+        experiences = _make_experiences(n)
+        loop_s = _timed_insert(experiences, bulk=False)
+        bulk_s = _timed_insert(experiences, bulk=True)
+        results[n] = {'loop_s': loop_s, 'bulk_s': bulk_s, 'speedup': loop_s / bulk_s if bulk_s > 0 else float('inf')}
+    return results
+
+
+def _rss_mb() -> float:
+    """Aktueller Resident Set Size des Prozesses (Linux), sonst der Spitzenwert."""
+    try:
+        with open("/proc/self/status", "r") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _build_store(backend_name: str, path: str, n: int, dim: int):
+    """Füllt ein Backend mit n zufälligen Erinnerungen (eigener Prozess)."""
+    rng = np.random.default_rng(0)
+    backend = BACKENDS[backend_name](path)
+    step = min(backend.max_batch_size, 10000)
+    for start in range(0, n, step):
+        count = min(step, n - start)
+        backend.add(
+            ids=[f"m{start + i}" for i in range(count)],
+            embeddings=rng.standard_normal((count, dim), dtype=np.float32).tolist(),
+            metadatas=[{'x': float(i % 100), 'y': float(i % 50), 'seq': start + i} for i in range(count)],
+            documents=[f"memory {start + i}" for i in range(count)],
+        )
+    backend.close()
+
+
+def _measure_store(backend_name: str, path: str, dim: int, num_queries: int, results):
+    """Öffnet das Backend neu (eigener Prozess) und misst Startzeit, Abfragelatenz und RSS."""
+    rss_start = _rss_mb()
+    start = time.perf_counter()
+    backend = BACKENDS[backend_name](path)
+    open_s = time.perf_counter() - start
+    rng = np.random.default_rng(1)
+    latencies = []
+    for _ in range(num_queries):
+        query = rng.standard_normal(dim, dtype=np.float32).tolist()
+        start = time.perf_counter()
+        backend.query(query, n_results=3)
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+    results.put({
+        'open_s': open_s,
+        'p50_ms': latencies[len(latencies) // 2],
+        'p99_ms': latencies[min(len(latencies) - 1, int(0.99 * len(latencies)))],
+        'rss_mb': _rss_mb(),
+        'rss_delta_mb': _rss_mb() - rss_start,
+    })
+    backend.close()
+
+
+def benchmark_backends(backends: Sequence[str] = ("chroma", "numpy"), sizes: Sequence[int] = DEFAULT_BACKEND_SIZES,
+                       dim: int = EMBEDDING_DIM, num_queries: int = 100) -> Dict[str, Dict[int, dict]]:
+    """
+    Vergleicht die Speicher-Backends bei wachsender Anzahl von Erinnerungen.
+
+    Aufbau und Messung laufen jeweils in einem eigenen Prozess, damit der
+    RSS-Wert nur das geöffnete Backend plus die Abfragen enthält.
+
+    Returns:
+        Dict[str, Dict[int, dict]]: Pro Backend und Größe die Öffnungszeit,
+                                    p50/p99-Abfragelatenz in ms und RSS in MB.
+    """
+    context = multiprocessing.get_context("spawn")
+    results = {}
+    for backend_name in backends:
+        results[backend_name] = {}
+        for n in sizes:
+            path = tempfile.mkdtemp(prefix=f"capa_{backend_name}_bench_")
+            try:
+                builder = context.Process(target=_build_store, args=(backend_name, path, n, dim))
+                builder.start(); builder.join()
+                queue = context.Queue()
+                measurer = context.Process(target=_measure_store, args=(backend_name, path, dim, num_queries, queue))
+                measurer.start()
+                results[backend_name][n] = queue.get()
+                measurer.join()
+            finally:
+                shutil.rmtree(path, ignore_errors=True)
+    return results
+
+
+def _clustered_embeddings(rng, n: int, dim: int, centers: np.ndarray) -> np.ndarray:
+    """Synthetische Embeddings mit Clusterstruktur; gleichverteiltes Rauschen hätte keine Nachbarschaften."""
+    return (centers[rng.integers(0, len(centers), n)] + 0.5 * rng.standard_normal((n, dim))).astype(np.float32)
+
+
+def _latencies_ms(backend, queries, **kwargs) -> dict:
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        backend.query(query, n_results=10, **kwargs)
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+    return {'p50_ms': latencies[len(latencies) // 2],
+            'p99_ms': latencies[min(len(latencies) - 1, int(0.99 * len(latencies)))]}
+
+
+def benchmark_ann(sizes: Sequence[int] = DEFAULT_ANN_SIZES, nprobes: Sequence[int] = (1, 4, 8, 16, 32),
+                  dim: int = EMBEDDING_DIM, k: int = 10, num_queries: int = 100) -> Dict[int, dict]:
+    """
+    Misst exakte gegen approximative (IVF) Suche im NumPy-Backend auf denselben Daten.
+
+    Returns:
+        Dict[int, dict]: Pro Größe die Trainingsdauer, p50/p99 der exakten Suche
+                         und pro `nprobe` recall@k sowie p50/p99 in ms.
+    """
+    rng = np.random.default_rng(0)
+    centers = rng.standard_normal((max(sizes) // 100, dim))
+    queries = _clustered_embeddings(rng, num_queries, dim, centers).tolist()
+    results = {}
+    for n in sizes:
+        path = tempfile.mkdtemp(prefix="capa_ann_bench_")
+        try:
+            backend = NumpyBackend(path, ann=True)
+            for start in range(0, n, 10000):
+                count = min(10000, n - start)
+                backend.add(ids=[f"m{start + i}" for i in range(count)],
+                            embeddings=_clustered_embeddings(rng, count, dim, centers).tolist(),
+                            metadatas=[{'seq': start + i} for i in range(count)],
+                            documents=[f"memory {start + i}" for i in range(count)])
+                backend.ann.wait_for_rebuild()
+            stats = backend.ann.get_stats()
+            result = {'nlist': stats['nlist'], 'build_s': stats['last_build_s'],
+                      'exact': _latencies_ms(backend, queries, exact=True), 'ann': {}}
+            for nprobe in nprobes:
+                result['ann'][nprobe] = dict(_latencies_ms(backend, queries, nprobe=nprobe),
+                                             recall=recall_at_k(backend, queries, k=k, nprobe=nprobe))
+            results[n] = result
+            backend.close()
+        finally:
+            shutil.rmtree(path, ignore_errors=True)
+    return results
+
+
+def benchmark_filtered_queries(sizes: Sequence[int] = DEFAULT_FILTER_SIZES, dim: int = EMBEDDING_DIM,
+                               num_queries: int = 100) -> Dict[int, Dict[str, dict]]:
+    """
+    Misst ungefilterte gegen nach Affekt/Typ gefilterte Abfragen im NumPy-Backend.
+    Die Zustände sind gleichverteilt über die ASC-Ebene, jede zehnte Erinnerung ist eine Lektion.
+
+    Returns:
+        Dict[int, Dict[str, dict]]: Pro Größe und Filter die Trefferzahl des Filters und p50/p99 in ms.
+    """
+    filters = {
+        'ohne': None,
+        'high_stress': MemorySubsystem.build_affect_filter('high_stress'),
+        'synthesis': MemorySubsystem.build_affect_filter(memory_type='synthesis'),
+        'high_stress+synthesis': MemorySubsystem.build_affect_filter('high_stress', 'synthesis'),
+    }
+    rng = np.random.default_rng(0)
+    queries = rng.standard_normal((num_queries, dim), dtype=np.float32).tolist()
+    results = {}
+    for n in sizes:
+        path = tempfile.mkdtemp(prefix="capa_filter_bench_")
+        try:
+            backend = NumpyBackend(path)
+            for start in range(0, n, 10000):
+                count = min(10000, n - start)
+                states = rng.uniform(-100, 100, (count, 2))
+                metadatas = [{'x': float(x), 'y': float(y), 'seq': start + i} for i, (x, y) in enumerate(states)]
+                for i in range(0, count, 10):
+                    metadatas[i]['type'] = 'synthesis'
+                backend.add(ids=[f"m{start + i}" for i in range(count)],
+                            embeddings=rng.standard_normal((count, dim), dtype=np.float32).tolist(),
+                            metadatas=metadatas, documents=[f"memory {start + i}" for i in range(count)])
+            results[n] = {}
+            for name, where in filters.items():
+                latencies = []
+                for query in queries:
+                    start = time.perf_counter()
+                    backend.query(query, n_results=3, where=where)
+                    latencies.append((time.perf_counter() - start) * 1000)
+                latencies.sort()
+                results[n][name] = {
+                    'matches': len(backend.get(where=where, include_documents=False)['ids']),
+                    'p50_ms': latencies[len(latencies) // 2],
+                    'p99_ms': latencies[min(len(latencies) - 1, int(0.99 * len(latencies)))],
+                }
+            backend.close()
+        finally:
+            shutil.rmtree(path, ignore_errors=True)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks des Langzeitgedächtnisses.")
+    parser.add_argument("mode", nargs='?', default="consolidation", choices=["consolidation", "backends", "ann", "filtered"],
+                        help="consolidation: Schleife vs. Bulk-Einfügen; backends: Chroma vs. NumPy; "
+                             "ann: exakte vs. IVF-Suche; filtered: Abfragen mit Affekt-/Typ-Filter.")
+    parser.add_argument("--sizes", type=int, nargs='+', default=None, help="Die zu messenden Größen.")
+    parser.add_argument("--backends", nargs='+', default=["chroma", "numpy"], choices=sorted(BACKENDS))
+    args = parser.parse_args()
+
+    if args.mode == "filtered":
+        results = benchmark_filtered_queries(args.sizes or DEFAULT_FILTER_SIZES)
+        print("\n" + "=" * 20 + " Gefilterte Abfragen (NumPy-Backend) " + "=" * 20)
+        print(f"{'Einträge':>10}{'Filter':>24}{'Treffer':>10}{'p50 (ms)':>10}{'p99 (ms)':>10}")
+        for n, by_filter in results.items():
+            for name, r in by_filter.items():
+                print(f"{n:>10}{name:>24}{r['matches']:>10}{r['p50_ms']:>10.2f}{r['p99_ms']:>10.2f}")
+        return
+
+    if args.mode == "ann":
+        results = benchmark_ann(args.sizes or DEFAULT_ANN_SIZES)
+        print("\n" + "=" * 20 + " Exakte vs. IVF-Suche (recall@10) " + "=" * 20)
+        print(f"{'Einträge':>10}{'Suche':>12}{'Recall':>8}{'p50 (ms)':>10}{'p99 (ms)':>10}")
+        for n, r in results.items():
+            print(f"{n:>10}{'exakt':>12}{1.0:>8.3f}{r['exact']['p50_ms']:>10.2f}{r['exact']['p99_ms']:>10.2f}")
+            for nprobe, a in r['ann'].items():
+                print(f"{n:>10}{f'nprobe={nprobe}':>12}{a['recall']:>8.3f}{a['p50_ms']:>10.2f}{a['p99_ms']:>10.2f}")
+            print(f"{'':>10}  {r['nlist']} Zellen, Training {r['build_s']:.2f}s")
+        return
+
+    if args.mode == "backends":
+        results = benchmark_backends(args.backends, args.sizes or DEFAULT_BACKEND_SIZES)
+        print("\n" + "=" * 20 + " Gedächtnis-Backends " + "=" * 20)
+        print(f"{'Backend':<8}{'Einträge':>10}{'Öffnen (s)':>12}{'p50 (ms)':>10}{'p99 (ms)':>10}{'RSS (MB)':>10}")
+        for backend_name, by_size in results.items():
+            for n, r in by_size.items():
+                print(f"{backend_name:<8}{n:>10}{r['open_s']:>12.2f}{r['p50_ms']:>10.2f}{r['p99_ms']:>10.2f}{r['rss_mb']:>10.1f}")
+        return
+
+    results = benchmark_consolidation(args.sizes or DEFAULT_SIZES)
+    print("\n" + "=" * 20 + " Konsolidierung: Schleife vs. Bulk " + "=" * 20)
+    print(f"{'Erlebnisse':>10}{'Schleife (s)':>14}{'Bulk (s)':>10}{'Speedup':>10}{'ms/Erlebnis (Bulk)':>20}")
+    for n, r in results.items():
+        print(f"{n:>10}{r['loop_s']:>14.3f}{r['bulk_s']:>10.3f}{r['speedup']:>9.1f}x{1000 * r['bulk_s'] / n:>20.2f}")
+
+
+if __name__ == '__main__':
+    main()
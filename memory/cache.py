@@ -0,0 +1,193 @@
+# memory/cache.py
+import copy
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from pag.cache import LRUCache
+
+
+class EmbeddingCache:
+    """
+    Cache für Satz-Embeddings, geschlüsselt über einen Hash des Textinhalts.
+
+    Identische Texte (wiederholte Nutzeraussagen, Erlebnis-Zusammenfassungen,
+    die im Schlaf erneut eingefügt werden) müssen so nicht noch einmal durch
+    den Encoder. Im Arbeitsspeicher begrenzt ein LRU-Budget die Größe; optional
+    werden alle Embeddings zusätzlich in einer SQLite-Datei abgelegt und
+    überleben damit einen Neustart.
+    """
+
+    def __init__(self, model_name: str = "", max_bytes: int = 32 * 1024 * 1024, path: Optional[str] = None):
+        """
+        Args:
+            model_name (str): Name des Embedding-Modells; fließt in den Schlüssel ein,
+                              damit Vektoren verschiedener Modelle nie vermischt werden.
+            max_bytes (int): Speicherbudget der Vektoren im Arbeitsspeicher.
+            path (str, optional): Pfad zur SQLite-Datei. None hält den Cache nur im Arbeitsspeicher.
+        """
+        self.model_name = model_name
+        self.path = path
+        self._memory = LRUCache(max_bytes=max_bytes, size_fn=lambda vector: vector.nbytes)
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._conn = None
+        if path is not None:
+            directory = os.path.dirname(os.path.abspath(path))
+            if not os.path.exists(directory): os.makedirs(directory)
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)")
+            self._conn.commit()
+
+    def make_key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model_name}\x00{text}".encode("utf-8")).hexdigest()
+
+    def get(self, text: str) -> Optional[np.ndarray]:
+        """Gibt das gespeicherte Embedding zurück (erst RAM, dann Datei) oder None."""
+        key = self.make_key(text)
+        vector = self._memory.get(key)
+        if vector is None and self._conn is not None:
+            with self._lock:
+                row = self._conn.execute("SELECT vector FROM embeddings WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                vector = np.frombuffer(row[0], dtype=np.float32)
+                self._memory.put(key, vector)
+                self.disk_hits += 1
+        if vector is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return vector
+
+    def put_many(self, texts: Sequence[str], vectors: Sequence[np.ndarray]):
+        """Legt mehrere Embeddings ab; die Datei wird in einer einzigen Transaktion geschrieben."""
+        rows = []
+        for text, vector in zip(texts, vectors):
+            key = self.make_key(text)
+            # Eine eigene Kopie: eine Zeile des Batches hielte sonst das ganze Batch-Array am Leben.
+            vector = np.array(vector, dtype=np.float32, copy=True)
+            self._memory.put(key, vector)
+            rows.append((key, vector.tobytes()))
+        if self._conn is not None and rows:
+            with self._lock:
+                self._conn.executemany("INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)", rows)
+                self._conn.commit()
+
+    def put(self, text: str, vector: np.ndarray):
+        self.put_many([text], [vector])
+
+    def encode(self, texts: Sequence[str], encode_fn: Callable[[List[str]], np.ndarray]) -> List[np.ndarray]:
+        """
+        Liefert die Embeddings aller Texte und ruft `encode_fn` nur einmal für
+        die (deduplizierten) Fehlschläge auf.
+
+        Args:
+            texts: Die zu kodierenden Texte.
+            encode_fn: Kodiert eine Liste von Texten zu einem (n, dim)-Array.
+        """
+        vectors: List[Optional[np.ndarray]] = [self.get(text) for text in texts]
+        missing = list(dict.fromkeys(text for text, vector in zip(texts, vectors) if vector is None))
+        if missing:
+            encoded = np.asarray(encode_fn(missing), dtype=np.float32).reshape(len(missing), -1)
+            self.put_many(missing, encoded)
+            by_text = dict(zip(missing, encoded))
+            vectors = [by_text[text] if vector is None else vector for text, vector in zip(texts, vectors)]
+        return vectors
+
+    def get_stats(self) -> dict:
+        """Gibt Trefferquote und Füllstand des Caches zurück."""
+        memory_stats = self._memory.get_stats()
+        lookups = self.hits + self.misses
+        stats = {
+            'entries': memory_stats['entries'],
+            'bytes': memory_stats['bytes'],
+            'max_bytes': memory_stats['max_bytes'],
+            'evictions': memory_stats['evictions'],
+            'hits': self.hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'persisted_entries': None,
+        }
+        if self._conn is not None:
+            with self._lock:
+                stats['persisted_entries'] = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        return stats
+
+    def close(self):
+        if self._conn is not None:
+            with self._lock:
+                self._conn.close()
+            self._conn = None
+
+
+class QueryResultCache:
+    """
+    Cache für die Ergebnisse von `MemorySubsystem.query_relevant_memories`.
+
+    Bei statischem Fokus (z.B. gleichbleibendes Kamerabild) fragt der Agent
+    Tick für Tick mit demselben Text an. Der Schlüssel besteht aus dem
+    Anfragetext, allen Abfrageoptionen und der Generation des Speichers; jede
+    Änderung am Speicher erhöht die Generation (`invalidate`), ältere Einträge
+    treffen danach nie mehr und werden per LRU verdrängt.
+    """
+
+    def __init__(self, max_entries: int = 128):
+        self._results = LRUCache(max_bytes=max_entries, size_fn=lambda _: 1)
+        self.generation = 0
+        self.invalidations = 0
+        self._miss_time_s = 0.0
+        self._hit_time_s = 0.0
+        self._computed = 0
+
+    def invalidate(self):
+        """Markiert alle bisherigen Ergebnisse als veraltet."""
+        self.generation += 1
+        self.invalidations += 1
+
+    def make_key(self, query_text: str, **options: Any) -> Tuple[int, str, str]:
+        return self.generation, query_text, json.dumps(options, sort_keys=True, default=str)
+
+    def get(self, key: Tuple[int, str, str]) -> Optional[List[Dict[str, Any]]]:
+        """Gibt eine Kopie des gespeicherten Ergebnisses zurück oder None."""
+        start = time.perf_counter()
+        results = self._results.get(key)
+        if results is None:
+            return None
+        results = copy.deepcopy(results)
+        self._hit_time_s += time.perf_counter() - start
+        return results
+
+    def put(self, key: Tuple[int, str, str], results: List[Dict[str, Any]], compute_time_s: float):
+        """Legt ein Ergebnis ab; `compute_time_s` ist die Dauer der eigentlichen Abfrage."""
+        self._miss_time_s += compute_time_s
+        self._computed += 1
+        if key[0] == self.generation:
+            self._results.put(key, copy.deepcopy(results))
+
+    def get_stats(self) -> dict:
+        stats = self._results.get_stats()
+        avg_miss_ms = 1000 * self._miss_time_s / self._computed if self._computed else 0.0
+        avg_hit_ms = 1000 * self._hit_time_s / stats['hits'] if stats['hits'] else 0.0
+        return {
+            'entries': stats['entries'],
+            'max_entries': stats['max_bytes'],
+            'hits': stats['hits'],
+            'misses': stats['misses'],
+            'hit_rate': stats['hit_rate'],
+            'generation': self.generation,
+            'invalidations': self.invalidations,
+            'avg_miss_ms': avg_miss_ms,
+            'avg_hit_ms': avg_hit_ms,
+            # Geschätzt: jeder Treffer hätte sonst eine durchschnittliche Abfrage gekostet.
+            'saved_ms': stats['hits'] * (avg_miss_ms - avg_hit_ms),
+        }
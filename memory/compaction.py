@@ -0,0 +1,62 @@
+# memory/compaction.py
+from typing import Hashable, List, Optional, Sequence
+
+import numpy as np
+
+
+def _find(parent: np.ndarray, i: int) -> int:
+    while parent[i] != i:
+        parent[i] = parent[parent[i]]
+        i = parent[i]
+    return i
+
+
+def find_near_duplicates(vectors: np.ndarray, candidates: Sequence[int], threshold: float = 0.95,
+                         groups: Optional[Sequence[Hashable]] = None, block_bytes: int = 64 * 1024 * 1024) -> List[List[int]]:
+    """
+    Gruppiert nahezu identische Embeddings (Kosinus-Ähnlichkeit >= threshold).
+
+    Verglichen wird jeder Kandidat (z.B. die seit der letzten Kompaktierung
+    hinzugekommenen Erinnerungen) mit allen Vektoren, blockweise als
+    Matrixprodukt, damit der Speicherbedarf begrenzt bleibt. Paare über dem
+    Schwellwert werden per Union-Find zu Clustern verbunden.
+
+    Args:
+        vectors: (n, dim) normierte Embeddings.
+        candidates: Indizes der Zeilen, die verglichen werden sollen.
+        threshold (float): Minimale Kosinus-Ähnlichkeit für ein Duplikat.
+        groups: Optional ein Schlüssel pro Zeile; nur Zeilen derselben Gruppe
+                (z.B. desselben Typs) werden zusammengefasst.
+        block_bytes (int): Speicherbudget einer Ähnlichkeitsmatrix.
+
+    Returns:
+        List[List[int]]: Cluster mit mindestens zwei Zeilen, aufsteigend sortiert.
+    """
+    n = len(vectors)
+    candidates = np.asarray(candidates, dtype=np.int64)
+    if n < 2 or len(candidates) == 0:
+        return []
+    group_ids = None
+    if groups is not None:
+        _, group_ids = np.unique(np.asarray([str(g) for g in groups]), return_inverse=True)
+
+    parent = np.arange(n)
+    touched = set()
+    step = max(1, block_bytes // (4 * n))
+    for start in range(0, len(candidates), step):
+        block = candidates[start:start + step]
+        similarities = vectors[block] @ vectors.T
+        similarities[np.arange(len(block)), block] = -1.0  # Keine Paare mit sich selbst.
+        rows, cols = np.nonzero(similarities >= threshold)
+        for row, col in zip(block[rows].tolist(), cols.tolist()):
+            if group_ids is not None and group_ids[row] != group_ids[col]:
+                continue
+            a, b = _find(parent, row), _find(parent, col)
+            if a != b:
+                parent[max(a, b)] = min(a, b)
+                touched.update((row, col))
+
+    clusters = {}
+    for i in sorted(touched):
+        clusters.setdefault(_find(parent, i), []).append(i)
+    return [members for members in clusters.values() if len(members) > 1]
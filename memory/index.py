@@ -0,0 +1,299 @@
+# memory/index.py
+import json
+import os
+import threading
+from collections import deque
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+
+class SequenceIndex:
+    """
+    Kleiner Seitenindex über die Einfügereihenfolge des Langzeitgedächtnisses.
+
+    Jede Erinnerung erhält eine monoton steigende Sequenznummer ('seq' in den
+    Metadaten). Der Index merkt sich die nächste freie Nummer, die Anzahl der
+    Einträge und die IDs der zuletzt eingefügten Erinnerungen. Damit kostet
+    "die neuesten n" nur O(n), unabhängig von der Gesamtgröße des Speichers.
+    Der Index liegt als JSON-Datei neben der Datenbank. Neue Einträge werden nur
+    alle `save_every` Einträge und bei `close` geschrieben; eine nach einem Absturz
+    veraltete Datei erkennt der Aufrufer an `count` und baut den Index neu auf.
+    """
+
+    def __init__(self, path: Optional[str] = None, capacity: int = 1000, save_every: int = 100):
+        """
+        Args:
+            path (str, optional): Pfad zur JSON-Datei. None hält den Index nur im Arbeitsspeicher.
+            capacity (int): Wie viele der neuesten IDs vorgehalten werden.
+            save_every (int): Nach so vielen neuen Einträgen wird die Datei geschrieben.
+        """
+        self.path = path
+        self.capacity = capacity
+        self.save_every = save_every
+        self._unsaved = 0
+        self.next_seq = 0
+        self.count = 0
+        # Erinnerungen ab dieser Nummer hat die Kompaktierung noch nicht gesehen.
+        self.compacted_seq = 0
+        self._recent: "deque[Tuple[int, str]]" = deque(maxlen=capacity)
+        self._lock = threading.Lock()
+        self.loaded = self._load()
+
+    def _load(self) -> bool:
+        """Lädt den Index von der Festplatte. False, falls keine (lesbare) Datei existiert."""
+        if self.path is None or not os.path.exists(self.path):
+            return False
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.next_seq = int(data['next_seq'])
+            self.count = int(data['count'])
+            self.compacted_seq = int(data.get('compacted_seq', 0))
+            self._recent.extend((int(seq), str(id_)) for seq, id_ in data['recent'])
+            return True
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f"WARNUNG: Sequenz-Index '{self.path}' ist unlesbar und wird neu aufgebaut: {e}")
+            return False
+
+    def _save(self):
+        self._unsaved = 0
+        if self.path is None:
+            return
+        data = {'next_seq': self.next_seq, 'count': self.count, 'compacted_seq': self.compacted_seq,
+                'recent': list(self._recent)}
+        # Erst in eine temporäre Datei schreiben, damit ein Absturz den Index nicht halb zurücklässt.
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.path)
+
+    def reserve(self, n: int) -> List[int]:
+        """Vergibt n aufeinanderfolgende Sequenznummern."""
+        with self._lock:
+            seqs = list(range(self.next_seq, self.next_seq + n))
+            self.next_seq += n
+            return seqs
+
+    def record(self, seqs: Iterable[int], ids: Iterable[str]):
+        """Vermerkt erfolgreich eingefügte Erinnerungen; gespeichert wird gesammelt (siehe `save_every`)."""
+        with self._lock:
+            for seq, id_ in sorted(zip(seqs, ids)):
+                self._recent.append((seq, id_))
+                self.count += 1
+                self._unsaved += 1
+            if self._unsaved >= self.save_every:
+                self._save()
+
+    def close(self):
+        """Schreibt noch nicht gespeicherte Einträge."""
+        with self._lock:
+            if self._unsaved:
+                self._save()
+
+    def forget(self, ids: Iterable[str], compacted_seq: Optional[int] = None):
+        """Entfernt gelöschte Erinnerungen aus dem Index und vermerkt optional den Stand der Kompaktierung."""
+        ids = set(ids)
+        with self._lock:
+            kept = [(seq, id_) for seq, id_ in self._recent if id_ not in ids]
+            self.count -= len(ids)
+            self._recent.clear()
+            self._recent.extend(kept)
+            if compacted_seq is not None:
+                self.compacted_seq = compacted_seq
+            self._save()
+
+    def rebuild(self, entries: Iterable[Tuple[int, str]], count: int):
+        """Baut den Index aus (seq, id)-Paaren des gesamten Speichers neu auf."""
+        entries = sorted(entries)
+        with self._lock:
+            self.next_seq = entries[-1][0] + 1 if entries else 0
+            self.count = count
+            self._recent.clear()
+            self._recent.extend(entries[-self.capacity:])
+            self._save()
+
+    def clear(self):
+        """Setzt den Index auf einen leeren Speicher zurück."""
+        with self._lock:
+            self.next_seq = 0
+            self.count = 0
+            self.compacted_seq = 0
+            self._recent.clear()
+            self._save()
+
+    def latest(self, n: int) -> Optional[List[Tuple[int, str]]]:
+        """Die n neuesten (seq, id)-Paare (älteste zuerst) oder None, falls der Index nicht so weit reicht."""
+        with self._lock:
+            if n > len(self._recent):
+                return None
+            return list(self._recent)[len(self._recent) - n:]
+
+
+class AffectIndex:
+    """
+    Metadaten-Index über den affektiven Zustand und den Typ der Erinnerungen.
+
+    Die (x, y)-Ebene des ASC wird in ein Gitter aus Zellen der Kantenlänge
+    `cell_size` geteilt; jede Zelle kennt ihre Zeilen, ebenso jeder Typ
+    (z.B. 'synthesis'). Ein Filter wie "x >= 70" sammelt so nur die Zeilen der
+    überlappenden Zellen ein und prüft die Randzellen anschließend exakt über
+    Spaltenvektoren, statt alle Metadaten durchzugehen.
+    """
+
+    INDEXED_KEYS = ('x', 'y', 'type')
+    RANGE_OPS = ('$eq', '$gt', '$gte', '$lt', '$lte')
+
+    def __init__(self, cell_size: float = 20.0, low: float = -100.0, high: float = 100.0):
+        self.cell_size = cell_size
+        self.low = low
+        self.cells_per_axis = int(np.ceil((high - low) / cell_size))
+        # Mengen statt Listen: Löschen (z.B. beim Kompaktieren) kostet O(1) statt O(Zellgröße).
+        self._cells: Dict[Tuple[int, int], Set[int]] = {}
+        self._by_type: Dict[str, Set[int]] = {}
+        self._arrays: Dict[Any, np.ndarray] = {}  # Zwischengespeicherte Arrays der Listen.
+        self._x = np.zeros(0, dtype=np.float64)
+        self._y = np.zeros(0, dtype=np.float64)
+        self._type_code = np.zeros(0, dtype=np.int32)
+        self._type_codes: Dict[str, int] = {}
+        self._type_names: List[str] = []
+
+    def _cell(self, value: float) -> int:
+        if np.isnan(value):
+            return -1  # Eigene Zelle für Erinnerungen ohne diese Koordinate.
+        return min(self.cells_per_axis - 1, max(0, int((value - self.low) // self.cell_size)))
+
+    @staticmethod
+    def _coordinate(metadata: dict, key: str) -> float:
+        value = metadata.get(key)
+        return float(value) if isinstance(value, (int, float)) and not isinstance(value, bool) else np.nan
+
+    def _grow(self, rows: int):
+        if rows <= len(self._x):
+            return
+        capacity = max(rows, 2 * len(self._x), 1024)
+        extra = capacity - len(self._x)
+        self._x = np.concatenate([self._x, np.full(extra, np.nan)])
+        self._y = np.concatenate([self._y, np.full(extra, np.nan)])
+        self._type_code = np.concatenate([self._type_code, np.full(extra, -1, dtype=np.int32)])
+
+    def _keys(self, row: int) -> List[Any]:
+        keys = []
+        x, y = self._x[row], self._y[row]
+        if not (np.isnan(x) and np.isnan(y)):
+            keys.append(('cell', (self._cell(x), self._cell(y))))
+        if self._type_code[row] >= 0:
+            keys.append(('type', self._type_names[self._type_code[row]]))
+        return keys
+
+    def _lists(self, kind: str) -> dict:
+        return self._cells if kind == 'cell' else self._by_type
+
+    def add(self, row: int, metadata: dict):
+        self._grow(row + 1)
+        self._x[row] = self._coordinate(metadata, 'x')
+        self._y[row] = self._coordinate(metadata, 'y')
+        memory_type = metadata.get('type')
+        if isinstance(memory_type, str):
+            if memory_type not in self._type_codes:
+                self._type_codes[memory_type] = len(self._type_names)
+                self._type_names.append(memory_type)
+            self._type_code[row] = self._type_codes[memory_type]
+        for kind, key in self._keys(row):
+            self._lists(kind).setdefault(key, set()).add(row)
+            self._arrays.pop((kind, key), None)
+
+    def remove(self, row: int):
+        if row >= len(self._x):
+            return
+        for kind, key in self._keys(row):
+            self._lists(kind)[key].discard(row)
+            self._arrays.pop((kind, key), None)
+        self._x[row] = self._y[row] = np.nan
+        self._type_code[row] = -1
+
+    def update(self, row: int, metadata: dict):
+        self.remove(row)
+        self.add(row, metadata)
+
+    def _array(self, kind: str, key: Any) -> np.ndarray:
+        array = self._arrays.get((kind, key))
+        if array is None:
+            members = self._lists(kind).get(key, ())
+            array = np.fromiter(members, dtype=np.int64, count=len(members))
+            self._arrays[(kind, key)] = array
+        return array
+
+    @classmethod
+    def split_where(cls, where: Optional[dict]) -> Tuple[List[Tuple[str, str, Any]], Optional[dict]]:
+        """
+        Zerlegt einen Filter in Chroma-Syntax in indexierbare Bedingungen
+        (key, op, operand) auf x, y und type und einen Rest-Filter.
+        Nur UND-verknüpfte Bedingungen sind indexierbar.
+        """
+        conditions, residual = [], []
+        pending = [where] if where else []
+        while pending:
+            clause = pending.pop()
+            for key, condition in clause.items():
+                if key == "$and":
+                    pending.extend(condition)
+                    continue
+                if key in cls.INDEXED_KEYS:
+                    ops = condition if isinstance(condition, dict) else {"$eq": condition}
+                    allowed = ("$eq", "$in") if key == 'type' else cls.RANGE_OPS
+                    if all(op in allowed for op in ops):
+                        conditions.extend((key, op, operand) for op, operand in ops.items())
+                        continue
+                residual.append({key: condition})
+        if not residual:
+            return conditions, None
+        return conditions, residual[0] if len(residual) == 1 else {"$and": residual}
+
+    def candidates(self, conditions: List[Tuple[str, str, Any]]) -> Optional[np.ndarray]:
+        """
+        Alle Zeilen, die die indexierbaren Bedingungen exakt erfüllen (aufsteigend
+        sortiert), oder None ohne indexierbare Bedingung.
+        """
+        if not conditions:
+            return None
+        # Werte außerhalb des Gitters liegen in den Randzellen; die Grenzen werden entsprechend geklemmt.
+        high = self.low + self.cells_per_axis * self.cell_size
+        bounds = {'x': [self.low, high], 'y': [self.low, high]}
+        types = None
+        for key, op, operand in conditions:
+            if key == 'type':
+                names = {operand} if op == "$eq" else set(operand)
+                types = names if types is None else types & names
+            else:
+                if op in ("$eq", "$gt", "$gte"): bounds[key][0] = min(high, max(bounds[key][0], float(operand)))
+                if op in ("$eq", "$lt", "$lte"): bounds[key][1] = max(self.low, min(bounds[key][1], float(operand)))
+
+        # Die kleinere Quelle liefert die Kandidaten: Typ-Listen oder die überlappenden Gitterzellen.
+        sources = []
+        if types is not None:
+            sources.append([self._array('type', name) for name in types])
+        constrained = {key for key, _, _ in conditions}
+        if constrained & {'x', 'y'}:
+            # Eine unbeschränkte Achse schließt auch Erinnerungen ohne diese Koordinate ein (Zelle -1).
+            xs = range(self._cell(bounds['x'][0]) if 'x' in constrained else -1, self._cell(bounds['x'][1]) + 1)
+            ys = range(self._cell(bounds['y'][0]) if 'y' in constrained else -1, self._cell(bounds['y'][1]) + 1)
+            sources.append([self._array('cell', (i, j)) for i in xs for j in ys if (i, j) in self._cells])
+        arrays = min(sources, key=lambda source: sum(len(array) for array in source))
+        rows = np.sort(np.concatenate(arrays)) if arrays else np.zeros(0, dtype=np.int64)
+
+        mask = np.ones(len(rows), dtype=bool)
+        for key, op, operand in conditions:
+            if key == 'type':
+                codes = [self._type_codes[name] for name in ([operand] if op == "$eq" else operand)
+                         if name in self._type_codes]
+                mask &= np.isin(self._type_code[rows], codes)
+                continue
+            column = (self._x if key == 'x' else self._y)[rows]
+            with np.errstate(invalid="ignore"):
+                if op == "$eq": mask &= column == operand
+                elif op == "$gt": mask &= column > operand
+                elif op == "$gte": mask &= column >= operand
+                elif op == "$lt": mask &= column < operand
+                elif op == "$lte": mask &= column <= operand
+        return rows[mask]
@@ -1,60 +1,541 @@
-import chromadb
-from chromadb.config import Settings
-from sentence_transformers import SentenceTransformer
 import uuid
 import os
-from typing import List, Dict, Any
+import threading
+import time
+from contextlib import nullcontext
+from typing import List, Dict, Any, Optional, Union
+
+import numpy as np
+
+from memory.backends import BACKENDS, MemoryBackend
+from memory.cache import EmbeddingCache, QueryResultCache
+from memory.compaction import find_near_duplicates
+from memory.index import SequenceIndex
+from memory.tiers import HotTier
+from memory.writer import WriteBehindQueue
+from registry.models import default_registry
+
+
+def load_sentence_transformer(model_name: str):
+    # Der Import allein dauert mehrere Sekunden und erfolgt daher erst beim Laden.
+    from sentence_transformers import SentenceTransformer
+    print(f"Lade Embedding-Modell: {model_name}...")
+    return SentenceTransformer(model_name)
 
 
 class MemorySubsystem:
     DEFAULT_DB_PATH = "./capa_memory_db"
-    def __init__(self, db_path: str = None):
+    EMBEDDING_MODEL_NAME = 'all-MiniLM-L6-v2'
+    # Benannte Bereiche der ASC-Ebene für `query_relevant_memories(affect_region=...)`.
+    AFFECT_REGIONS = {
+        'high_stress': {'x': (60.0, 100.0)},
+        'calm': {'x': (-100.0, -20.0)},
+        'positive': {'y': (30.0, 100.0)},
+        'negative': {'y': (-100.0, -30.0)},
+    }
+    # Maximaler Abstand zweier Zustände auf der ASC-Ebene (Diagonale von [-100, 100]²).
+    MAX_AFFECT_DISTANCE = 200.0 * 2 ** 0.5
+    # Ab dieser Kosinus-Ähnlichkeit gelten zwei Erinnerungen als Duplikat.
+    COMPACTION_SIMILARITY = 0.95
+    # Ab so vielen Abrufen wird eine Erinnerung aus dem Backend in die heiße Stufe übernommen.
+    PROMOTE_AFTER_RECALLS = 2
+
+    def __init__(self, db_path: str = None, embedding_cache_mb: float = 32.0, persist_embedding_cache: bool = False,
+                 backend: Union[str, MemoryBackend] = "chroma", write_behind: bool = True, hot_tier_size: int = 256,
+                 query_cache_size: int = 128):
+        """
+        Args:
+            db_path (str, optional): Pfad der Datenbank.
+            embedding_cache_mb (float): Speicherbudget des Embedding-Caches in MB. 0 deaktiviert den Cache.
+            persist_embedding_cache (bool): Legt die Embeddings zusätzlich in `db_path` ab,
+                                            damit sie einen Neustart überleben.
+            backend (str | MemoryBackend): "chroma" (Standard), "numpy" (In-Process-Index
+                                           ohne Datenbank, siehe `NumpyBackend`), "numpy_ivf"
+                                           (dasselbe mit approximativer IVF-Suche) oder eine eigene Instanz.
+            write_behind (bool): Einfügen kehrt sofort zurück; Embedding und Schreiben übernimmt
+                                 ein Hintergrund-Thread in Stapeln (siehe `flush`).
+            hot_tier_size (int): Größe der heißen Stufe im Arbeitsspeicher (siehe `HotTier`). 0 deaktiviert sie.
+            query_cache_size (int): Anzahl gecachter Abfrageergebnisse (siehe `QueryResultCache`). 0 deaktiviert den Cache.
+        """
         self.db_path = db_path if db_path is not None else self.DEFAULT_DB_PATH
         print(f"Initialisiere Gedächtnis-Subsystem am Pfad: {self.db_path}...")
-        self.embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
+        # Das Embedding-Modell wird über das Register geteilt und erst bei Bedarf geladen.
+        self._embedding_key = ("sentence_transformer", self.EMBEDDING_MODEL_NAME)
+        default_registry.register(self._embedding_key, lambda: load_sentence_transformer(self.EMBEDDING_MODEL_NAME))
         if not os.path.exists(self.db_path): os.makedirs(self.db_path)
-        self.client = chromadb.PersistentClient(path=self.db_path, settings=Settings(anonymized_telemetry=False, allow_reset=True))
-        self.collection = self.client.get_or_create_collection(name="capa_memory")
-        print(f"Gedächtnis-Subsystem bereit. Datenbank-Einträge: {self.collection.count()}")
+        # Identische Texte (Anfragen wie Einträge) laufen nur einmal durch den Encoder.
+        self.embedding_cache = None
+        if embedding_cache_mb > 0:
+            cache_path = os.path.join(self.db_path, "embedding_cache.sqlite") if persist_embedding_cache else None
+            self.embedding_cache = EmbeddingCache(model_name=self.EMBEDDING_MODEL_NAME,
+                                                  max_bytes=int(embedding_cache_mb * 1024 * 1024), path=cache_path)
+        if isinstance(backend, str):
+            if backend not in BACKENDS:
+                raise ValueError(f"Unbekanntes Gedächtnis-Backend '{backend}'. Erlaubt: {sorted(BACKENDS)}")
+            backend = BACKENDS[backend](self.db_path)
+        self.backend = backend
+        # Einfügereihenfolge: 'seq' in den Metadaten plus ein kleiner Seitenindex der neuesten IDs.
+        self.sequence_index = SequenceIndex(path=os.path.join(self.db_path, "seq_index.json"))
+        if not self.sequence_index.loaded or self.sequence_index.count != self.backend.count():
+            self._rebuild_sequence_index()
+        self.writer = WriteBehindQueue(self._prepare_entries, self._commit_entries) if write_behind else None
+        # Zwei Stufen: jüngste und häufig abgerufene Erinnerungen im Arbeitsspeicher, alles andere im Backend.
+        self.hot_tier = HotTier(hot_tier_size, metric=self.backend.distance_metric) if hot_tier_size > 0 else None
+        # Solange die heiße Stufe jede Erinnerung gesehen und keine verdrängt hat, ist das Backend eine Teilmenge davon.
+        self._hot_tier_complete = self.backend.count() == 0
+        self._recall_counts: Dict[str, int] = {}
+        self.tier_stats = {'queries': 0, 'served_from_hot': 0, 'hot_results': 0, 'cold_results': 0, 'promotions': 0}
+        self.query_cache = QueryResultCache(query_cache_size) if query_cache_size > 0 else None
+        print(f"Gedächtnis-Subsystem bereit. Datenbank-Einträge: {self.backend.count()}")
+
+    def _rebuild_sequence_index(self):
+        """
+        Einmaliger O(n)-Durchlauf, falls der Index fehlt oder veraltet ist.
+        Alte Erinnerungen ohne 'seq' erhalten ihre Nummer in der bisherigen Rückgabereihenfolge.
+        """
+        results = self.backend.get(include_documents=False)
+        entries, legacy_ids, legacy_metas = [], [], []
+        for id_, meta in zip(results['ids'], results['metadatas']):
+            meta = meta or {}
+            if isinstance(meta.get('seq'), int):
+                entries.append((meta['seq'], id_))
+            else:
+                legacy_ids.append(id_)
+                legacy_metas.append(meta)
+        next_seq = max((seq for seq, _ in entries), default=-1) + 1
+        if legacy_ids:
+            print(f"Vergebe Sequenznummern für {len(legacy_ids)} ältere Erinnerungen...")
+            legacy_metas = [dict(meta, seq=next_seq + i) for i, meta in enumerate(legacy_metas)]
+            self.backend.update(legacy_ids, legacy_metas)
+            entries += [(meta['seq'], id_) for id_, meta in zip(legacy_ids, legacy_metas)]
+        self.sequence_index.rebuild(entries, count=len(results['ids']))
+
+    @property
+    def embedding_model(self):
+        return default_registry.get(self._embedding_key)
+
+    def preload(self, background: bool = True) -> Optional[threading.Thread]:
+        """Lädt das Embedding-Modell vorab, standardmäßig in einem Hintergrund-Thread."""
+        return default_registry.preload([self._embedding_key], background=background)
+
+    def _embed(self, text: str) -> List[float]:
+        """Embedding eines Textes, über den Embedding-Cache, falls aktiv."""
+        if self.embedding_cache is None:
+            return self.embedding_model.encode(text).tolist()
+        return self.embedding_cache.encode([text], lambda texts: self.embedding_model.encode(texts))[0].tolist()
+
+    def _embed_many(self, texts: List[str]) -> List[List[float]]:
+        """Embeddings mehrerer Texte mit höchstens einem gebündelten Encoder-Aufruf."""
+        if self.embedding_cache is None:
+            return self.embedding_model.encode(texts).tolist()
+        return [v.tolist() for v in self.embedding_cache.encode(texts, lambda misses: self.embedding_model.encode(misses))]
+
+    def get_stats(self) -> dict:
+        return {'embedding_cache': self.embedding_cache.get_stats() if self.embedding_cache else None,
+                'backend': self.backend.get_stats(),
+                'write_behind': self.writer.get_stats() if self.writer else None,
+                'tiers': self.get_tier_stats(),
+                'query_cache': self.query_cache.get_stats() if self.query_cache else None}
+
+    def _invalidate_queries(self):
+        """Jede Änderung am Speicher macht gecachte Abfrageergebnisse ungültig."""
+        if self.query_cache is not None:
+            self.query_cache.invalidate()
+
+    def get_tier_stats(self) -> dict:
+        """Anteil der Treffer aus der heißen und der kalten Stufe sowie Abfragen ganz ohne Backend."""
+        stats = dict(self.tier_stats)
+        results = stats['hot_results'] + stats['cold_results']
+        stats['hot_hit_rate'] = stats['hot_results'] / results if results else 0.0
+        stats['cold_hit_rate'] = stats['cold_results'] / results if results else 0.0
+        stats['hot_tier'] = self.hot_tier.get_stats() if self.hot_tier else None
+        return stats
+
+    def flush(self):
+        """Wartet, bis alle eingereihten Erinnerungen geschrieben sind (Barriere für den Schreibpuffer)."""
+        if self.writer is not None:
+            self.writer.flush()
 
     def shutdown(self):
         print("Shutting down memory subsystem.")
+        try:
+            if self.writer is not None:
+                pending = len(self.writer.pending)
+                if pending:
+                    print(f"Schreibe {pending} ausstehende Erinnerungen...")
+                self.writer.close()
+        except Exception as e:
+            print(f"WARNUNG: Der Schreibpuffer wurde mit einem Fehler geschlossen: {e}")
+            raise
+        finally:
+            # Index, Cache und Backend werden auch nach einem Schreibfehler sauber geschlossen.
+            self.sequence_index.close()
+            if self.embedding_cache is not None:
+                self.embedding_cache.close()
+            self.backend.close()
 
     def reset_database_for_testing(self):
         if "test" not in self.db_path: raise PermissionError("Reset ist nur im Test-Modus erlaubt.")
-        self.client.reset()
+        self.flush()
+        self.backend.reset()
+        self.sequence_index.clear()
+        self._recall_counts.clear()
+        self._invalidate_queries()
+        if self.hot_tier is not None:
+            self.hot_tier = HotTier(self.hot_tier.capacity, metric=self.backend.distance_metric)
+        self._hot_tier_complete = True
+
+    def _prepare_entries(self, entries: List[Dict[str, Any]]) -> List[List[float]]:
+        """Embeddings eines Stapels in einem gebündelten `encode`-Aufruf."""
+        return self._embed_many([entry['text'] for entry in entries])
+
+    def _commit_entries(self, entries: List[Dict[str, Any]], embeddings: List[List[float]]):
+        """Schreibt einen Stapel ins Backend; die Backends begrenzen die Anzahl der Einträge pro Aufruf."""
+        step = self.backend.max_batch_size
+        for start in range(0, len(entries), step):
+            chunk = entries[start:start + step]
+            self.backend.add(
+                ids=[entry['id'] for entry in chunk],
+                embeddings=embeddings[start:start + step],
+                metadatas=[entry['metadata'] for entry in chunk],
+                documents=[entry['text'] for entry in chunk]
+            )
+            self.sequence_index.record([entry['metadata']['seq'] for entry in chunk], [entry['id'] for entry in chunk])
+        if self.hot_tier is not None:
+            self.hot_tier.set_embeddings([entry['id'] for entry in entries], embeddings)
+
+    def remember_short_term(self, text_description: str, metadata: dict) -> str:
+        """
+        Macht ein Erlebnis aus dem Kurzzeitpuffer sofort auffindbar (nur in der
+        heißen Stufe, nichts wird geschrieben). Die zurückgegebene ID gehört in
+        das Erlebnis ('id'), damit es beim Konsolidieren dieselbe Erinnerung bleibt.
+        """
+        id_ = str(uuid.uuid4())
+        if self.hot_tier is not None:
+            self.hot_tier.add(id_, text_description, metadata, pinned=True)
+            self._invalidate_queries()
+        return id_
+
+    def _store(self, experiences: List[Dict[str, Any]]):
+        self._invalidate_queries()
+        seqs = self.sequence_index.reserve(len(experiences))
+        # Kopie: die Metadaten des Aufrufers (z.B. der ASC-Zustand) bleiben unverändert.
+        entries = [{'id': experience.get('id') or str(uuid.uuid4()), 'text': experience['text'],
+                    'metadata': dict(experience['metadata'], seq=seq)}
+                   for experience, seq in zip(experiences, seqs)]
+        if self.hot_tier is not None:
+            # Jüngste Erinnerungen sind ab sofort (auch vor dem Schreiben) in der heißen Stufe auffindbar.
+            if len(entries) > self.hot_tier.capacity:
+                self._hot_tier_complete = False
+            for entry in entries[-self.hot_tier.capacity:]:
+                self.hot_tier.add(entry['id'], entry['text'], entry['metadata'])
+            self.hot_tier.unpin([entry['id'] for entry in entries])
+        if self.writer is not None:
+            self.writer.submit(entries)
+        else:
+            self._commit_entries(entries, self._prepare_entries(entries))
 
     def add_experience(self, text_description: str, metadata: dict):
-        embedding = self.embedding_model.encode(text_description).tolist()
-        unique_id = str(uuid.uuid4())
-        self.collection.add(
-            ids=[unique_id],
-            embeddings=[embedding],
-            metadatas=[metadata],
-            documents=[text_description]
-        )
-
-    def query_relevant_memories(self, query_text: str, n_results: int = 3) -> List[Dict[str, Any]]:
-        if self.collection.count() == 0: return []
-        query_embedding = self.embedding_model.encode(query_text).tolist()
-        results = self.collection.query(query_embeddings=[query_embedding], n_results=n_results)
-        formatted_results = []
-        if results['documents']:
-            for text, meta in zip(results['documents'][0], results['metadatas'][0]):
-                formatted_results.append({'text': text, 'metadata': meta})
-        return formatted_results
+        self._store([{'text': text_description, 'metadata': metadata}])
+
+    def add_experiences(self, experiences: List[Dict[str, Any]]):
+        """
+        Fügt mehrere Erlebnisse auf einmal ein (z.B. den Kurzzeitpuffer im Schlaf).
+
+        Alle Texte werden in einem einzigen, gebündelten `encode`-Aufruf kodiert
+        und in einem `add` des Backends geschrieben, statt pro Erlebnis einen
+        Encoder-Durchlauf und eine Transaktion zu bezahlen.
+
+        Args:
+            experiences: Einträge im Format des Erlebnis-Puffers: {'text': str, 'metadata': dict}
+                         und optional 'id' (siehe `remember_short_term`).
+        """
+        if not experiences:
+            return
+        self._store(experiences)
+
+    def _embed_query_and_hot_tier(self, query_text: str) -> List[float]:
+        """Kodiert die Anfrage und fehlende Embeddings der heißen Stufe in einem gemeinsamen Aufruf."""
+        missing = self.hot_tier.missing_embeddings() if self.hot_tier is not None else []
+        if not missing:
+            return self._embed(query_text)
+        embeddings = self._embed_many([query_text] + [text for _, text in missing])
+        self.hot_tier.set_embeddings([id_ for id_, _ in missing], embeddings[1:])
+        return embeddings[0]
+
+    def _hot_tier_holds_everything(self) -> bool:
+        """Wahr, wenn jede geschriebene Erinnerung auch in der heißen Stufe liegt."""
+        return self.hot_tier is not None and self._hot_tier_complete and self.hot_tier.evictions == 0
+
+    def _search_pending(self, query_embedding: List[float], n_results: int,
+                        where: Optional[dict]) -> List[Dict[str, Any]]:
+        """
+        Durchsucht die noch nicht geschriebenen Einträge, die die heiße Stufe nicht hält
+        (z.B. ein Stapel größer als ihre Kapazität); nur diese werden hier kodiert.
+        """
+        pending = self.writer.snapshot() if self.writer is not None else []
+        pending = [entry for entry in pending if self.hot_tier is None or entry['id'] not in self.hot_tier]
+        if not pending:
+            return []
+        scratch = HotTier(len(pending), metric=self.backend.distance_metric)
+        for entry, embedding in zip(pending, self._embed_many([entry['text'] for entry in pending])):
+            scratch.add(entry['id'], entry['text'], entry['metadata'], embedding=embedding)
+        return scratch.search(query_embedding, n_results, where)
+
+    def _record_tier_hits(self, result_ids: List[str], cold_ids: set):
+        """Zählt Treffer pro Stufe und übernimmt wiederholt abgerufene Erinnerungen in die heiße Stufe."""
+        if self.hot_tier is None:
+            self.tier_stats['cold_results'] += len(result_ids)
+            return
+        hot_ids = [id_ for id_ in result_ids if id_ not in cold_ids]
+        self.tier_stats['hot_results'] += len(hot_ids)
+        self.tier_stats['cold_results'] += len(result_ids) - len(hot_ids)
+        self.hot_tier.touch(hot_ids)
+        promote = []
+        for id_ in result_ids:
+            if id_ in cold_ids:
+                self._recall_counts[id_] = self._recall_counts.get(id_, 0) + 1
+                if self._recall_counts[id_] >= self.PROMOTE_AFTER_RECALLS:
+                    promote.append(id_)
+        if len(self._recall_counts) > 100 * self.hot_tier.capacity:
+            self._recall_counts.clear()
+        if promote:
+            results = self.backend.get(ids=promote, include_embeddings=True)
+            for id_, text, meta, embedding in zip(results['ids'], results['documents'], results['metadatas'],
+                                                  results['embeddings']):
+                self.hot_tier.add(id_, text, meta, embedding=embedding)
+                self._recall_counts.pop(id_, None)
+            self.tier_stats['promotions'] += len(results['ids'])
+
+    @classmethod
+    def build_affect_filter(cls, affect_region: Union[str, Dict[str, tuple], None] = None,
+                            memory_type: Optional[str] = None) -> Optional[dict]:
+        """
+        Baut den Metadaten-Filter (Chroma-Syntax) für einen Bereich der ASC-Ebene
+        und/oder einen Erinnerungstyp.
+
+        Args:
+            affect_region: Name aus `AFFECT_REGIONS` oder z.B. {'x': (70, 100), 'y': (-100, 0)}.
+            memory_type: z.B. 'synthesis' für die im Schlaf gelernten Lektionen.
+        """
+        if isinstance(affect_region, str):
+            if affect_region not in cls.AFFECT_REGIONS:
+                raise ValueError(f"Unbekannter Bereich '{affect_region}'. Erlaubt: {sorted(cls.AFFECT_REGIONS)}")
+            affect_region = cls.AFFECT_REGIONS[affect_region]
+        conditions = []
+        for key, (low, high) in (affect_region or {}).items():
+            conditions += [{key: {"$gte": low}}, {key: {"$lte": high}}]
+        if memory_type is not None:
+            conditions.append({'type': memory_type})
+        if not conditions:
+            return None
+        return conditions[0] if len(conditions) == 1 else {"$and": conditions}
+
+    def query_relevant_memories(self, query_text: str, n_results: int = 3,
+                                affect_region: Union[str, Dict[str, tuple], None] = None,
+                                memory_type: Optional[str] = None, boost_state: Optional[Dict[str, float]] = None,
+                                affect_weight: float = 0.3) -> List[Dict[str, Any]]:
+        """
+        Die inhaltlich ähnlichsten Erinnerungen, optional eingegrenzt oder gewichtet nach Affekt.
+
+        Args:
+            affect_region: Nur Erinnerungen aus diesem Bereich der ASC-Ebene (siehe `build_affect_filter`).
+            memory_type: Nur Erinnerungen dieses Typs, z.B. 'synthesis'.
+            boost_state: Bevorzugt Erinnerungen, die in einem ähnlichen Zustand ({'x', 'y'})
+                         entstanden sind (stimmungskongruentes Erinnern).
+            affect_weight: Gewicht des Zustandsabstands gegenüber der Kosinus-Distanz.
+
+        Ergebnisse werden bis zur nächsten Änderung am Speicher zwischengespeichert
+        (siehe `QueryResultCache`); der Aufrufer erhält immer eine eigene Kopie.
+        """
+        if self.query_cache is None:
+            return self._query_relevant_memories(query_text, n_results, affect_region, memory_type,
+                                                 boost_state, affect_weight)
+        key = self.query_cache.make_key(query_text, n_results=n_results, affect_region=affect_region,
+                                        memory_type=memory_type, boost_state=boost_state,
+                                        affect_weight=affect_weight)
+        cached = self.query_cache.get(key)
+        if cached is not None:
+            return cached
+        start = time.perf_counter()
+        results = self._query_relevant_memories(query_text, n_results, affect_region, memory_type,
+                                                boost_state, affect_weight)
+        self.query_cache.put(key, results, time.perf_counter() - start)
+        return results
+
+    def _query_relevant_memories(self, query_text: str, n_results: int,
+                                 affect_region: Union[str, Dict[str, tuple], None], memory_type: Optional[str],
+                                 boost_state: Optional[Dict[str, float]], affect_weight: float) -> List[Dict[str, Any]]:
+        where = self.build_affect_filter(affect_region, memory_type)
+        # Für die Gewichtung werden mehr Kandidaten geholt und anschließend neu sortiert.
+        n_candidates = n_results * 4 if boost_state is not None else n_results
+        query_embedding = self._embed_query_and_hot_tier(query_text)
+
+        hot = self.hot_tier.search(query_embedding, n_candidates, where) if self.hot_tier is not None else []
+        self.tier_stats['queries'] += 1
+        cold_ids = []
+        by_id = {h['id']: (h['distance'], h['text'], h['metadata']) for h in hot}
+        # Die Treffer der heißen Stufe werden immer mit denen des Backends zusammengeführt;
+        # nur wenn die heiße Stufe alles enthält, kann das Backend nichts Näheres liefern.
+        if self._hot_tier_holds_everything():
+            self.tier_stats['served_from_hot'] += 1
+        else:
+            # Read-your-writes ohne auf den Schreibpuffer zu warten: Die Momentaufnahme kommt vor
+            # der Backend-Abfrage, sodass jeder Eintrag in mindestens einer der beiden Suchen liegt.
+            for hit in self._search_pending(query_embedding, n_candidates, where):
+                if hit['id'] not in by_id:
+                    by_id[hit['id']] = (hit['distance'], hit['text'], hit['metadata'])
+                    cold_ids.append(hit['id'])
+            if self.backend.count() > 0:
+                results = self.backend.query(query_embedding, n_results=n_candidates, where=where)
+                for id_, distance, text, meta in zip(results['ids'], results['distances'],
+                                                     results['documents'], results['metadatas']):
+                    if id_ not in by_id:
+                        by_id[id_] = (distance, text, meta)
+                        cold_ids.append(id_)
+        ranked = sorted(by_id.items(), key=lambda item: item[1][0])[:n_candidates]
+        entries = [entry for _, entry in ranked]
+        self._record_tier_hits([id_ for id_, _ in ranked], set(cold_ids))
+        if boost_state is not None:
+            def score(entry):
+                distance, _, meta = entry
+                if not isinstance(meta.get('x'), (int, float)) or not isinstance(meta.get('y'), (int, float)):
+                    return distance + affect_weight
+                affect_distance = ((meta['x'] - boost_state['x']) ** 2 + (meta['y'] - boost_state['y']) ** 2) ** 0.5
+                return distance + affect_weight * affect_distance / self.MAX_AFFECT_DISTANCE
+            entries = sorted(entries, key=score)[:n_results]
+        return [{'text': text, 'metadata': meta} for _, text, meta in entries]
 
     def get_latest_memories(self, n_results: int) -> List[Dict[str, Any]]:
-        count = self.collection.count()
-        if count == 0: return []
+        """
+        Die n zuletzt eingefügten Erinnerungen, älteste zuerst.
+
+        Liegen die IDs im Seitenindex, werden genau diese n Einträge geladen.
+        Sonst grenzt ein Bereichsfilter auf 'seq' die Abfrage ein; fehlen in dem
+        Fenster Einträge (z.B. nach dem Löschen), wird es verdoppelt. Noch nicht
+        geschriebene Einträge des Schreibpuffers werden ohne Warten mit einbezogen.
+        """
+        pending = self.writer.snapshot() if self.writer is not None else []
+        stored = self._get_latest_stored(n_results)
+        # Ein Eintrag kann zwischen Momentaufnahme und Abfrage geschrieben worden sein: über 'seq' entdoppeln.
+        by_seq = {memory['metadata'].get('seq', -1): memory for memory in stored}
+        by_seq.update((entry['metadata']['seq'], {'text': entry['text'], 'metadata': dict(entry['metadata'])})
+                      for entry in pending)
+        return [by_seq[seq] for seq in sorted(by_seq)][-n_results:] if n_results > 0 else []
+
+    def _get_latest_stored(self, n_results: int) -> List[Dict[str, Any]]:
+        count = self.backend.count()
+        if count == 0 or n_results <= 0: return []
         n_results = min(n_results, count)
-        results = self.collection.get(limit=count, include=["metadatas", "documents"])
-        latest_docs = results['documents'][-n_results:]
-        latest_metas = results['metadatas'][-n_results:]
-        formatted_results = []
-        for text, meta in zip(latest_docs, latest_metas):
-            formatted_results.append({'text': text, 'metadata': meta})
-        return formatted_results
+
+        results = None
+        latest = self.sequence_index.latest(n_results)
+        if latest is not None:
+            results = self.backend.get(ids=[id_ for _, id_ in latest])
+            if len(results['ids']) < n_results:
+                results = None  # Einträge wurden inzwischen gelöscht.
+        if results is None:
+            window = n_results
+            while True:
+                lower = self.sequence_index.next_seq - window
+                results = self.backend.get(where={"seq": {"$gte": lower}})
+                if len(results['ids']) >= n_results or lower <= 0:
+                    break
+                window *= 2
+
+        # Die Backends garantieren keine Reihenfolge; sortiert wird über 'seq'.
+        entries = sorted(zip(results['metadatas'], results['documents']), key=lambda entry: entry[0].get('seq', -1))
+        return [{'text': text, 'metadata': meta} for meta, text in entries[-n_results:]]
+
+    def _storage_bytes(self) -> int:
+        total = 0
+        for root, _, files in os.walk(self.db_path):
+            total += sum(os.path.getsize(os.path.join(root, name)) for name in files)
+        return total
+
+    def _query_latency_ms(self, queries: np.ndarray) -> float:
+        """Mittlere Dauer einer Backend-Abfrage (ohne Embedding) über die gegebenen Vektoren."""
+        if len(queries) == 0:
+            return 0.0
+        start = time.perf_counter()
+        for query in queries:
+            self.backend.query(query.tolist(), n_results=3)
+        return (time.perf_counter() - start) * 1000 / len(queries)
+
+    def compact(self, similarity_threshold: Optional[float] = None, full: bool = False) -> Dict[str, Any]:
+        """
+        Fasst nahezu identische Erinnerungen zusammen (z.B. in der Schlafphase).
+
+        Erinnerungen desselben Typs mit einer Kosinus-Ähnlichkeit über dem
+        Schwellwert bilden einen Cluster. Die neueste bleibt erhalten und zählt
+        in 'merged', wie viele Erinnerungen sie vertritt; die übrigen werden
+        gelöscht. Danach gibt das Backend den Platz frei und baut seine Indizes
+        neu auf.
+
+        Args:
+            similarity_threshold (float, optional): Standard ist `COMPACTION_SIMILARITY`.
+            full (bool): Vergleicht alle Erinnerungen, statt nur die seit der letzten Kompaktierung neuen.
+
+        Returns:
+            Dict[str, Any]: Anzahl vorher/nachher, entfernte Einträge, freigegebene Bytes
+                            und die mittlere Abfragedauer vorher/nachher in ms.
+        """
+        threshold = similarity_threshold if similarity_threshold is not None else self.COMPACTION_SIMILARITY
+        self.flush()
+        start = time.perf_counter()
+        compacted_seq = self.sequence_index.next_seq
+        results = self.backend.get(include_documents=False, include_embeddings=True)
+        ids, metadatas = results['ids'], results['metadatas']
+        vectors = np.asarray(results['embeddings'], dtype=np.float32).reshape(len(ids), -1) if ids \
+            else np.zeros((0, 1), dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.where(norms > 0, norms, 1.0)
+        seqs = np.asarray([meta.get('seq', -1) for meta in metadatas])
+
+        since = 0 if full else self.sequence_index.compacted_seq
+        clusters = find_near_duplicates(vectors, np.flatnonzero(seqs >= since), threshold,
+                                        groups=[meta.get('type', '') for meta in metadatas])
+        queries = vectors[np.linspace(0, len(vectors) - 1, num=min(20, len(vectors)), dtype=np.int64)] if len(vectors) else vectors
+        latency_before = self._query_latency_ms(queries)
+        bytes_before = self._storage_bytes()
+
+        keep_ids, keep_metadatas, remove_ids = [], [], []
+        for cluster in clusters:
+            keep = max(cluster, key=lambda i: seqs[i])
+            keep_ids.append(ids[keep])
+            keep_metadatas.append(dict(metadatas[keep], merged=sum(metadatas[i].get('merged', 1) for i in cluster)))
+            remove_ids += [ids[i] for i in cluster if i != keep]
+
+        # Während des Umbaus darf der Schreibpuffer nichts ins Backend schreiben.
+        with (self.writer.lock if self.writer is not None else nullcontext()):
+            if remove_ids:
+                self.backend.update(keep_ids, keep_metadatas)
+                self.backend.delete(remove_ids)
+                self.backend.compact()
+                if self.hot_tier is not None:
+                    # Die behaltenen Einträge liegen mit neuen Metadaten nur noch im Backend.
+                    self.hot_tier.remove(keep_ids + remove_ids)
+                    self._hot_tier_complete = False
+                self._invalidate_queries()
+            self.sequence_index.forget(remove_ids, compacted_seq=compacted_seq)
+
+        report = {
+            'memories_before': len(ids),
+            'memories_after': len(ids) - len(remove_ids),
+            'clusters': len(clusters),
+            'removed': len(remove_ids),
+            'bytes_before': bytes_before,
+            'bytes_after': self._storage_bytes(),
+            'query_ms_before': latency_before,
+            'query_ms_after': self._query_latency_ms(queries),
+            'duration_s': time.perf_counter() - start,
+        }
+        report['bytes_reclaimed'] = report['bytes_before'] - report['bytes_after']
+        return report
 
     def get_memory_count(self) -> int:
-        return self.collection.count()
\ No newline at end of file
+        if self.writer is None:
+            return self.backend.count()
+        # Unter dem Lock des Schreibpuffers wechselt ein Eintrag atomar von 'pending' ins Backend.
+        with self.writer.lock:
+            return self.backend.count() + len(self.writer.pending)
\ No newline at end of file
@@ -0,0 +1,133 @@
+# memory/tiers.py
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from memory.backends import matches_where
+
+
+class HotTier:
+    """
+    Kleine, heiße Gedächtnisstufe im Arbeitsspeicher.
+
+    Hält die jüngsten Erlebnisse (auch solche, die noch im Kurzzeitpuffer
+    liegen und nie geschrieben wurden) und häufig abgerufene Erinnerungen samt
+    Embedding. Die Suche ist ein einziges Matrixprodukt über höchstens
+    `capacity` Zeilen. Verdrängt wird nach LRU; angeheftete Einträge
+    (unkonsolidierte Erlebnisse) erst, wenn kein anderer mehr übrig ist.
+    Einträge ohne Embedding werden bei der Suche übersprungen, bis
+    `set_embeddings` sie nachreicht.
+    """
+
+    def __init__(self, capacity: int = 256, metric: str = "cosine"):
+        """
+        Args:
+            capacity (int): Maximale Anzahl Einträge.
+            metric (str): "cosine" oder "l2" (quadriert), passend zur Distanz des Backends.
+        """
+        self.capacity = capacity
+        self.metric = metric
+        self._entries: "OrderedDict[str, dict]" = OrderedDict()
+        self._matrix: Optional[Tuple[List[str], np.ndarray]] = None
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, id_: str) -> bool:
+        return id_ in self._entries
+
+    def add(self, id_: str, text: str, metadata: dict, embedding: Optional[Sequence[float]] = None, pinned: bool = False):
+        with self._lock:
+            old = self._entries.pop(id_, None)
+            if embedding is None and old is not None:
+                embedding = old['embedding']
+            self._entries[id_] = {
+                'id': id_, 'text': text, 'metadata': dict(metadata),
+                'embedding': None if embedding is None else np.asarray(embedding, dtype=np.float32),
+                'pinned': pinned,
+            }
+            self._matrix = None
+            self._evict()
+
+    def _evict(self):
+        while len(self._entries) > self.capacity:
+            victim = next((id_ for id_, entry in self._entries.items() if not entry['pinned']), None)
+            if victim is None:
+                victim = next(iter(self._entries))
+            del self._entries[victim]
+            self.evictions += 1
+
+    def unpin(self, ids: Sequence[str]):
+        """Konsolidierte Einträge dürfen wieder verdrängt werden."""
+        with self._lock:
+            for id_ in ids:
+                if id_ in self._entries:
+                    self._entries[id_]['pinned'] = False
+
+    def remove(self, ids: Sequence[str]):
+        with self._lock:
+            for id_ in ids:
+                if self._entries.pop(id_, None) is not None:
+                    self._matrix = None
+
+    def touch(self, ids: Sequence[str]):
+        """Markiert Einträge als zuletzt genutzt."""
+        with self._lock:
+            for id_ in ids:
+                if id_ in self._entries:
+                    self._entries.move_to_end(id_)
+
+    def missing_embeddings(self) -> List[Tuple[str, str]]:
+        """(id, text) aller Einträge, deren Embedding noch fehlt."""
+        with self._lock:
+            return [(id_, entry['text']) for id_, entry in self._entries.items() if entry['embedding'] is None]
+
+    def set_embeddings(self, ids: Sequence[str], embeddings: Sequence[Sequence[float]]):
+        with self._lock:
+            for id_, embedding in zip(ids, embeddings):
+                entry = self._entries.get(id_)
+                if entry is not None and entry['embedding'] is None:
+                    entry['embedding'] = np.asarray(embedding, dtype=np.float32)
+                    self._matrix = None
+
+    def _search_matrix(self) -> Tuple[List[str], np.ndarray]:
+        if self._matrix is None:
+            ids = [id_ for id_, entry in self._entries.items() if entry['embedding'] is not None]
+            vectors = np.stack([self._entries[id_]['embedding'] for id_ in ids]) if ids else np.zeros((0, 0), np.float32)
+            self._matrix = (ids, vectors)
+        return self._matrix
+
+    def search(self, embedding: Sequence[float], n_results: int, where: Optional[dict] = None) -> List[Dict[str, Any]]:
+        """
+        Die n ähnlichsten Einträge mit 'distance' (Metrik des Backends) und
+        'similarity' (Kosinus), aufsteigend nach Distanz.
+        """
+        query = np.asarray(embedding, dtype=np.float32)
+        with self._lock:
+            ids, vectors = self._search_matrix()
+            if where:
+                keep = [i for i, id_ in enumerate(ids) if matches_where(self._entries[id_]['metadata'], where)]
+                ids, vectors = [ids[i] for i in keep], vectors[keep]
+            if not ids or n_results <= 0:
+                return []
+            norms = np.linalg.norm(vectors, axis=1) * (np.linalg.norm(query) or 1.0)
+            similarities = (vectors @ query) / np.where(norms > 0, norms, 1.0)
+            if self.metric == "l2":
+                distances = np.sum((vectors - query) ** 2, axis=1)
+            else:
+                distances = 1.0 - similarities
+            k = min(n_results, len(ids))
+            top = np.argpartition(distances, k - 1)[:k]
+            top = top[np.argsort(distances[top], kind="stable")]
+            return [dict(id=ids[i], text=self._entries[ids[i]]['text'], metadata=dict(self._entries[ids[i]]['metadata']),
+                         distance=float(distances[i]), similarity=float(similarities[i])) for i in top]
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {'entries': len(self._entries), 'capacity': self.capacity,
+                    'pinned': sum(entry['pinned'] for entry in self._entries.values()),
+                    'evictions': self.evictions}
@@ -0,0 +1,125 @@
+# memory/writer.py
+import queue
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+
+class WriteBehindQueue:
+    """
+    Schreibpuffer mit Hintergrund-Thread für das Langzeitgedächtnis.
+
+    `submit` kehrt sofort zurück; der Worker sammelt alle bis dahin
+    eingereihten Einträge zu einem Stapel, bereitet ihn vor (`prepare_fn`,
+    z.B. ein gebündelter Embedding-Aufruf) und schreibt ihn (`commit_fn`).
+    Bis zum Schreiben bleiben die Einträge in `pending` sichtbar. Das Schreiben
+    und das Entfernen aus `pending` geschehen unter `lock`, sodass Leser nie
+    einen Eintrag doppelt oder gar nicht sehen.
+    """
+
+    def __init__(self, prepare_fn: Callable[[List[dict]], Any], commit_fn: Callable[[List[dict], Any], None],
+                 max_batch_size: int = 256):
+        """
+        Args:
+            prepare_fn: Bereitet einen Stapel außerhalb des Locks vor; das Ergebnis erhält `commit_fn`.
+            commit_fn: Schreibt einen Stapel (läuft unter `lock`).
+            max_batch_size (int): Maximale Anzahl Einträge pro Stapel.
+        """
+        self.prepare_fn = prepare_fn
+        self.commit_fn = commit_fn
+        self.max_batch_size = max_batch_size
+        self.lock = threading.RLock()
+        self.pending: "OrderedDict[str, dict]" = OrderedDict()
+        self._queue: "queue.Queue[Optional[dict]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._error: Optional[Exception] = None
+        self.batches = 0
+        self.written = 0
+
+    def submit(self, entries: List[dict]):
+        """Reiht Einträge ({'id', ...}) zum Schreiben ein, ohne zu blockieren."""
+        with self.lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="memory-writer", daemon=True)
+                self._thread.start()
+            for entry in entries:
+                self.pending[entry['id']] = entry
+                self._queue.put(entry)
+
+    def snapshot(self) -> List[dict]:
+        """Die noch nicht geschriebenen Einträge in Einreihungsfolge."""
+        with self.lock:
+            return list(self.pending.values())
+
+    def _next_batch(self) -> Optional[List[dict]]:
+        entry = self._queue.get()
+        if entry is None:
+            self._queue.task_done()
+            return None
+        batch = [entry]
+        while len(batch) < self.max_batch_size:
+            try:
+                entry = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if entry is None:
+                # Das Stoppsignal nach vorne holen, nachdem dieser Stapel geschrieben ist.
+                self._queue.task_done()
+                self._queue.put(None)
+                break
+            batch.append(entry)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            try:
+                prepared = self.prepare_fn(batch)
+                with self.lock:
+                    try:
+                        self.commit_fn(batch, prepared)
+                        self.batches += 1
+                        self.written += len(batch)
+                    finally:
+                        self._discard(batch)
+            except Exception as e:
+                print(f"WARNUNG: {len(batch)} Erinnerungen konnten nicht gespeichert werden: {e}")
+                self._error = e
+                self._discard(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _discard(self, batch: List[dict]):
+        with self.lock:
+            for entry in batch:
+                self.pending.pop(entry['id'], None)
+
+    def flush(self):
+        """
+        Wartet, bis alle eingereihten Einträge geschrieben sind.
+
+        Raises:
+            RuntimeError: Falls seit dem letzten `flush` ein Stapel nicht geschrieben werden konnte.
+        """
+        self._queue.join()
+        error, self._error = self._error, None
+        if error is not None:
+            raise RuntimeError(f"Schreiben ins Langzeitgedächtnis fehlgeschlagen: {error}") from error
+
+    def close(self):
+        """Schreibt alle ausstehenden Einträge und beendet den Worker."""
+        try:
+            self.flush()
+        finally:
+            if self._thread is not None and self._thread.is_alive():
+                self._queue.put(None)
+                self._thread.join()
+            self._thread = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {'pending': len(self.pending), 'batches': self.batches, 'written': self.written,
+                    'avg_batch_size': self.written / self.batches if self.batches else 0.0}
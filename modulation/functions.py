@@ -87,4 +87,29 @@ def calculate_layer_drop_rate(x_value: float) -> float:
         rate = 0.5 * ((x_value - 90.0) / 10.0)
         # Clamp, um sicherzustellen, dass die Rate 0.5 nicht überschreitet,
         # falls x_value > 100 übergeben wird.
-        return min(0.5, max(0.0, rate))
\ No newline at end of file
+        return min(0.5, max(0.0, rate))
+
+def calculate_token_budget(x_value: float, y_value: float) -> int:
+    """
+    Bestimmt, wie viele neue Tokens ein Denkschritt erzeugen darf.
+
+    - Neutral erhält ein Gedanke ein Budget von 48 Tokens.
+    - Positive Valenz (y > 0) erlaubt längere, explorativere Gedanken (bis +32 Tokens).
+    - Hohes Arousal (x > 50) verkürzt das Budget linear bis auf ein Viertel
+      bei x=100, damit dringende Zyklen schneller abschließen.
+
+    Args:
+        x_value (float): Der Arousal-Wert aus dem ASC, im Bereich [-100, 100].
+        y_value (float): Der Valenz-Wert aus dem ASC, im Bereich [-100, 100].
+
+    Returns:
+        int: Das Token-Budget, garantiert im Bereich [12, 127].
+    """
+    budget = 48.0 + 32.0 * (max(0.0, y_value) / 100.0)
+
+    if x_value > 50:
+        # Faktor geht von 1.0 (bei x=50) bis 0.25 (bei x=100).
+        urgency = min(1.0, (x_value - 50.0) / 50.0)
+        budget *= 1.0 - 0.75 * urgency
+
+    return int(min(127, max(12, round(budget))))
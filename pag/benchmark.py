@@ -0,0 +1,165 @@
+# pag/benchmark.py
+import argparse
+import gc
+import io
+import time
+from typing import Dict, List, Optional, Sequence
+
+import torch
+
+from pag.model import PAG_Model
+
+# Feste Prompts im Stil der Agenten-Prompts, damit alle Modi dieselbe Arbeit leisten.
+DEFAULT_PROMPTS = [
+    "Answer the following question based on the context. Context: The sun is a massive star that provides heat. Question: What does the sun provide?",
+    "Translate to German: The sky is blue.",
+    "Context:\n- My internal state is: Arousal=20, Valence=10.\n- Additional context is: 'I see: a person at a desk.'\n\n"
+    "Task: Based on the context, what is my key conclusion or plan regarding the main situation?\n"
+    "Main Situation: 'I hear someone say: Hello, how are you?'\nInternal Thought:",
+    "You are CAPA. You are helpful, factual, and concise. You must always respond in English.\n\n"
+    "Your internal thought is: 'The user greets me.'.\nRelevant memories:\n- None\n\n\n"
+    "Task: Based on your personality, thought, and memories, what is your immediate, direct response to the user's statement?\n"
+    "User's Statement: 'Hello, how are you?'\nYour Response:",
+    "Summarize in one sentence: The agent slept, consolidated its memories and woke up rested.",
+]
+
+# Nahezu greedy, damit Unterschiede aus der Quantisierung und nicht aus dem Sampling stammen.
+BENCHMARK_TEMPERATURE = 0.01
+
+
+def _model_size_mb(model: torch.nn.Module) -> float:
+    """Größe des serialisierten state_dict; erfasst auch gepackte int8-Gewichte."""
+    buffer = io.BytesIO()
+    torch.save(model.state_dict(), buffer)
+    return buffer.tell() / (1024 * 1024)
+
+
+def _token_f1(prediction: str, reference: str) -> float:
+    """Wortbasierter F1-Score zwischen zwei Antworten (wie bei SQuAD)."""
+    pred_tokens, ref_tokens = prediction.lower().split(), reference.lower().split()
+    if not pred_tokens or not ref_tokens:
+        return float(pred_tokens == ref_tokens)
+    common = sum(min(pred_tokens.count(t), ref_tokens.count(t)) for t in set(pred_tokens))
+    if common == 0:
+        return 0.0
+    precision, recall = common / len(pred_tokens), common / len(ref_tokens)
+    return 2 * precision * recall / (precision + recall)
+
+
+def _run_prompts(pag: PAG_Model, prompts: Sequence[str]) -> (List[str], List[float]):
+    outputs, latencies = [], []
+    for prompt in prompts:
+        torch.manual_seed(0)
+        start = time.perf_counter()
+        outputs.append(pag.infer(prompt, temperature=BENCHMARK_TEMPERATURE))
+        latencies.append(time.perf_counter() - start)
+    return outputs, latencies
+
+
+def compare_quantization_modes(model_name: str, prompts: Sequence[str] = DEFAULT_PROMPTS,
+                               modes: Sequence[Optional[str]] = PAG_Model.QUANTIZATION_MODES) -> Dict[str, dict]:
+    """
+    Lässt einen festen Prompt-Satz durch jeden Quantisierungsmodus laufen und
+    vergleicht Latenz und Genauigkeit mit der fp32-Referenz.
+
+    Die Caches werden deaktiviert, damit jeder Modus die volle Generierung bezahlt.
+    Die Modelle werden nacheinander geladen und wieder freigegeben.
+
+    Returns:
+        Dict[str, dict]: Pro Modus ("fp32", "int8", "bf16") die Modellgröße in MB,
+                         mittlere/maximale Latenz in Sekunden sowie Exact-Match-Rate
+                         und mittleren Token-F1 gegenüber fp32.
+    """
+    results = {}
+    reference = None
+    # fp32 zuerst ausführen, damit alle anderen Modi eine Referenz haben.
+    for mode in sorted(modes, key=lambda m: m is not None):
+        pag = PAG_Model(model_name=model_name, encoder_cache_mb=0, quantization=mode)
+        # Ein Aufwärmlauf, damit einmalige Initialisierungskosten nicht mitgemessen werden.
+        pag.infer(prompts[0], temperature=BENCHMARK_TEMPERATURE)
+        outputs, latencies = _run_prompts(pag, prompts)
+        if reference is None:
+            reference = outputs
+
+        results[pag.quantization or "fp32"] = {
+            'model_size_mb': _model_size_mb(pag.model),
+            'mean_latency_s': sum(latencies) / len(latencies),
+            'max_latency_s': max(latencies),
+            'exact_match': sum(o == r for o, r in zip(outputs, reference)) / len(outputs),
+            'token_f1': sum(_token_f1(o, r) for o, r in zip(outputs, reference)) / len(outputs),
+            'outputs': outputs,
+        }
+        # Das Register hält das Modell sonst für weitere Instanzen vor.
+        pag.unload()
+        del pag
+        gc.collect()
+    return results
+
+
+def benchmark_assisted_generation(model_name: str, assistant_model_name: str,
+                                  prompts: Sequence[str] = DEFAULT_PROMPTS) -> Dict[str, dict]:
+    """
+    Vergleicht greedy Dekodierung mit und ohne Draft-Modell auf demselben Prompt-Satz.
+
+    Returns:
+        Dict[str, dict]: "plain" und "assisted" mit mittlerer Latenz und Tokens/s;
+                         "assisted" zusätzlich mit Akzeptanzrate und dem Anteil
+                         identischer Antworten gegenüber "plain".
+    """
+    pag = PAG_Model(model_name=model_name, encoder_cache_mb=0)
+    results = {}
+    reference = None
+    for mode in ("plain", "assisted"):
+        if mode == "assisted":
+            pag.load_assistant_model(assistant_model_name)
+        # Aufwärmlauf, siehe compare_quantization_modes.
+        pag.infer(prompts[0], temperature=BENCHMARK_TEMPERATURE, greedy=True)
+        outputs, latencies, tokens = [], [], 0
+        for prompt in prompts:
+            start = time.perf_counter()
+            outputs.append(pag.infer(prompt, temperature=BENCHMARK_TEMPERATURE, greedy=True))
+            latencies.append(time.perf_counter() - start)
+            tokens += pag.get_stats()['last_call']['generated_tokens']
+        if reference is None:
+            reference = outputs
+
+        results[mode] = {
+            'mean_latency_s': sum(latencies) / len(latencies),
+            'tokens_per_s': tokens / sum(latencies),
+            'identical_outputs': sum(o == r for o, r in zip(outputs, reference)) / len(outputs),
+            'outputs': outputs,
+        }
+    assisted = pag.get_stats()['assisted']
+    # Der Aufwärmlauf zählt in den kumulierten Statistiken mit; die Rate bleibt aussagekräftig.
+    results['assisted']['acceptance_rate'] = assisted['acceptance_rate']
+    results['assisted']['speedup'] = results['plain']['mean_latency_s'] / results['assisted']['mean_latency_s']
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Vergleicht Latenz und Genauigkeit der PAG-Quantisierungsmodi.")
+    parser.add_argument("--model", default="google/flan-t5-xl", help="Das zu vergleichende Hugging Face Modell.")
+    parser.add_argument("--assistant", default=None,
+                        help="Draft-Modell (z.B. google/flan-t5-small); misst dann Assisted Generation statt Quantisierung.")
+    args = parser.parse_args()
+
+    if args.assistant:
+        results = benchmark_assisted_generation(args.model, args.assistant)
+        print("\n" + "=" * 25 + " Assisted Generation " + "=" * 25)
+        print(f"{'Modus':<10}{'Ø Latenz (s)':>14}{'Tokens/s':>10}{'Identisch':>11}{'Akzeptanz':>11}")
+        for mode, r in results.items():
+            acceptance = f"{r['acceptance_rate']:>11.2f}" if 'acceptance_rate' in r else f"{'-':>11}"
+            print(f"{mode:<10}{r['mean_latency_s']:>14.3f}{r['tokens_per_s']:>10.1f}{r['identical_outputs']:>11.2f}{acceptance}")
+        print(f"Speedup: {results['assisted']['speedup']:.2f}x")
+        return
+
+    results = compare_quantization_modes(args.model)
+    print("\n" + "=" * 25 + " Quantisierungs-Vergleich " + "=" * 25)
+    print(f"{'Modus':<8}{'Größe (MB)':>12}{'Ø Latenz (s)':>14}{'Max (s)':>10}{'Exact':>8}{'F1':>8}")
+    for mode, r in results.items():
+        print(f"{mode:<8}{r['model_size_mb']:>12.1f}{r['mean_latency_s']:>14.3f}{r['max_latency_s']:>10.3f}"
+              f"{r['exact_match']:>8.2f}{r['token_f1']:>8.2f}")
+
+
+if __name__ == '__main__':
+    main()
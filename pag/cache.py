@@ -0,0 +1,202 @@
+# pag/cache.py
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+
+class LRUCache:
+    """
+    Threadsicherer LRU-Cache mit einem Speicherbudget in Bytes.
+
+    Die Größe jedes Eintrags wird über `size_fn` bestimmt. Wird das Budget
+    überschritten, werden die am längsten nicht genutzten Einträge verdrängt.
+    Treffer, Fehlschläge und Verdrängungen werden für die Statistik gezählt.
+    """
+
+    def __init__(self, max_bytes: int, size_fn: Callable[[Any], int]):
+        """
+        Args:
+            max_bytes (int): Das maximale Speicherbudget aller Einträge zusammen.
+            size_fn (Callable): Liefert die Größe eines Werts in Bytes.
+        """
+        self.max_bytes = max_bytes
+        self.size_fn = size_fn
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Gibt den Wert zurück (und markiert ihn als zuletzt genutzt) oder None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: Hashable, value: Any):
+        """Legt einen Wert ab. Werte größer als das gesamte Budget werden nicht gespeichert."""
+        size = self.size_fn(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.current_bytes -= old[1]
+            self._entries[key] = (value, size)
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def get_stats(self) -> dict:
+        """Gibt Füllstand und Trefferquote des Caches zurück."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self.current_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+
+
+class ResponseCache:
+    """
+    Persistenter Antwort-Cache für (nahezu) deterministische Inferenz.
+
+    Bei sehr niedrigen Temperaturen (z.B. der 0.3-Override bei hohem Arousal
+    oder stark negativer Valenz) liefert das Modell praktisch immer dieselbe
+    Antwort. Solche Antworten werden in einer SQLite-Datei abgelegt und bei
+    einem Treffer ohne Generierung zurückgegeben.
+
+    Schlüssel: Hash aus Modellname und Prompt plus ein quantisierter
+    Temperatur-Bucket. Oberhalb von `max_temperature` wird der Cache umgangen.
+    Überschreitet die Gesamtgröße `max_bytes`, werden die am längsten nicht
+    genutzten Antworten gelöscht.
+    """
+
+    def __init__(self, path: Optional[str] = None, max_bytes: int = 16 * 1024 * 1024,
+                 max_temperature: float = 0.35, temperature_step: float = 0.05):
+        """
+        Args:
+            path (str, optional): Pfad zur SQLite-Datei. None hält den Cache nur im Arbeitsspeicher.
+            max_bytes (int): Maximale Gesamtgröße aller gespeicherten Antworten.
+            max_temperature (float): Temperaturen darüber werden nie gecacht.
+            temperature_step (float): Breite eines Temperatur-Buckets.
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_temperature = max_temperature
+        self.temperature_step = temperature_step
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.evictions = 0
+
+        if path is not None:
+            directory = os.path.dirname(os.path.abspath(path))
+            if not os.path.exists(directory): os.makedirs(directory)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path if path is not None else ":memory:", check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, response TEXT NOT NULL, size INTEGER NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def is_cacheable(self, temperature: float) -> bool:
+        return temperature <= self.max_temperature
+
+    def make_key(self, model_name: str, prompt: str, temperature: float, variant: str = "") -> str:
+        """`variant` unterscheidet Generierungsoptionen, die die Antwort verändern (z.B. Layer-Drop)."""
+        digest = hashlib.sha256(f"{model_name}\x00{variant}\x00{prompt}".encode("utf-8")).hexdigest()
+        bucket = int(round(temperature / self.temperature_step))
+        return f"{digest}:{bucket}"
+
+    def get(self, model_name: str, prompt: str, temperature: float, variant: str = "") -> Optional[str]:
+        """Gibt die gespeicherte Antwort zurück oder None (auch bei zu hoher Temperatur)."""
+        if not self.is_cacheable(temperature):
+            self.bypassed += 1
+            return None
+        key = self.make_key(model_name, prompt, temperature, variant)
+        with self._lock:
+            row = self._conn.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, model_name: str, prompt: str, temperature: float, response: str, variant: str = ""):
+        """Speichert eine Antwort, sofern die Temperatur unter dem Grenzwert liegt."""
+        if not self.is_cacheable(temperature):
+            return
+        key = self.make_key(model_name, prompt, temperature, variant)
+        size = len(response.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, response, size, last_access) VALUES (?, ?, ?, ?)",
+                (key, response, size, time.time())
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        """Löscht die ältesten Einträge, bis die Gesamtgröße wieder ins Budget passt."""
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self._conn.execute("SELECT key, size FROM responses ORDER BY last_access ASC, rowid ASC").fetchall():
+            if total <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            total -= size
+            self.evictions += 1
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            entries, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        lookups = self.hits + self.misses
+        return {
+            'entries': entries,
+            'bytes': total,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'bypassed': self.bypassed,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -1,8 +1,120 @@
 # pag/model.py
+import threading
+import time
+from contextlib import contextmanager
 import torch
-from transformers import AutoModelForSeq2SeqLM, AutoTokenizer
+from transformers import (AutoModelForSeq2SeqLM, AutoTokenizer, LogitsProcessor, LogitsProcessorList,
+                          StoppingCriteria, StoppingCriteriaList, TextIteratorStreamer)
+from transformers.modeling_outputs import BaseModelOutput
+from typing import Iterator, List, Optional
 import warnings
 
+from pag.cache import LRUCache, ResponseCache
+from registry.models import default_registry
+
+
+class PerRowTemperatureWarper(LogitsProcessor):
+    """
+    Skaliert die Logits jeder Batch-Zeile mit ihrer eigenen Temperatur.
+
+    `model.generate` kennt nur eine einzige Temperatur für den ganzen Batch.
+    Dieser Prozessor teilt die Scores zeilenweise, damit Prompts mit
+    unterschiedlichen ASC-Zuständen trotzdem gemeinsam generiert werden können.
+    """
+
+    def __init__(self, temperatures: torch.Tensor):
+        # Form (batch, 1), damit die Division über das Vokabular broadcastet.
+        self.temperatures = temperatures.view(-1, 1)
+
+    def __call__(self, input_ids: torch.LongTensor, scores: torch.FloatTensor) -> torch.FloatTensor:
+        return scores / self.temperatures.to(scores.dtype)
+
+
+class CancellationCriteria(StoppingCriteria):
+    """Beendet die Generierung, sobald das übergebene Event gesetzt wird."""
+
+    def __init__(self, *events: threading.Event):
+        self.events = [e for e in events if e is not None]
+
+    def __call__(self, input_ids: torch.LongTensor, scores: torch.FloatTensor, **kwargs) -> bool:
+        return any(e.is_set() for e in self.events)
+
+
+class SentenceEndCriteria(StoppingCriteria):
+    """
+    Beendet die Generierung, sobald jede Zeile einen Satz abgeschlossen hat
+    (letztes Token endet auf '.', '!' oder '?') oder bereits fertig ist.
+    """
+
+    def __init__(self, sentence_end_ids: torch.Tensor, finished_ids: torch.Tensor):
+        self.sentence_end_ids = sentence_end_ids
+        self.finished_ids = finished_ids
+        self.done: Optional[torch.Tensor] = None
+        self.seen_length = 0
+
+    def __call__(self, input_ids: torch.LongTensor, scores: torch.FloatTensor, **kwargs) -> bool:
+        # Beim Assisted Decoding kommen pro Schritt mehrere Tokens hinzu; alle neuen werden geprüft.
+        start = self.seen_length or input_ids.shape[1] - 1
+        new_tokens = input_ids[:, start:]
+        self.seen_length = input_ids.shape[1]
+        row_done = (torch.isin(new_tokens, self.sentence_end_ids.to(new_tokens.device))
+                    | torch.isin(new_tokens, self.finished_ids.to(new_tokens.device))).any(dim=1)
+        self.done = row_done if self.done is None else (self.done | row_done)
+        return bool(self.done.all())
+
+
+class ForwardCallCounter:
+    """Zählt für die Dauer eines `with`-Blocks die forward-Aufrufe eines Moduls."""
+
+    def __init__(self, module: Optional[torch.nn.Module]):
+        self.module = module
+        self.calls = 0
+        self._handle = None
+
+    def _hook(self, module, inputs, output):
+        self.calls += 1
+
+    def __enter__(self) -> "ForwardCallCounter":
+        if self.module is not None:
+            self._handle = self.module.register_forward_hook(self._hook)
+        return self
+
+    def __exit__(self, *exc):
+        if self._handle is not None:
+            self._handle.remove()
+
+
+class LoadedSeq2Seq:
+    """Tokenizer und Modell eines Eintrags im Modell-Register."""
+
+    __slots__ = ("tokenizer", "model", "lock")
+
+    def __init__(self, tokenizer, model):
+        self.tokenizer = tokenizer
+        self.model = model
+        # Serialisiert die Generierung aller PAG-Instanzen, die sich das Modell teilen,
+        # da das Überspringen von Layern das Modell für die Dauer eines Aufrufs verändert.
+        self.lock = threading.Lock()
+
+
+def load_seq2seq(model_name: str, quantization: Optional[str], device: torch.device) -> LoadedSeq2Seq:
+    """
+    Lädt Tokenizer und Modell und wandelt das Modell in den gewünschten Genauigkeitsmodus um.
+
+    - "int8": Dynamische Quantisierung aller nn.Linear-Layer. Die Gewichte
+      liegen als int8 vor, Aktivierungen werden zur Laufzeit quantisiert.
+      Wird nur auf der CPU unterstützt.
+    - "bf16": Halbiert den Speicherbedarf der Gewichte bei gleichem Exponentenbereich wie fp32.
+    """
+    print(f"Lade Modell: {model_name} (Quantisierung: {quantization or 'fp32'})...")
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModelForSeq2SeqLM.from_pretrained(model_name).to(device)
+    if quantization == "int8":
+        model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    elif quantization == "bf16":
+        model = model.to(torch.bfloat16)
+    return LoadedSeq2Seq(tokenizer, model.eval())
+
 
 class PAG_Model:
     """
@@ -11,27 +123,147 @@ class PAG_Model:
     fortschrittliche Sprachverarbeitung.
     """
 
-    def __init__(self, model_name: str = "google/flan-t5-xl"):
+    QUANTIZATION_MODES = (None, "int8", "bf16")
+
+    def __init__(self, model_name: str = "google/flan-t5-xl", encoder_cache_mb: float = 64.0,
+                 response_cache: Optional[ResponseCache] = None, quantization: Optional[str] = None,
+                 assistant_model_name: Optional[str] = None):
         """
-        Initialisiert den PAG durch Laden des vortrainierten Modells und Tokenizers.
-        Verschiebt das Modell automatisch auf die verfügbare GPU, falls vorhanden.
+        Initialisiert den PAG. Das vortrainierte Modell und der Tokenizer werden
+        über das Modell-Register erst bei der ersten Inferenz geladen und mit
+        allen PAG-Instanzen desselben Modells geteilt. Das Modell läuft
+        automatisch auf der GPU, falls vorhanden.
 
         Args:
             model_name (str): Der Name des Hugging Face Modells, das geladen werden soll.
+            encoder_cache_mb (float): Speicherbudget für zwischengespeicherte
+                                      Encoder-Ausgaben in MB. 0 deaktiviert den Cache.
+            response_cache (ResponseCache, optional): Persistenter Cache für Antworten
+                                      bei niedriger Temperatur. Treffer überspringen die Generierung.
+            quantization (str, optional): None (fp32), "int8" (dynamische int8-Quantisierung
+                                      der Linear-Layer, nur CPU) oder "bf16" (bfloat16-Gewichte).
+            assistant_model_name (str, optional): Kleines Draft-Modell mit demselben Tokenizer
+                                      (z.B. "google/flan-t5-small") für Assisted Generation.
         """
+        if quantization not in self.QUANTIZATION_MODES:
+            raise ValueError(f"Unbekannter Quantisierungsmodus '{quantization}'. Erlaubt: {self.QUANTIZATION_MODES}")
         print(f"Initialisiere kognitiven Kern...")
-        print(f"Lade Modell: {model_name}...")
+
+        self.model_name = model_name
+        self.response_cache = response_cache
 
         # Gerät für die Ausführung bestimmen (GPU, falls verfügbar)
         self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+        if quantization == "int8" and self.device.type != "cpu":
+            warnings.warn("int8-Quantisierung wird nur auf der CPU unterstützt. Nutze fp32.")
+            quantization = None
+        self.quantization = quantization
+
+        # Tokenizer und Modell kommen aus dem prozessweiten Register und werden
+        # erst bei der ersten Inferenz (oder über `preload`) geladen.
+        self._resource_key = self._register_seq2seq(model_name)
+
+        # Encoder-Ausgaben identischer Token-Sequenzen werden wiederverwendet (LRU).
+        self.encoder_cache = None
+        if encoder_cache_mb > 0:
+            self.encoder_cache = LRUCache(
+                max_bytes=int(encoder_cache_mb * 1024 * 1024),
+                size_fn=lambda hidden: hidden.numel() * hidden.element_size()
+            )
+
+        self._sentence_end_token_ids: Optional[torch.Tensor] = None
+        # Laufzeit-Messungen für den Layer-Drop ("Tunnelblick").
+        self._full_depth_latency_per_token: Optional[float] = None
+        self.layer_drop_stats = {'calls': 0, 'skipped_layers_total': 0, 'estimated_savings_s': 0.0}
+        self.last_call_stats: dict = {}
+
+        # Optionales Draft-Modell für spekulatives Dekodieren.
+        self.assistant_model_name = None
+        self._assistant_key = None
+        self._assistant_checked = False
+        self.assisted_stats = {'calls': 0, 'generated_tokens': 0, 'generation_time_s': 0.0,
+                               'draft_tokens': 0, 'accepted_tokens': 0}
+        self.load_assistant_model(assistant_model_name)
+
+        print(f"PAG bereit auf Gerät '{self.device}' (Modell: {model_name}, Quantisierung: {self.quantization or 'fp32'}). "
+              f"Das Modell wird bei Bedarf geladen.")
+
+    def _register_seq2seq(self, model_name: str) -> tuple:
+        """Registriert Tokenizer und Modell im Register und gibt den Schlüssel zurück."""
+        key = ("seq2seq", model_name, self.quantization, str(self.device))
+        quantization, device = self.quantization, self.device
+        default_registry.register(key, lambda: load_seq2seq(model_name, quantization, device))
+        return key
 
-        # Lade den Tokenizer und das Modell
-        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
-        self.model = AutoModelForSeq2SeqLM.from_pretrained(model_name).to(self.device)
+    @property
+    def _resources(self) -> "LoadedSeq2Seq":
+        return default_registry.get(self._resource_key)
 
-        print(f"PAG erfolgreich auf Gerät '{self.device}' initialisiert.")
+    @property
+    def tokenizer(self):
+        return self._resources.tokenizer
+
+    @property
+    def model(self):
+        return self._resources.model
+
+    @property
+    def _generate_lock(self) -> threading.Lock:
+        # Der Lock gehört zum geteilten Modell, nicht zur PAG-Instanz.
+        return self._resources.lock
+
+    @property
+    def num_decoder_layers(self) -> int:
+        return self.model.config.num_decoder_layers
+
+    @property
+    def assistant_model(self):
+        """Das Draft-Modell (beim ersten Zugriff geladen) oder None."""
+        if self._assistant_key is None:
+            return None
+        assistant = default_registry.get(self._assistant_key).model
+        if not self._assistant_checked:
+            if assistant.config.vocab_size != self.model.config.vocab_size:
+                raise ValueError(f"Das Draft-Modell '{self.assistant_model_name}' nutzt ein anderes Vokabular "
+                                 f"({assistant.config.vocab_size} statt {self.model.config.vocab_size} Tokens).")
+            self._assistant_checked = True
+        return assistant
+
+    def preload(self, background: bool = True) -> Optional[threading.Thread]:
+        """Lädt Modell (und Draft-Modell) vorab, standardmäßig in einem Hintergrund-Thread."""
+        keys = [self._resource_key] + ([self._assistant_key] if self._assistant_key else [])
+        return default_registry.preload(keys, background=background)
+
+    def unload(self):
+        """Gibt Modell und Draft-Modell im Register frei (auch für andere Instanzen)."""
+        default_registry.unload(self._resource_key)
+        if self._assistant_key is not None:
+            default_registry.unload(self._assistant_key)
+
+    def load_assistant_model(self, assistant_model_name: Optional[str]):
+        """
+        Setzt ein kleines Draft-Modell für Assisted Generation (oder entfernt es bei None).
+
+        Das Draft-Modell schlägt mehrere Tokens vor, die das große Modell in
+        einem einzigen Durchlauf prüft. Akzeptiert werden nur Tokens, die das
+        große Modell selbst gewählt hätte; die Ausgabe bei greedy Dekodierung
+        bleibt daher identisch. Es wird nur bei Einzel-Prompts genutzt.
+        """
+        if assistant_model_name is not None and assistant_model_name == self.model_name:
+            # Über das Register wäre das Draft-Modell dieselbe Instanz wie das Hauptmodell.
+            raise ValueError("Das Draft-Modell muss ein anderes (kleineres) Modell sein.")
+        self.assistant_model_name = assistant_model_name
+        self._assistant_checked = False
+        self._assistant_key = self._register_seq2seq(assistant_model_name) if assistant_model_name else None
+
+    def _sanitize_temperature(self, temperature: float) -> float:
+        """Die Temperatur für das Sampling darf nicht 0 oder kleiner sein."""
+        if temperature <= 0:
+            warnings.warn(f"Ungültige Temperatur {temperature} empfangen. Setze auf sicheren Mindestwert 0.1.")
+            return 0.1
+        return temperature
 
-    def infer(self, prompt: str, temperature: float) -> str:
+    def infer(self, prompt: str, temperature: float, **options) -> str:
         """
         Führt eine Inferenz mit dem geladenen Sprachmodell aus.
         Die Inferenz wird durch den Temperatur-Parameter aus dem ASC moduliert.
@@ -41,29 +273,353 @@ class PAG_Model:
             temperature (float): Der Sampling-Temperaturwert. Höhere Werte
                                  führen zu kreativeren, niedrigere zu
                                  konservativeren Ausgaben. Muss > 0 sein.
+            **options: Weitere Generierungsoptionen, siehe `infer_batch`.
 
         Returns:
             str: Die vom Modell generierte Textantwort.
         """
-        # Sicherheitsprüfung: Die Temperatur für model.generate darf nicht 0 oder kleiner sein.
-        if temperature <= 0:
-            warnings.warn(f"Ungültige Temperatur {temperature} empfangen. Setze auf sicheren Mindestwert 0.1.")
-            temperature = 0.1
+        return self.infer_batch([prompt], [temperature], **options)[0]
+
+    def infer_batch(self, prompts: List[str], temperatures: List[float],
+                    layer_drop_rate: float = 0.0, max_new_tokens: Optional[int] = None,
+                    stop_at_sentence_end: bool = False, max_time: Optional[float] = None,
+                    greedy: bool = False) -> List[str]:
+        """
+        Führt die Inferenz für mehrere Prompts in einem einzigen `generate`-Aufruf aus.
+
+        Die Prompts werden gepaddet und gemeinsam durch das Modell geschickt,
+        wodurch die CPU-Kerne bei mehreren Agenten besser ausgelastet werden.
+        Jede Zeile wird mit ihrer eigenen Temperatur gesampelt.
+
+        Args:
+            prompts (List[str]): Die Eingabeaufforderungen.
+            temperatures (List[float]): Eine Temperatur pro Prompt (jeweils > 0).
+            layer_drop_rate (float): Anteil der Decoder-Blöcke, die übersprungen werden
+                                     ("Tunnelblick", siehe `calculate_layer_drop_rate`).
+            max_new_tokens (int, optional): Token-Budget der Antwort (siehe
+                                     `calculate_token_budget`). Standard: max_length=128.
+            stop_at_sentence_end (bool): Beendet jede Antwort nach dem ersten Satz.
+            max_time (float, optional): Zeitbudget der Generierung in Sekunden.
+            greedy (bool): Greedy statt Temperatur-Sampling (deterministisch, Temperatur wird ignoriert).
 
-        # 1. Tokenisierung: Wandle den Text-Prompt in numerische IDs um.
-        input_ids = self.tokenizer(prompt, return_tensors="pt").input_ids.to(self.device)
+        Returns:
+            List[str]: Die generierten Antworten in der Reihenfolge der Eingabe.
+        """
+        if len(prompts) != len(temperatures):
+            raise ValueError("Für jeden Prompt muss genau eine Temperatur angegeben werden.")
+        if not prompts:
+            return []
+
+        temperatures = [self._sanitize_temperature(t) for t in temperatures]
+        variant = self._cache_variant(layer_drop_rate, max_new_tokens, stop_at_sentence_end, greedy)
+
+        # 0. Antwort-Cache: Treffer bei niedriger Temperatur brauchen keine Generierung.
+        results: List[Optional[str]] = [None] * len(prompts)
+        if self.response_cache is not None:
+            results = [self.response_cache.get(self.model_name, p, t, variant) for p, t in zip(prompts, temperatures)]
+        pending = [i for i, r in enumerate(results) if r is None]
+        if not pending:
+            return results
 
-        # 2. Generierung: Erzeuge die Antwort-IDs.
-        #    do_sample=True ist KRITISCH, um das Temperatur-Sampling zu aktivieren.
-        #    Ohne diesen Parameter wird die Temperatur ignoriert.
-        outputs = self.model.generate(
-            input_ids,
-            max_length=128,
-            temperature=temperature,
-            do_sample=True
-        )
+        # 1. Tokenisierung mit Padding, damit alle Prompts in einen Tensor passen.
+        encoded = self.tokenizer([prompts[i] for i in pending], return_tensors="pt", padding=True).to(self.device)
 
-        # 3. Dekodierung: Wandle die Antwort-IDs zurück in lesbaren Text.
-        decoded_output = self.tokenizer.decode(outputs[0], skip_special_tokens=True)
+        # 2. Generierung (siehe _generate).
+        outputs = self._generate(encoded, [temperatures[i] for i in pending], layer_drop_rate=layer_drop_rate,
+                                 max_new_tokens=max_new_tokens, stop_at_sentence_end=stop_at_sentence_end,
+                                 max_time=max_time, greedy=greedy)
+
+        # 3. Dekodierung: Jede Zeile des Outputs gehört zum Prompt am selben Index.
+        for i, text in zip(pending, self.tokenizer.batch_decode(outputs, skip_special_tokens=True)):
+            if stop_at_sentence_end:
+                # Im Batch laufen fertige Zeilen weiter, bis alle einen Satz beendet haben.
+                text = self._truncate_to_first_sentence(text)
+            results[i] = text
+            # Zeitlich abgeschnittene Antworten sind nicht reproduzierbar und werden nicht gecacht.
+            if self.response_cache is not None and max_time is None:
+                self.response_cache.put(self.model_name, prompts[i], temperatures[i], text, variant)
+        return results
+
+    def infer_stream(self, prompt: str, temperature: float,
+                     cancel_event: Optional[threading.Event] = None,
+                     layer_drop_rate: float = 0.0, max_new_tokens: Optional[int] = None,
+                     stop_at_sentence_end: bool = False, max_time: Optional[float] = None,
+                     greedy: bool = False) -> Iterator[str]:
+        """
+        Streaming-Variante von `infer`: liefert die Antwort stückweise, sobald
+        die Tokens dekodiert sind, statt erst nach der vollständigen Generierung.
 
-        return decoded_output
\ No newline at end of file
+        Args:
+            prompt (str): Die textbasierte Eingabeaufforderung für das Modell.
+            temperature (float): Der Sampling-Temperaturwert. Muss > 0 sein.
+            cancel_event (threading.Event, optional): Wird das Event gesetzt,
+                bricht die Generierung nach dem aktuellen Token ab.
+            layer_drop_rate, max_new_tokens, stop_at_sentence_end, max_time, greedy: Siehe `infer_batch`.
+
+        Yields:
+            str: Die nächsten dekodierten Textstücke der Antwort.
+        """
+        temperature = self._sanitize_temperature(temperature)
+        variant = self._cache_variant(layer_drop_rate, max_new_tokens, stop_at_sentence_end, greedy)
+        if self.response_cache is not None:
+            cached = self.response_cache.get(self.model_name, prompt, temperature, variant)
+            if cached is not None:
+                if cached:
+                    yield cached
+                return
+
+        encoded = self.tokenizer(prompt, return_tensors="pt").to(self.device)
+        streamer = TextIteratorStreamer(self.tokenizer, skip_special_tokens=True)
+
+        # Wird gesetzt, wenn der Aufrufer das Iterieren vorzeitig beendet.
+        abandoned = threading.Event()
+        errors = []
+
+        def run_generation():
+            try:
+                self._generate(encoded, [temperature], streamer=streamer,
+                               stopping_criteria=[CancellationCriteria(cancel_event, abandoned)],
+                               layer_drop_rate=layer_drop_rate, max_new_tokens=max_new_tokens,
+                               stop_at_sentence_end=stop_at_sentence_end, max_time=max_time, greedy=greedy)
+            except Exception as e:
+                # Den Streamer schließen, damit der Aufrufer nicht ewig wartet.
+                errors.append(e)
+                streamer.end()
+
+        worker = threading.Thread(target=run_generation, daemon=True)
+        worker.start()
+        pieces = []
+        try:
+            for piece in streamer:
+                if piece:
+                    pieces.append(piece)
+                    yield piece
+        finally:
+            abandoned.set()
+            worker.join()
+        if errors:
+            raise errors[0]
+
+        # Nur vollständige, nicht abgebrochene Antworten werden gecacht.
+        if self.response_cache is not None and max_time is None and not (cancel_event is not None and cancel_event.is_set()):
+            self.response_cache.put(self.model_name, prompt, temperature, "".join(pieces).strip(), variant)
+
+    def _encode(self, encoded) -> BaseModelOutput:
+        """
+        Führt den T5-Encoder aus und nutzt dabei den Encoder-Cache.
+
+        Schlüssel ist die exakte Token-Sequenz jeder Zeile (ohne Padding).
+        Nur die Zeilen ohne Cache-Treffer werden gemeinsam encodiert; danach
+        wird der gepaddete Batch aus den einzelnen Zeilen wieder zusammengesetzt.
+        Da die Padding-Positionen über die attention_mask ausgeblendet werden,
+        ist das Ergebnis identisch zu einem normalen Encoder-Durchlauf.
+        """
+        input_ids, attention_mask = encoded.input_ids, encoded.attention_mask
+        masks = [row.bool() for row in attention_mask]
+        keys = [tuple(ids[mask].tolist()) for ids, mask in zip(input_ids, masks)]
+        rows = [self.encoder_cache.get(key) for key in keys]
+
+        misses = [i for i, row in enumerate(rows) if row is None]
+        if misses:
+            with torch.no_grad():
+                hidden = self.model.get_encoder()(
+                    input_ids=input_ids[misses],
+                    attention_mask=attention_mask[misses],
+                    return_dict=True
+                ).last_hidden_state
+            for j, i in enumerate(misses):
+                rows[i] = hidden[j][masks[i]].clone()
+                self.encoder_cache.put(keys[i], rows[i])
+
+        batch_hidden = rows[0].new_zeros((input_ids.shape[0], input_ids.shape[1], rows[0].shape[-1]))
+        for i, row in enumerate(rows):
+            batch_hidden[i, masks[i]] = row
+        return BaseModelOutput(last_hidden_state=batch_hidden)
+
+    def get_stats(self) -> dict:
+        """Gibt die Laufzeit-Statistiken des PAG zurück (z.B. Trefferquote des Encoder-Caches)."""
+        return {
+            'encoder_cache': self.encoder_cache.get_stats() if self.encoder_cache else None,
+            'response_cache': self.response_cache.get_stats() if self.response_cache else None,
+            'layer_drop': dict(self.layer_drop_stats),
+            'last_call': dict(self.last_call_stats),
+            'assisted': self._assisted_summary(),
+        }
+
+    def _assisted_summary(self) -> Optional[dict]:
+        """Akzeptanzrate der Draft-Tokens und Durchsatz der assistierten Aufrufe."""
+        if self.assistant_model_name is None and self.assisted_stats['calls'] == 0:
+            return None
+        stats = dict(self.assisted_stats)
+        stats['assistant_model'] = self.assistant_model_name
+        stats['acceptance_rate'] = stats['accepted_tokens'] / stats['draft_tokens'] if stats['draft_tokens'] else 0.0
+        stats['tokens_per_s'] = (stats['generated_tokens'] / stats['generation_time_s']
+                                 if stats['generation_time_s'] > 0 else 0.0)
+        return stats
+
+    def _cache_variant(self, layer_drop_rate: float, max_new_tokens: Optional[int],
+                       stop_at_sentence_end: bool, greedy: bool = False) -> str:
+        """
+        Unterscheidet im Antwort-Cache Antworten, die mit anderen Generierungsoptionen
+        erzeugt wurden. Quantisierung und Draft-Modell gehören dazu, weil sie die
+        Zahlen und damit die gezogenen Tokens verändern können.
+        """
+        parts = []
+        if self.quantization:
+            parts.append(f"quant={self.quantization}")
+        if self.assistant_model_name:
+            parts.append(f"assist={self.assistant_model_name}")
+        skipped = self._num_skipped_layers(layer_drop_rate)
+        if skipped:
+            parts.append(f"drop={skipped}")
+        if max_new_tokens is not None:
+            parts.append(f"tokens={max_new_tokens}")
+        if stop_at_sentence_end:
+            parts.append("sentence")
+        if greedy:
+            parts.append("greedy")
+        return ",".join(parts)
+
+    def _sentence_end_ids(self) -> torch.Tensor:
+        """Alle Token-IDs, deren Text auf ein Satzzeichen endet (einmalig berechnet)."""
+        if self._sentence_end_token_ids is None:
+            ids = [i for token, i in self.tokenizer.get_vocab().items()
+                   if token.rstrip().endswith(('.', '!', '?'))]
+            self._sentence_end_token_ids = torch.tensor(ids, dtype=torch.long)
+        return self._sentence_end_token_ids
+
+    @staticmethod
+    def _truncate_to_first_sentence(text: str) -> str:
+        for i, char in enumerate(text):
+            if char in ".!?":
+                return text[:i + 1]
+        return text
+
+    def _num_skipped_layers(self, layer_drop_rate: float) -> int:
+        """Block 0 trägt den relativen Positions-Bias und wird nie übersprungen."""
+        if layer_drop_rate <= 0:
+            return 0
+        total = self.num_decoder_layers
+        return max(0, min(total - 1, int(round(layer_drop_rate * total))))
+
+    @contextmanager
+    def _skipped_decoder_layers(self, layer_drop_rate: float):
+        """
+        Entfernt für die Dauer des Kontexts die obersten Decoder-Blöcke (Early Exit).
+        Die Ausgabe des letzten verbliebenen Blocks geht direkt in die finale
+        LayerNorm und den LM-Head. Liefert die Anzahl der übersprungenen Blöcke.
+        """
+        skipped = self._num_skipped_layers(layer_drop_rate)
+        if skipped == 0:
+            yield 0
+            return
+        decoder = self.model.decoder
+        full_blocks = decoder.block
+        decoder.block = torch.nn.ModuleList(list(full_blocks)[:len(full_blocks) - skipped])
+        try:
+            yield skipped
+        finally:
+            decoder.block = full_blocks
+
+    def _record_call_stats(self, latency: float, generated_tokens: int, skipped_layers: int):
+        """
+        Misst die Latenz jedes Aufrufs. Die Ersparnis durch übersprungene Layer
+        wird gegen den gleitenden Mittelwert der Latenz pro Token bei voller
+        Tiefe geschätzt.
+        """
+        per_token = latency / max(1, generated_tokens)
+        savings = 0.0
+        if skipped_layers == 0:
+            baseline = self._full_depth_latency_per_token
+            self._full_depth_latency_per_token = per_token if baseline is None else 0.8 * baseline + 0.2 * per_token
+        elif self._full_depth_latency_per_token is not None:
+            savings = (self._full_depth_latency_per_token - per_token) * generated_tokens
+            self.layer_drop_stats['calls'] += 1
+            self.layer_drop_stats['skipped_layers_total'] += skipped_layers
+            self.layer_drop_stats['estimated_savings_s'] += savings
+
+        self.last_call_stats = {
+            'latency_s': latency,
+            'generated_tokens': generated_tokens,
+            'skipped_layers': skipped_layers,
+            'total_layers': self.num_decoder_layers,
+            'estimated_savings_s': savings,
+            'assisted': False,
+        }
+
+    def _record_assisted_stats(self, latency: float, generated_tokens: int, draft_tokens: int, verify_passes: int):
+        """
+        Jeder Prüfdurchlauf des großen Modells liefert die akzeptierten Draft-Tokens
+        plus ein eigenes Token. Daraus ergibt sich die Zahl der akzeptierten Vorschläge.
+        """
+        accepted = max(0, min(draft_tokens, generated_tokens - verify_passes))
+        self.assisted_stats['calls'] += 1
+        self.assisted_stats['generated_tokens'] += generated_tokens
+        self.assisted_stats['generation_time_s'] += latency
+        self.assisted_stats['draft_tokens'] += draft_tokens
+        self.assisted_stats['accepted_tokens'] += accepted
+        self.last_call_stats.update({
+            'assisted': True,
+            'draft_tokens': draft_tokens,
+            'accepted_tokens': accepted,
+            'acceptance_rate': accepted / draft_tokens if draft_tokens else 0.0,
+            'tokens_per_s': generated_tokens / latency if latency > 0 else 0.0,
+        })
+
+    def _generate(self, encoded, temperatures: List[float], streamer=None, stopping_criteria=None,
+                  layer_drop_rate: float = 0.0, max_new_tokens: Optional[int] = None,
+                  stop_at_sentence_end: bool = False, max_time: Optional[float] = None,
+                  greedy: bool = False) -> torch.Tensor:
+        """
+        Gemeinsamer `generate`-Aufruf für `infer_batch` und `infer_stream`.
+
+        Die globale Temperatur bleibt 1.0, die eigentliche Skalierung übernimmt
+        der zeilenweise Warper. do_sample=True ist KRITISCH, um das
+        Temperatur-Sampling zu aktivieren. Ohne diesen Parameter wird die
+        Temperatur ignoriert.
+
+        Ist ein Draft-Modell geladen und besteht der Batch aus nur einem Prompt,
+        läuft die Generierung assistiert (transformers unterstützt dabei nur
+        batch_size 1). Auch beim Sampling entspricht jedes akzeptierte Token dem,
+        das das große Modell selbst gezogen hat.
+
+        Der Lock serialisiert die Generierung, da das Überspringen von Layern
+        das Modell für die Dauer des Aufrufs verändert.
+        """
+        row_temperatures = torch.tensor(temperatures, dtype=torch.float32, device=self.device)
+        stopping_criteria = list(stopping_criteria or [])
+        if stop_at_sentence_end:
+            finished_ids = torch.tensor([self.tokenizer.eos_token_id, self.tokenizer.pad_token_id], dtype=torch.long)
+            stopping_criteria.append(SentenceEndCriteria(self._sentence_end_ids(), finished_ids))
+        # Ohne eigenes Budget bleibt es beim bisherigen Standard von max_length=128.
+        length_budget = {'max_new_tokens': max_new_tokens} if max_new_tokens is not None else {'max_length': 128}
+        assistant = self.assistant_model if encoded.input_ids.shape[0] == 1 else None
+        with self._generate_lock, self._skipped_decoder_layers(layer_drop_rate) as skipped, \
+                ForwardCallCounter(self.model if assistant is not None else None) as verify_passes, \
+                ForwardCallCounter(assistant) as draft_passes:
+            start = time.perf_counter()
+            if self.encoder_cache is not None and assistant is None:
+                # Der Encoder läuft vorab über den Cache; generate überspringt ihn dann.
+                # Das Draft-Modell braucht dagegen die input_ids für seinen eigenen Encoder.
+                model_inputs = {'encoder_outputs': self._encode(encoded)}
+            else:
+                model_inputs = {'input_ids': encoded.input_ids}
+            outputs = self.model.generate(
+                **model_inputs,
+                attention_mask=encoded.attention_mask,
+                **length_budget,
+                max_time=max_time,
+                temperature=1.0,
+                do_sample=not greedy,
+                logits_processor=LogitsProcessorList([PerRowTemperatureWarper(row_temperatures)]),
+                stopping_criteria=StoppingCriteriaList(stopping_criteria),
+                streamer=streamer,
+                assistant_model=assistant
+            )
+            latency = time.perf_counter() - start
+            # Die erste Spalte ist das Decoder-Start-Token.
+            generated_tokens = outputs.shape[1] - 1
+            self._record_call_stats(latency, generated_tokens, skipped)
+            if assistant is not None:
+                self._record_assisted_stats(latency, generated_tokens, draft_passes.calls, verify_passes.calls)
+        return outputs
@@ -0,0 +1,195 @@
+# pag/scheduler.py
+import queue
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import Future
+from typing import Iterator, List
+
+
+class _InferenceRequest:
+    """Ein einzelner, wartender `infer`-Aufruf in der Warteschlange."""
+
+    __slots__ = ("prompt", "temperature", "options", "future", "enqueued_at")
+
+    def __init__(self, prompt: str, temperature: float, options: dict):
+        self.prompt = prompt
+        self.temperature = temperature
+        # Generierungsoptionen (z.B. layer_drop_rate); nur Anfragen mit
+        # identischen Optionen können gemeinsam generiert werden.
+        self.options = tuple(sorted(options.items()))
+        self.future: Future = Future()
+        self.enqueued_at = time.perf_counter()
+
+
+class InferenceScheduler:
+    """
+    Micro-Batching-Scheduler vor einem gemeinsam genutzten PAG_Model.
+
+    Mehrere CAPA_Agent-Instanzen rufen `infer` gleichzeitig auf. Ein
+    Dispatcher-Thread sammelt diese Aufrufe innerhalb eines kleinen
+    Zeitfensters (oder bis zur maximalen Batch-Größe) und führt jede Gruppe
+    als eine gepaddete Generierung über `PAG_Model.infer_batch` aus.
+
+    Der Scheduler bietet dieselbe `infer`- und `infer_stream`-Schnittstelle
+    wie das PAG_Model und kann daher direkt als `pag_model` an den Agenten
+    übergeben werden.
+    """
+
+    # Anzahl der Wartezeiten, die für die Statistik aufbewahrt werden.
+    WAIT_TIME_WINDOW = 1000
+
+    def __init__(self, pag_model, max_batch_size: int = 8, max_wait_ms: float = 10.0):
+        """
+        Args:
+            pag_model: Das PAG_Model (oder ein Objekt mit `infer_batch`), das die Batches ausführt.
+            max_batch_size (int): Maximale Anzahl an Prompts pro Generierung.
+            max_wait_ms (float): Wie lange der Dispatcher nach der ersten Anfrage
+                                 auf weitere Anfragen wartet, bevor er generiert.
+        """
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size muss mindestens 1 sein.")
+        self.pag = pag_model
+        self.max_batch_size = max_batch_size
+        self.max_wait_s = max_wait_ms / 1000.0
+
+        self._queue: "queue.Queue[_InferenceRequest]" = queue.Queue()
+        # Batches und Streams laufen nie gleichzeitig auf dem Modell.
+        self._model_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        # Prüfen und Einreihen geschehen atomar zum Herunterfahren: keine Anfrage landet unbearbeitet in der Warteschlange.
+        self._submit_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._batch_size_histogram: Counter = Counter()
+        self._wait_times_ms = deque(maxlen=self.WAIT_TIME_WINDOW)
+        self._completed_requests = 0
+
+        self._dispatcher = threading.Thread(target=self._dispatch_loop, name="pag-scheduler", daemon=True)
+        self._dispatcher.start()
+
+    def submit(self, prompt: str, temperature: float, **options) -> Future:
+        """
+        Stellt einen Prompt in die Warteschlange und gibt ein Future auf die Antwort zurück.
+        `options` werden unverändert an `PAG_Model.infer_batch` weitergereicht.
+        """
+        request = _InferenceRequest(prompt, temperature, options)
+        with self._submit_lock:
+            if self._stop_event.is_set():
+                raise RuntimeError("Der Scheduler wurde bereits heruntergefahren.")
+            self._queue.put(request)
+        return request.future
+
+    def infer(self, prompt: str, temperature: float, **options) -> str:
+        """Blockierender Drop-in-Ersatz für `PAG_Model.infer`."""
+        return self.submit(prompt, temperature, **options).result()
+
+    def infer_batch(self, prompts: List[str], temperatures: List[float], **options) -> List[str]:
+        """Drop-in-Ersatz für `PAG_Model.infer_batch`; die Prompts werden einzeln eingereiht."""
+        if len(prompts) != len(temperatures):
+            raise ValueError("Für jeden Prompt muss genau eine Temperatur angegeben werden.")
+        futures = [self.submit(p, t, **options) for p, t in zip(prompts, temperatures)]
+        return [f.result() for f in futures]
+
+    def infer_stream(self, prompt: str, temperature: float, **options) -> Iterator[str]:
+        """
+        Drop-in-Ersatz für `PAG_Model.infer_stream`. Streams werden nicht
+        gebündelt, sondern direkt an das Modell durchgereicht; solange
+        gestreamt wird, wartet der Dispatcher mit dem nächsten Batch.
+        """
+        if self._stop_event.is_set():
+            raise RuntimeError("Der Scheduler wurde bereits heruntergefahren.")
+        with self._model_lock:
+            yield from self.pag.infer_stream(prompt, temperature, **options)
+
+    def _collect_batch(self) -> List[_InferenceRequest]:
+        """Wartet auf die erste Anfrage und sammelt dann bis zum Ende des Zeitfensters."""
+        try:
+            first = self._queue.get(timeout=0.1)
+        except queue.Empty:
+            return []
+
+        batch = [first]
+        deadline = first.enqueued_at + self.max_wait_s
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                if remaining <= 0:
+                    # Fenster abgelaufen: nur noch bereits wartende Anfragen mitnehmen.
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _dispatch_loop(self):
+        while not (self._stop_event.is_set() and self._queue.empty()):
+            batch = self._collect_batch()
+            # Vom Aufrufer abgebrochene Futures werden nicht mehr generiert.
+            batch = [r for r in batch if r.future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+
+            # Anfragen mit unterschiedlichen Optionen werden getrennt generiert.
+            groups = {}
+            for request in batch:
+                groups.setdefault(request.options, []).append(request)
+            for options, group in groups.items():
+                self._run_group(group, dict(options))
+
+    def _run_group(self, group: List[_InferenceRequest], options: dict):
+        dispatched_at = time.perf_counter()
+        with self._stats_lock:
+            self._batch_size_histogram[len(group)] += 1
+            self._wait_times_ms.extend((dispatched_at - r.enqueued_at) * 1000.0 for r in group)
+
+        try:
+            with self._model_lock:
+                outputs = self.pag.infer_batch([r.prompt for r in group], [r.temperature for r in group], **options)
+        except Exception as e:
+            for request in group:
+                request.future.set_exception(e)
+            return
+
+        for request, output in zip(group, outputs):
+            request.future.set_result(output)
+        with self._stats_lock:
+            self._completed_requests += len(group)
+
+    def get_stats(self) -> dict:
+        """
+        Gibt die aktuellen Scheduler-Statistiken zurück.
+
+        Returns:
+            dict: Warteschlangentiefe, Histogramm der Batch-Größen und
+                  Wartezeit-Statistiken (in ms) über die letzten Anfragen.
+        """
+        with self._stats_lock:
+            histogram = dict(sorted(self._batch_size_histogram.items()))
+            wait_times = sorted(self._wait_times_ms)
+            completed = self._completed_requests
+
+        batches = sum(histogram.values())
+        stats = {
+            'queue_depth': self._queue.qsize(),
+            'batches': batches,
+            'completed_requests': completed,
+            'batch_size_histogram': histogram,
+            'mean_batch_size': (sum(size * n for size, n in histogram.items()) / batches) if batches else 0.0,
+            'wait_ms': {'mean': 0.0, 'p50': 0.0, 'p95': 0.0, 'max': 0.0},
+        }
+        if wait_times:
+            stats['wait_ms'] = {
+                'mean': sum(wait_times) / len(wait_times),
+                'p50': wait_times[int(0.50 * (len(wait_times) - 1))],
+                'p95': wait_times[int(0.95 * (len(wait_times) - 1))],
+                'max': wait_times[-1],
+            }
+        return stats
+
+    def shutdown(self, wait: bool = True):
+        """Nimmt keine neuen Anfragen mehr an und arbeitet die Warteschlange noch ab."""
+        with self._submit_lock:
+            self._stop_event.set()
+        if wait:
+            self._dispatcher.join()
@@ -0,0 +1,396 @@
+# perception/audio.py
+import abc
+import queue
+import threading
+import time
+import wave
+from collections import deque
+from typing import Callable, Dict, List, Optional, Sequence, Union
+
+import numpy as np
+
+
+class AudioRingBuffer:
+    """Ringpuffer fester Größe für Mono-Samples (float32); hält die letzten `capacity` Samples."""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._data = np.zeros(capacity, dtype=np.float32)
+        self._lock = threading.Lock()
+        self.total_written = 0
+
+    def write(self, samples: np.ndarray):
+        samples = np.asarray(samples, dtype=np.float32).reshape(-1)
+        # Passt der Block nicht hinein, zählen die vorderen Samples als sofort überschrieben.
+        skipped = max(0, len(samples) - self.capacity)
+        samples = samples[skipped:]
+        with self._lock:
+            start = (self.total_written + skipped) % self.capacity
+            first = min(len(samples), self.capacity - start)
+            self._data[start:start + first] = samples[:first]
+            self._data[:len(samples) - first] = samples[first:]
+            self.total_written += skipped + len(samples)
+
+    def latest(self, n: int) -> np.ndarray:
+        """Die letzten n Samples (weniger, falls noch nicht so viele geschrieben wurden), älteste zuerst."""
+        with self._lock:
+            n = min(n, self.capacity, self.total_written)
+            end = self.total_written % self.capacity
+            if n <= end:
+                return self._data[end - n:end].copy()
+            return np.concatenate([self._data[self.capacity - (n - end):], self._data[:end]])
+
+
+def frame_energy_db(frames: np.ndarray) -> np.ndarray:
+    """RMS-Energie je Zeile in dBFS."""
+    rms = np.sqrt(np.mean(np.square(frames, dtype=np.float64), axis=-1))
+    return 20 * np.log10(np.maximum(rms, 1e-10))
+
+
+class EnergyVAD:
+    """
+    Einfache Sprachaktivitätserkennung über die Energie kurzer Frames.
+
+    Ein Frame gilt als stimmhaft, wenn seine Energie über `threshold_db` und
+    `margin_db` über dem laufend geschätzten Grundrauschen liegt. Eine Äußerung
+    beginnt mit dem ersten stimmhaften Frame (plus `pre_roll_ms` davor) und endet
+    nach `hangover_ms` Stille. Äußerungen mit weniger als `min_speech_ms`
+    stimmhaften Frames (Klicks, Klopfen) werden verworfen.
+
+    Zusätzlich folgt das Grundrauschen dem Minimum der Energie über die letzten
+    `noise_window_s` (Minimum-Statistik): Auch flüssige Sprache hat Pausen, ein
+    dauerhaftes Rauschen (Lüfter, Verkehr) über `threshold_db` dagegen nicht.
+    Es hebt das Grundrauschen an, statt als endlose Äußerung zu gelten.
+    """
+
+    def __init__(self, samplerate: int = 16000, frame_ms: int = 30, threshold_db: float = -45.0,
+                 margin_db: float = 10.0, min_speech_ms: int = 150, hangover_ms: int = 400,
+                 pre_roll_ms: int = 200, max_utterance_s: float = 20.0, noise_window_s: float = 5.0):
+        self.samplerate = samplerate
+        self.frame_ms = frame_ms
+        self.frame_size = samplerate * frame_ms // 1000
+        self.threshold_db = threshold_db
+        self.margin_db = margin_db
+        self.min_speech_frames = max(1, min_speech_ms // frame_ms)
+        self.hangover_frames = max(1, hangover_ms // frame_ms)
+        self.max_utterance_frames = int(max_utterance_s * 1000 / frame_ms)
+        self.noise_floor_db = threshold_db - margin_db
+        self._recent_energy: deque = deque(maxlen=max(1, int(noise_window_s * 1000 / frame_ms)))
+
+        self._rest = np.zeros(0, dtype=np.float32)
+        self._pre_roll: deque = deque(maxlen=max(0, pre_roll_ms // frame_ms))
+        self._utterance: List[np.ndarray] = []
+        self._voiced = 0
+        self._silence = 0
+        self.frames = 0
+        self.voiced_frames = 0
+        self.utterances = 0
+        self.discarded = 0
+
+    @property
+    def in_speech(self) -> bool:
+        return bool(self._utterance)
+
+    def is_voiced(self, energy_db: float) -> bool:
+        return energy_db > max(self.threshold_db, self.noise_floor_db + self.margin_db)
+
+    def process(self, samples: np.ndarray) -> List[np.ndarray]:
+        """Verarbeitet neue Samples und gibt die dabei abgeschlossenen Äußerungen zurück."""
+        samples = np.concatenate([self._rest, np.asarray(samples, dtype=np.float32).reshape(-1)])
+        n_frames = len(samples) // self.frame_size
+        self._rest = samples[n_frames * self.frame_size:]
+        if n_frames == 0:
+            return []
+        frames = samples[:n_frames * self.frame_size].reshape(n_frames, self.frame_size)
+        finished = []
+        for frame, energy in zip(frames, frame_energy_db(frames)):
+            self.frames += 1
+            voiced = self.is_voiced(energy)
+            if voiced:
+                self.voiced_frames += 1
+            elif not self.in_speech:
+                # Stille Frames außerhalb von Sprache führen das Grundrauschen direkt nach.
+                self.noise_floor_db += 0.05 * (energy - self.noise_floor_db)
+            self._recent_energy.append(energy)
+            if len(self._recent_energy) == self._recent_energy.maxlen:
+                # Selbst das leiseste Frame des Fensters liegt darüber: das Rauschen ist lauter geworden.
+                window_floor = min(self._recent_energy)
+                if window_floor > self.noise_floor_db:
+                    self.noise_floor_db += 0.05 * (window_floor - self.noise_floor_db)
+            if not self.in_speech:
+                if voiced:
+                    self._utterance = list(self._pre_roll) + [frame]
+                    self._voiced, self._silence = 1, 0
+                else:
+                    self._pre_roll.append(frame)
+                continue
+            self._utterance.append(frame)
+            if voiced:
+                self._voiced += 1
+                self._silence = 0
+            else:
+                self._silence += 1
+            if self._silence >= self.hangover_frames or len(self._utterance) >= self.max_utterance_frames:
+                utterance = self._end_utterance()
+                if utterance is not None:
+                    finished.append(utterance)
+        return finished
+
+    def _end_utterance(self) -> Optional[np.ndarray]:
+        frames, voiced = self._utterance, self._voiced
+        self._utterance, self._voiced, self._silence = [], 0, 0
+        self._pre_roll.clear()
+        if voiced < self.min_speech_frames:
+            self.discarded += 1
+            return None
+        self.utterances += 1
+        return np.concatenate(frames)
+
+    def flush(self) -> List[np.ndarray]:
+        """Beendet eine laufende Äußerung (z.B. am Ende einer Datei)."""
+        utterance = self._end_utterance() if self.in_speech else None
+        return [utterance] if utterance is not None else []
+
+    def get_stats(self) -> dict:
+        return {
+            'frames': self.frames,
+            'voiced_ratio': self.voiced_frames / self.frames if self.frames else 0.0,
+            'utterances': self.utterances,
+            'discarded': self.discarded,
+            'noise_floor_db': self.noise_floor_db,
+            'threshold_db': max(self.threshold_db, self.noise_floor_db + self.margin_db),
+        }
+
+
+class AudioSource(abc.ABC):
+    """
+    Schnittstelle für Audioquellen (Mono, float32, `samplerate`).
+
+    `read` liefert die seit dem letzten Aufruf angefallenen Samples und wartet
+    höchstens `timeout` Sekunden; `finished` ist wahr, wenn keine mehr kommen.
+    """
+
+    samplerate: int = 16000
+
+    def start(self) -> bool:
+        return True
+
+    @abc.abstractmethod
+    def read(self, timeout: float = 0.1) -> np.ndarray:
+        pass
+
+    @property
+    def finished(self) -> bool:
+        return False
+
+    def close(self):
+        pass
+
+
+class MicrophoneSource(AudioSource):
+    """Fortlaufender Eingabestrom von `sounddevice`; der Callback reicht die Blöcke nur weiter."""
+
+    def __init__(self, samplerate: int = 16000, blocksize: int = 1600, device=None):
+        self.samplerate = samplerate
+        self.blocksize = blocksize
+        self.device = device
+        self._blocks: "queue.Queue[np.ndarray]" = queue.Queue()
+        self._stream = None
+        self.overflows = 0
+
+    def start(self) -> bool:
+        import sounddevice as sd
+
+        def callback(indata, frames, time_info, status):
+            if status.input_overflow:
+                self.overflows += 1
+            self._blocks.put(indata[:, 0].copy())
+
+        self._stream = sd.InputStream(samplerate=self.samplerate, blocksize=self.blocksize, channels=1,
+                                      dtype='float32', device=self.device, callback=callback)
+        self._stream.start()
+        return True
+
+    def read(self, timeout: float = 0.1) -> np.ndarray:
+        try:
+            blocks = [self._blocks.get(timeout=timeout)]
+        except queue.Empty:
+            return np.zeros(0, dtype=np.float32)
+        while True:
+            try:
+                blocks.append(self._blocks.get_nowait())
+            except queue.Empty:
+                return np.concatenate(blocks)
+
+    def close(self):
+        if self._stream is not None:
+            self._stream.stop()
+            self._stream.close()
+            self._stream = None
+
+
+def load_wav(path: str, samplerate: int = 16000) -> np.ndarray:
+    """Liest eine PCM-WAV-Datei als Mono-float32 in [-1, 1], linear umgerechnet auf `samplerate`."""
+    with wave.open(path, 'rb') as wav:
+        width, channels, rate = wav.getsampwidth(), wav.getnchannels(), wav.getframerate()
+        raw = wav.readframes(wav.getnframes())
+    if width == 1:
+        samples = (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128) / 128
+    elif width in (2, 4):
+        dtype = np.int16 if width == 2 else np.int32
+        samples = np.frombuffer(raw, dtype=dtype).astype(np.float32) / np.iinfo(dtype).max
+    else:
+        raise ValueError(f"Nicht unterstützte Sample-Breite: {width} Bytes ({path}).")
+    samples = samples.reshape(-1, channels).mean(axis=1)
+    if rate != samplerate and len(samples):
+        positions = np.arange(int(len(samples) * samplerate / rate)) * rate / samplerate
+        samples = np.interp(positions, np.arange(len(samples)), samples).astype(np.float32)
+    return samples
+
+
+class WavFileSource(AudioSource):
+    """
+    Spielt WAV-Dateien als Audioquelle ab, für Tests und Messungen ohne Mikrofon.
+
+    Mehrere Dateien werden nacheinander abgespielt, getrennt durch `gap_s`
+    Sekunden Stille. Mit `realtime=True` kommen die Samples im Tempo der
+    Aufnahme, sonst so schnell wie sie gelesen werden.
+    """
+
+    def __init__(self, path: Union[str, Sequence[str]], samplerate: int = 16000, realtime: bool = True,
+                 chunk_s: float = 0.1, gap_s: float = 1.0):
+        self.paths = [path] if isinstance(path, str) else list(path)
+        self.samplerate = samplerate
+        self.realtime = realtime
+        self.chunk = max(1, int(samplerate * chunk_s))
+        gap = np.zeros(int(samplerate * gap_s), dtype=np.float32)
+        parts = []
+        for i, wav_path in enumerate(self.paths):
+            parts += [gap, load_wav(wav_path, samplerate)] if i else [load_wav(wav_path, samplerate)]
+        self._samples = np.concatenate(parts) if parts else np.zeros(0, dtype=np.float32)
+        self._position = 0
+        self._started_at: Optional[float] = None
+
+    def start(self) -> bool:
+        if not len(self._samples):
+            return False
+        self._started_at = time.perf_counter()
+        return True
+
+    def read(self, timeout: float = 0.1) -> np.ndarray:
+        if self._started_at is None:
+            self.start()
+        end = min(len(self._samples), self._position + self.chunk)
+        if self.realtime:
+            # Nur liefern, was bei Echtzeit-Wiedergabe bis jetzt aufgenommen wäre.
+            due = self._started_at + end / self.samplerate
+            wait = due - time.perf_counter()
+            if wait > timeout:
+                time.sleep(timeout)
+                return np.zeros(0, dtype=np.float32)
+            if wait > 0:
+                time.sleep(wait)
+        samples = self._samples[self._position:end]
+        self._position = end
+        return samples
+
+    @property
+    def finished(self) -> bool:
+        return self._position >= len(self._samples)
+
+
+class AudioListener:
+    """
+    Hört fortlaufend zu: Ein Thread liest die Quelle, schreibt in einen
+    Ringpuffer und zerlegt den Strom per `EnergyVAD` in Äußerungen.
+
+    Jede abgeschlossene Äußerung ({'audio', 'ended_at'}) geht sofort an
+    `on_utterance` (z.B. um die Transkription zu starten) und wird bis zum
+    nächsten `drain` aufbewahrt. Stille erzeugt keine Äußerungen.
+    """
+
+    def __init__(self, source: AudioSource, vad: Optional[EnergyVAD] = None, buffer_s: float = 30.0,
+                 on_utterance: Optional[Callable[[Dict], None]] = None):
+        self.source = source
+        self.vad = vad or EnergyVAD(samplerate=source.samplerate)
+        self.buffer = AudioRingBuffer(int(buffer_s * source.samplerate))
+        self.on_utterance = on_utterance
+        self._utterances: List[Dict] = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def samplerate(self) -> int:
+        return self.source.samplerate
+
+    @property
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> bool:
+        if self.is_running:
+            return True
+        if not self.source.start():
+            return False
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="audio-listener", daemon=True)
+        self._thread.start()
+        return True
+
+    def _run(self):
+        while not self._stop.is_set():
+            samples = self.source.read(timeout=0.1)
+            if len(samples):
+                self.buffer.write(samples)
+                self._emit(self.vad.process(samples))
+            elif self.source.finished:
+                self._emit(self.vad.flush())
+                return
+
+    def _emit(self, utterances: List[np.ndarray]):
+        for audio in utterances:
+            utterance = {'audio': audio, 'ended_at': time.time()}
+            with self._lock:
+                self._utterances.append(utterance)
+            if self.on_utterance is not None:
+                try:
+                    self.on_utterance(utterance)
+                except Exception as e:
+                    print(f"WARNING: Utterance callback failed: {e}")
+
+    def drain(self) -> List[Dict]:
+        """Die seit dem letzten Aufruf abgeschlossenen Äußerungen."""
+        with self._lock:
+            utterances, self._utterances = self._utterances, []
+        return utterances
+
+    def recent(self, seconds: float) -> np.ndarray:
+        """Die zuletzt gehörten `seconds` Sekunden Audio."""
+        return self.buffer.latest(int(seconds * self.samplerate))
+
+    def is_silent(self, samples: np.ndarray) -> bool:
+        """Wahr, wenn kein Frame der Samples die Sprachschwelle des VAD erreicht."""
+        n_frames = len(samples) // self.vad.frame_size
+        if n_frames == 0:
+            return True
+        frames = samples[:n_frames * self.vad.frame_size].reshape(n_frames, self.vad.frame_size)
+        return not any(self.vad.is_voiced(energy) for energy in frame_energy_db(frames))
+
+    def wait_until_finished(self, timeout: Optional[float] = None):
+        """Wartet, bis eine endliche Quelle (z.B. eine Datei) vollständig verarbeitet ist."""
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def close(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.source.close()
+
+    def get_stats(self) -> dict:
+        stats = self.vad.get_stats()
+        stats.update({'running': self.is_running, 'samples_heard': self.buffer.total_written,
+                      'seconds_heard': self.buffer.total_written / self.samplerate})
+        return stats
@@ -0,0 +1,112 @@
+# perception/benchmark.py
+import argparse
+import contextlib
+import io
+import time
+from typing import Dict, Optional
+
+from perception.sources import open_replay
+from perception.subsystem import PerceptionSubsystem, SCENE_CHANGE_THRESHOLD
+
+# (Stufe, Modell, Einheit): die Stufen, die `PerceptionSubsystem` in `stage_stats` misst.
+MODEL_STAGES = (
+    ('scene', 'Szenenfilter', 'Bilder'),
+    ('caption', 'BLIP', 'Bilder'),
+    ('transcribe', 'Whisper', 'Äußerungen'),
+    ('classify', 'HuBERT', 'Fenster'),
+)
+
+
+def benchmark_replay(directory: str, realtime: bool = False, fps: float = 1.0,
+                     scene_change_threshold: Optional[float] = SCENE_CHANGE_THRESHOLD,
+                     max_cycles: Optional[int] = None, cycle_s: Optional[float] = None) -> Dict[str, dict]:
+    """
+    Spielt ein Verzeichnis mit Aufzeichnungen (Bilder oder Video, WAV-Dateien)
+    durch die Wahrnehmung und misst den Durchsatz jeder Modellstufe.
+
+    Wie im Agenten läuft ein Zyklus nach dem anderen (`perceive`), bis beide
+    Quellen erschöpft sind; das Zuhören und Transkribieren läuft nebenher.
+    `cycle_s` ist der Mindestabstand der Zyklen (wie `--cycle_time` in
+    run_embodied.py); bei Echtzeit ist er standardmäßig ein Bild der Aufnahme.
+
+    Returns:
+        dict: {'wall_s', 'cycles', 'audio_s', 'scene', 'stages': {Stufe: {'count', 'total_ms',
+        'per_s' (bezogen auf die Rechenzeit der Stufe), 'wall_per_s'}}}
+    """
+    frames, audio = open_replay(directory, realtime=realtime, fps=fps)
+    perception = PerceptionSubsystem(frame_source=frames, audio_source=audio,
+                                     scene_change_threshold=scene_change_threshold)
+    perception.preload(background=False)
+    if cycle_s is None and realtime and frames.fps:
+        cycle_s = 1.0 / frames.fps
+    cycles = 0
+    start = time.perf_counter()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            while max_cycles is None or cycles < max_cycles:
+                vision_done = not perception.vision_enabled or frames.finished
+                audio_done = not perception.audio_enabled or not perception.listener.is_running
+                if vision_done and audio_done:
+                    break
+                perception.perceive()
+                cycles += 1
+                if cycle_s:
+                    time.sleep(max(0.0, start + cycles * cycle_s - time.perf_counter()))
+    finally:
+        # Wartet auch auf die noch laufenden Transkriptionen.
+        perception.close()
+    wall_s = time.perf_counter() - start
+
+    stats = perception.get_stats()
+    stages = {}
+    for stage, _, _ in MODEL_STAGES:
+        s = stats['stages'].get(stage, {'count': 0, 'total_ms': 0.0})
+        stages[stage] = {
+            'count': s['count'],
+            'total_ms': s['total_ms'],
+            'per_s': 1000 * s['count'] / s['total_ms'] if s['total_ms'] else 0.0,
+            'wall_per_s': s['count'] / wall_s if wall_s else 0.0,
+        }
+    return {
+        'wall_s': wall_s,
+        'cycles': cycles,
+        'audio_s': stats['audio']['seconds_heard'] if stats['audio'] else 0.0,
+        'utterances': stats['utterances'],
+        'scene': stats['scene'],
+        'stages': stages,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Durchsatz der Wahrnehmung auf aufgezeichneten Sensordaten.")
+    parser.add_argument("directory", help="Verzeichnis mit Bildern oder einem Video und WAV-Dateien.")
+    parser.add_argument("--realtime", action="store_true",
+                        help="Im Tempo der Aufnahme abspielen (sonst so schnell wie möglich).")
+    parser.add_argument("--fps", type=float, default=1.0, help="Bildrate für Bildverzeichnisse.")
+    parser.add_argument("--scene_threshold", type=float, default=SCENE_CHANGE_THRESHOLD,
+                        help="Schwelle des Szenenfilters.")
+    parser.add_argument("--no_scene_filter", action="store_true", help="Jedes Bild neu beschreiben.")
+    parser.add_argument("--max_cycles", type=int, default=None, help="Höchstzahl der Wahrnehmungszyklen.")
+    parser.add_argument("--cycle_time", type=float, default=None,
+                        help="Mindestabstand der Zyklen in Sekunden (Standard bei Echtzeit: ein Bild).")
+    args = parser.parse_args()
+
+    threshold = None if args.no_scene_filter else args.scene_threshold
+    r = benchmark_replay(args.directory, realtime=args.realtime, fps=args.fps,
+                         scene_change_threshold=threshold, max_cycles=args.max_cycles, cycle_s=args.cycle_time)
+
+    mode = "Echtzeit" if args.realtime else "maximale Geschwindigkeit"
+    print("\n" + "=" * 20 + f" Wahrnehmung ({mode}) " + "=" * 20)
+    print(f"{r['cycles']} Zyklen in {r['wall_s']:.2f}s, {r['audio_s']:.1f}s Audio, {r['utterances']} Äußerungen erkannt.")
+    if r['scene']:
+        print(f"Szenenfilter: {r['scene']['skipped']}/{r['scene']['frames']} Bilder übersprungen "
+              f"({100 * r['scene']['skip_rate']:.0f}%, Schwelle {r['scene']['threshold']}).")
+    print(f"{'Stufe':<14}{'Einheit':<12}{'Anzahl':>8}{'ms/Stück':>10}{'pro s':>10}{'pro s (Wanduhr)':>18}")
+    for stage, model, unit in MODEL_STAGES:
+        s = r['stages'][stage]
+        avg_ms = s['total_ms'] / s['count'] if s['count'] else 0.0
+        print(f"{model:<14}{unit:<12}{s['count']:>8}{avg_ms:>10.1f}{s['per_s']:>10.1f}{s['wall_per_s']:>18.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+# perception/camera.py
+import threading
+import time
+from typing import Optional
+
+import cv2
+import numpy as np
+
+from perception.sources import FrameSource
+
+
+class FrameGrabber(FrameSource):
+    """
+    Hält die Kamera dauerhaft offen und liest in einem Hintergrund-Thread fortlaufend Bilder.
+
+    Behalten wird nur das jeweils neueste Bild (ein einziger Platz). `read` kostet
+    daher keine Geräteeinrichtung und liefert kein veraltetes Bild aus dem
+    Treiberpuffer. Weil die Kamera ständig läuft, ist ihre Belichtungsautomatik
+    eingeschwungen und die Bilder sind nicht mehr dunkel wie direkt nach dem Öffnen.
+    """
+
+    def __init__(self, device_index: int = 0, retry_delay_s: float = 0.05):
+        """
+        Args:
+            device_index (int): Index der Kamera für `cv2.VideoCapture`.
+            retry_delay_s (float): Pause nach einem fehlgeschlagenen Lesen.
+        """
+        self.device_index = device_index
+        self.retry_delay_s = retry_delay_s
+        self._capture: Optional[cv2.VideoCapture] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._new_frame = threading.Condition()
+        self._frame: Optional[np.ndarray] = None
+        self._frame_time = 0.0
+        self.frames_grabbed = 0
+        self.frames_read = 0
+        self._distinct_frames_read = 0
+        self._last_read_index = 0
+        self.read_failures = 0
+
+    @property
+    def is_open(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> bool:
+        """Öffnet die Kamera und startet den Thread. Gibt False zurück, wenn keine Kamera gefunden wurde."""
+        if self.is_open:
+            return True
+        capture = cv2.VideoCapture(self.device_index)
+        if not capture.isOpened():
+            capture.release()
+            return False
+        self._capture = capture
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="camera-grabber", daemon=True)
+        self._thread.start()
+        return True
+
+    def _run(self):
+        while not self._stop.is_set():
+            ret, frame = self._capture.read()
+            if not ret:
+                self.read_failures += 1
+                time.sleep(self.retry_delay_s)
+                continue
+            with self._new_frame:
+                self._frame = frame
+                self._frame_time = time.time()
+                self.frames_grabbed += 1
+                self._new_frame.notify_all()
+
+    def read(self, timeout: float = 2.0) -> Optional[np.ndarray]:
+        """
+        Das neueste Bild (BGR). Direkt nach dem Start wird bis zu `timeout`
+        Sekunden auf das erste Bild gewartet.
+
+        Returns:
+            Das Bild oder None, falls die Kamera nicht läuft oder kein Bild kam.
+        """
+        with self._new_frame:
+            if self._frame is None and self.is_open:
+                self._new_frame.wait_for(lambda: self._frame is not None or not self.is_open, timeout)
+            if self._frame is None:
+                return None
+            self.frames_read += 1
+            if self._last_read_index != self.frames_grabbed:
+                self._last_read_index = self.frames_grabbed
+                self._distinct_frames_read += 1
+            # cv2 liefert pro Lesevorgang ein neues Array; der Thread überschreibt es nicht.
+            return self._frame
+
+    def close(self):
+        """Beendet den Thread und gibt die Kamera frei."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._capture is not None:
+            self._capture.release()
+            self._capture = None
+        with self._new_frame:
+            self._frame = None
+            self._new_frame.notify_all()
+
+    def get_stats(self) -> dict:
+        with self._new_frame:
+            age = time.time() - self._frame_time if self._frame is not None else None
+        return {
+            'open': self.is_open,
+            'frames_grabbed': self.frames_grabbed,
+            'frames_read': self.frames_read,
+            # Bilder, die nie gelesen wurden, weil ein neueres sie ersetzt hat.
+            'frames_dropped': self.frames_grabbed - self._distinct_frames_read,
+            'read_failures': self.read_failures,
+            'latest_frame_age_s': age,
+        }
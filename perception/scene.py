@@ -0,0 +1,78 @@
+# perception/scene.py
+from typing import Optional
+
+import numpy as np
+
+# Bei BGR-Bildern (cv2) in umgekehrter Reihenfolge der üblichen RGB-Gewichte.
+BGR_LUMA_WEIGHTS = np.array([0.114, 0.587, 0.299], dtype=np.float32)
+
+
+def thumbnail(frame: np.ndarray, size: int = 32) -> np.ndarray:
+    """Verkleinertes Graustufenbild (Blockmittelwerte, höchstens size x size) mit Werten in [0, 1]."""
+    gray = frame.astype(np.float32) @ BGR_LUMA_WEIGHTS if frame.ndim == 3 else frame.astype(np.float32)
+    if frame.dtype == np.uint8:
+        gray /= 255.0
+    rows, cols = min(size, gray.shape[0]), min(size, gray.shape[1])
+    block_h, block_w = gray.shape[0] // rows, gray.shape[1] // cols
+    gray = gray[:rows * block_h, :cols * block_w]
+    return gray.reshape(rows, block_h, cols, block_w).mean(axis=(1, 3))
+
+
+class SceneChangeDetector:
+    """
+    Billiger Vorfilter für die Bildbeschreibung: Hat sich die Szene seit dem
+    zuletzt beschriebenen Bild kaum verändert, kann dessen Beschreibung
+    wiederverwendet werden.
+
+    Verglichen wird die mittlere absolute Differenz der verkleinerten
+    Graustufenbilder; die Blockmittelwerte glätten Sensorrauschen. Referenz ist
+    immer das zuletzt beschriebene Bild (`accept`), nicht das vorige, sodass sich
+    auch langsame Veränderungen aufsummieren.
+    """
+
+    def __init__(self, threshold: float = 0.03, size: int = 32):
+        """
+        Args:
+            threshold (float): Mittlere Helligkeitsdifferenz (0-1), ab der die Szene als verändert gilt.
+            size (int): Kantenlänge des Vergleichsbildes.
+        """
+        self.threshold = threshold
+        self.size = size
+        self._reference: Optional[np.ndarray] = None
+        self._candidate: Optional[np.ndarray] = None
+        self.frames = 0
+        self.skipped = 0
+        self.last_difference: Optional[float] = None
+
+    def difference(self, frame: np.ndarray) -> float:
+        """Abstand zum Referenzbild; unendlich, solange es keines gibt."""
+        self._candidate = thumbnail(frame, self.size)
+        if self._reference is None or self._reference.shape != self._candidate.shape:
+            return float('inf')
+        return float(np.mean(np.abs(self._candidate - self._reference)))
+
+    def has_changed(self, frame: np.ndarray) -> bool:
+        """Wahr, wenn das Bild neu beschrieben werden muss; sonst zählt es als übersprungen."""
+        self.frames += 1
+        self.last_difference = self.difference(frame)
+        changed = self.last_difference > self.threshold
+        if not changed:
+            self.skipped += 1
+        return changed
+
+    def accept(self):
+        """Macht das zuletzt geprüfte Bild zur Referenz, nachdem es beschrieben wurde."""
+        if self._candidate is not None:
+            self._reference = self._candidate
+
+    def reset(self):
+        self._reference = self._candidate = None
+
+    def get_stats(self) -> dict:
+        return {
+            'frames': self.frames,
+            'skipped': self.skipped,
+            'skip_rate': self.skipped / self.frames if self.frames else 0.0,
+            'threshold': self.threshold,
+            'last_difference': self.last_difference,
+        }
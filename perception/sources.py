@@ -0,0 +1,194 @@
+# perception/sources.py
+import abc
+import os
+import time
+from typing import List, Optional, Sequence, Tuple, Union
+
+import cv2
+import numpy as np
+
+from perception.audio import AudioSource, WavFileSource
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp')
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv')
+AUDIO_EXTENSIONS = ('.wav',)
+
+
+def list_files(directory: str, extensions: Sequence[str]) -> List[str]:
+    """Alle Dateien mit einer der Endungen, sortiert nach Namen."""
+    return sorted(os.path.join(directory, name) for name in os.listdir(directory)
+                  if name.lower().endswith(tuple(extensions)))
+
+
+class FrameSource(abc.ABC):
+    """
+    Schnittstelle für Bildquellen (BGR, uint8): die Kamera oder aufgezeichnete Dateien.
+
+    `read` liefert das aktuelle Bild oder None; `finished` ist wahr, wenn eine
+    endliche Quelle keine Bilder mehr hat.
+    """
+
+    def start(self) -> bool:
+        return True
+
+    @property
+    def is_open(self) -> bool:
+        return False
+
+    @abc.abstractmethod
+    def read(self, timeout: float = 2.0) -> Optional[np.ndarray]:
+        pass
+
+    @property
+    def finished(self) -> bool:
+        return False
+
+    def close(self):
+        pass
+
+    def get_stats(self) -> dict:
+        return {}
+
+
+class ReplayFrameSource(FrameSource):
+    """
+    Basis für aufgezeichnete Bildfolgen mit `fps` Bildern pro Sekunde.
+
+    Mit `realtime=True` verhält sich die Quelle wie eine Kamera: `read` liefert
+    das Bild, das zur seit `start` verstrichenen Zeit gehört, und überspringt die
+    dazwischenliegenden. Sonst liefert jedes `read` das nächste Bild, so schnell
+    wie der Aufrufer liest.
+    """
+
+    def __init__(self, n_frames: int, fps: float, realtime: bool = True):
+        self.n_frames = n_frames
+        self.fps = fps
+        self.realtime = realtime
+        self._position = 0  # Das nächste noch nicht gelieferte Bild.
+        self._started_at: Optional[float] = None
+        self._last_index = -1
+        self._last_frame: Optional[np.ndarray] = None
+        self.frames_read = 0
+        self.frames_skipped = 0
+
+    @abc.abstractmethod
+    def _load(self, index: int) -> Optional[np.ndarray]:
+        """Lädt Bild `index`; die Indizes steigen von Aufruf zu Aufruf."""
+
+    def start(self) -> bool:
+        if self.n_frames == 0:
+            return False
+        self._started_at = time.perf_counter()
+        return True
+
+    @property
+    def is_open(self) -> bool:
+        return self._started_at is not None
+
+    def _next_index(self) -> int:
+        if not self.realtime:
+            return self._position
+        return int((time.perf_counter() - self._started_at) * self.fps)
+
+    def read(self, timeout: float = 2.0) -> Optional[np.ndarray]:
+        if not self.is_open:
+            return None
+        index = self._next_index()
+        if index >= self.n_frames:
+            self._position = self.n_frames
+            return None
+        if index == self._last_index:
+            # Schneller gelesen als aufgezeichnet: wie bei einer Kamera das aktuelle Bild.
+            return self._last_frame
+        self.frames_skipped += index - self._position
+        frame = self._load(index)
+        self._position, self._last_index, self._last_frame = index + 1, index, frame
+        if frame is not None:
+            self.frames_read += 1
+        return frame
+
+    @property
+    def finished(self) -> bool:
+        return self._position >= self.n_frames or (
+            self.realtime and self.is_open and self._next_index() >= self.n_frames)
+
+    def close(self):
+        self._started_at = None
+        self._last_frame = None
+
+    def get_stats(self) -> dict:
+        return {
+            'open': self.is_open,
+            'frames': self.n_frames,
+            'fps': self.fps,
+            'realtime': self.realtime,
+            'frames_read': self.frames_read,
+            'frames_skipped': self.frames_skipped,
+        }
+
+
+class ImageDirectorySource(ReplayFrameSource):
+    """Spielt die Bilder eines Verzeichnisses (nach Namen sortiert) als Bildfolge ab."""
+
+    def __init__(self, path: Union[str, Sequence[str]], fps: float = 1.0, realtime: bool = True):
+        """
+        Args:
+            path: Ein Verzeichnis oder eine Liste von Bilddateien.
+            fps (float): Abspieltempo bei `realtime=True`.
+        """
+        self.paths = list_files(path, IMAGE_EXTENSIONS) if isinstance(path, str) else list(path)
+        super().__init__(len(self.paths), fps, realtime)
+
+    def _load(self, index: int) -> Optional[np.ndarray]:
+        frame = cv2.imread(self.paths[index])
+        if frame is None:
+            print(f"WARNING: Could not read image '{self.paths[index]}'.")
+        return frame
+
+
+class VideoFileSource(ReplayFrameSource):
+    """Spielt eine Videodatei im Tempo ihrer Aufnahme oder so schnell wie möglich ab."""
+
+    def __init__(self, path: str, realtime: bool = True):
+        super().__init__(0, fps=0.0, realtime=realtime)
+        self.path = path
+        self._capture: Optional[cv2.VideoCapture] = None
+        self._capture_position = 0
+
+    def start(self) -> bool:
+        capture = cv2.VideoCapture(self.path)
+        if not capture.isOpened():
+            capture.release()
+            return False
+        self._capture, self._capture_position = capture, 0
+        self.n_frames = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+        self.fps = capture.get(cv2.CAP_PROP_FPS) or 25.0
+        return super().start()
+
+    def _load(self, index: int) -> Optional[np.ndarray]:
+        # Übersprungene Bilder werden nur dekodiert, nicht konvertiert.
+        while self._capture_position < index and self._capture.grab():
+            self._capture_position += 1
+        ret, frame = self._capture.read()
+        self._capture_position += 1
+        return frame if ret else None
+
+    def close(self):
+        super().close()
+        if self._capture is not None:
+            self._capture.release()
+            self._capture = None
+
+
+def open_replay(directory: str, realtime: bool = True, fps: float = 1.0) -> Tuple[FrameSource, AudioSource]:
+    """
+    Quellen für ein Verzeichnis mit Aufzeichnungen: das erste Video, sonst alle
+    Bilder (mit `fps`), und alle WAV-Dateien nacheinander. Fehlt eine Art, lässt
+    sich die zugehörige Quelle nicht starten und der Sinn bleibt deaktiviert.
+    """
+    videos = list_files(directory, VIDEO_EXTENSIONS)
+    if len(videos) > 1:
+        print(f"WARNING: {len(videos)} videos found, replaying only '{videos[0]}'.")
+    frames = VideoFileSource(videos[0], realtime=realtime) if videos else ImageDirectorySource(directory, fps, realtime)
+    audio = WavFileSource(list_files(directory, AUDIO_EXTENSIONS), realtime=realtime)
+    return frames, audio
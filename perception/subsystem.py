@@ -1,89 +1,254 @@
 # perception/subsystem.py
 import cv2
-import sounddevice as sd
 import numpy as np
-import whisper
 from transformers import pipeline, BlipProcessor, BlipForConditionalGeneration
 import torch
+import threading
+import time
 import warnings
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+from perception.audio import AudioListener, AudioSource, MicrophoneSource
+from perception.camera import FrameGrabber
+from perception.scene import SceneChangeDetector
+from perception.sources import FrameSource
+from registry.models import default_registry
 
 # Unterdrücke laute Warnungen
 warnings.filterwarnings("ignore", category=UserWarning)
 
+VISION_MODEL_NAME = "Salesforce/blip-image-captioning-base"
+WHISPER_MODEL_NAME = "base"
+SOUND_CLASSIFIER_MODEL_NAME = "superb/hubert-large-superb-er"
+
+AUDIO_SAMPLERATE = 16000
+AUDIO_WINDOW_S = 5  # Die letzten 5 Sekunden dienen der Geräuscherkennung.
+SCENE_CHANGE_THRESHOLD = 0.03  # Mittlere Helligkeitsdifferenz, ab der ein Bild neu beschrieben wird.
+
+
+def load_blip(model_name: str, device: torch.device) -> tuple:
+    print("Loading visual model (BLIP)...")
+    processor = BlipProcessor.from_pretrained(model_name)
+    model = BlipForConditionalGeneration.from_pretrained(model_name).to(device)
+    return processor, model
+
+
+def load_whisper(model_name: str, device: torch.device):
+    import whisper
+    print("Loading speech recognition model (Whisper)...")
+    return whisper.load_model(model_name, device=device)
+
+
+def load_sound_classifier(model_name: str, device: torch.device):
+    print("Loading audio classification model (Hugging Face)...")
+    return pipeline("audio-classification", model=model_name, device=0 if device.type == 'cuda' else -1)
+
 
 class PerceptionSubsystem:
-    def __init__(self):
+    def __init__(self, frame_source: Optional[FrameSource] = None, audio_source: Optional[AudioSource] = None,
+                 scene_change_threshold: Optional[float] = SCENE_CHANGE_THRESHOLD):
+        """
+        Args:
+            frame_source (FrameSource, optional): Ersetzt die Kamera, z.B. durch aufgezeichnete
+                Bilder oder ein Video (siehe `perception.sources.open_replay`).
+            audio_source (AudioSource, optional): Ersetzt das Mikrofon, z.B. durch eine
+                `WavFileSource` für Tests ohne Audiogerät.
+            scene_change_threshold (float, optional): Schwelle der `SceneChangeDetector`; bei
+                kleineren Veränderungen wird die letzte Bildbeschreibung wiederverwendet.
+                None beschreibt jedes Bild neu.
+        """
         print("Initializing Sensory Organs (Perception Subsystem)...")
         self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
 
         self.vision_enabled = True
         self.audio_enabled = True
 
+        # Die Modelle werden über das Register geteilt und erst bei der ersten Wahrnehmung geladen.
+        device = self.device
+        self._vision_key = ("blip", VISION_MODEL_NAME, str(device))
+        self._whisper_key = ("whisper", WHISPER_MODEL_NAME, str(device))
+        self._classifier_key = ("audio_classifier", SOUND_CLASSIFIER_MODEL_NAME, str(device))
+        default_registry.register(self._vision_key, lambda: load_blip(VISION_MODEL_NAME, device))
+        default_registry.register(self._whisper_key, lambda: load_whisper(WHISPER_MODEL_NAME, device))
+        default_registry.register(self._classifier_key, lambda: load_sound_classifier(SOUND_CLASSIFIER_MODEL_NAME, device))
+
+        # Die Stufen eines Wahrnehmungszyklus laufen nebenläufig: Das Sehen läuft
+        # parallel zur Geräuscherkennung, Whisper auf einem eigenen Thread, sobald
+        # eine Äußerung endet. Die PyTorch-Rechenkerne geben das GIL frei.
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="perception")
+        self._speech_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="whisper")
+        self._transcriptions: List[Future] = []
+        self._transcriptions_lock = threading.Lock()
+        self.last_timings: Dict[str, float] = {}
+        # Summierte Dauer und Anzahl je Stufe über alle Zyklen (für Durchsatzmessungen).
+        self.stage_stats: Dict[str, Dict[str, float]] = {}
+        # Schützt auch `audio_stats`, das Zuhör-, Whisper- und Hauptthread fortschreiben.
+        self._stage_lock = threading.Lock()
+        self.audio_stats = {'utterances': 0, 'transcribed': 0, 'failed': 0, 'silent_windows': 0, 'speech_to_text_ms': 0.0}
+
+        # Die Kamera bleibt bis `close` geöffnet; ein Thread hält das neueste Bild bereit.
+        self.camera = frame_source if frame_source is not None else FrameGrabber(0)
+        # Bei (fast) unveränderter Szene spart die letzte Beschreibung einen BLIP-Durchlauf.
+        self.scene = SceneChangeDetector(scene_change_threshold) if scene_change_threshold is not None else None
+        self._last_vision_report: Optional[str] = None
         try:
-            print("Loading visual model (BLIP)...")
-            self.vision_processor = BlipProcessor.from_pretrained("Salesforce/blip-image-captioning-base")
-            self.vision_model = BlipForConditionalGeneration.from_pretrained(
-                "Salesforce/blip-image-captioning-base").to(self.device)
-            cam = cv2.VideoCapture(0)
-            if not cam.isOpened(): raise ConnectionError("Webcam not found.")
-            cam.release()
+            if not self.camera.start():
+                raise ConnectionError("Webcam not found." if frame_source is None else "Frame source could not be started.")
             print("Visual perception initialized.")
         except Exception as e:
             print(f"ERROR during visual perception initialization: {e}")
             self.vision_enabled = False
 
+        # Das Mikrofon nimmt fortlaufend in einen Ringpuffer auf; Whisper sieht nur erkannte Äußerungen.
+        self.listener: Optional[AudioListener] = None
         try:
-            print("Loading auditory models (Whisper & Hugging Face Audio Classification)...")
-            self.whisper_model = whisper.load_model("base", device=self.device)
-            self.sound_classifier = pipeline(
-                "audio-classification",
-                model="superb/hubert-large-superb-er",
-                device=0 if self.device.type == 'cuda' else -1
-            )
-
-            devices = sd.query_devices()
-            if not any(d['max_input_channels'] > 0 for d in devices):
-                raise ConnectionError("No active microphone found.")
+            if audio_source is None:
+                # Erst hier importieren: ohne PortAudio (z.B. auf Servern) schlägt schon der Import fehl.
+                import sounddevice as sd
+                devices = sd.query_devices()
+                if not any(d['max_input_channels'] > 0 for d in devices):
+                    raise ConnectionError("No active microphone found.")
+                audio_source = MicrophoneSource(AUDIO_SAMPLERATE)
+            self.listener = AudioListener(audio_source, on_utterance=self._on_utterance)
+            if not self.listener.start(): raise ConnectionError("Audio source could not be started.")
 
             print("Auditory perception initialized.")
         except Exception as e:
             print(f"ERROR during auditory perception initialization: {e}")
             self.audio_enabled = False
 
+    @property
+    def vision_processor(self):
+        return default_registry.get(self._vision_key)[0]
+
+    @property
+    def vision_model(self):
+        return default_registry.get(self._vision_key)[1]
+
+    @property
+    def whisper_model(self):
+        return default_registry.get(self._whisper_key)
+
+    @property
+    def sound_classifier(self):
+        return default_registry.get(self._classifier_key)
+
+    def preload(self, background: bool = True) -> Optional[threading.Thread]:
+        """Lädt die Modelle der aktiven Sinne vorab, standardmäßig in einem Hintergrund-Thread."""
+        keys = []
+        if self.vision_enabled: keys.append(self._vision_key)
+        if self.audio_enabled: keys += [self._whisper_key, self._classifier_key]
+        return default_registry.preload(keys, background=background)
+
+    def _ensure_models(self, *keys) -> bool:
+        """Lädt die Modelle bei Bedarf; schlägt das fehl, wird der Sinn wie bisher deaktiviert."""
+        try:
+            for key in keys:
+                default_registry.get(key)
+            return True
+        except Exception as e:
+            print(f"ERROR while loading perception model {key[1]}: {e}")
+            return False
+
     def _perceive_vision(self) -> str:
         if not self.vision_enabled: return "Visual perception is disabled."
-        cam = cv2.VideoCapture(0)
-        if not cam.isOpened(): return "Error: Could not access webcam."
-        ret, frame = cam.read()
-        cam.release()
-        if not ret: return "Error: Could not capture image."
+        if not self._ensure_models(self._vision_key):
+            self.vision_enabled = False
+            return "Visual perception is disabled."
+        if not self.camera.is_open: return "Error: Could not access webcam."
+        frame = self.camera.read()
+        if frame is None: return "Error: Could not capture image."
+        if self.scene is not None and not self._timed(None, 'scene', self.scene.has_changed, frame):
+            return self._last_vision_report
+        caption = self._timed(None, 'caption', self._caption, frame)
+        self._last_vision_report = f"I see: {caption}."
+        if self.scene is not None:
+            self.scene.accept()
+        return self._last_vision_report
+
+    def _caption(self, frame: np.ndarray) -> str:
         rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
         inputs = self.vision_processor(images=rgb_frame, return_tensors="pt").to(self.device)
-        caption = self.vision_processor.decode(self.vision_model.generate(**inputs, max_length=50)[0],
-                                               skip_special_tokens=True)
-        return f"I see: {caption}."
+        return self.vision_processor.decode(self.vision_model.generate(**inputs, max_length=50)[0],
+                                            skip_special_tokens=True)
+
+    def _timed(self, timings: Optional[Dict[str, float]], stage: str, fn: Callable, *args):
+        """Führt eine Stufe aus, trägt ihre Dauer (ms) in `timings` ein und summiert sie in `stage_stats`."""
+        start = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            elapsed_ms = 1000 * (time.perf_counter() - start)
+            if timings is not None:
+                timings[stage] = elapsed_ms
+            with self._stage_lock:
+                stats = self.stage_stats.setdefault(stage, {'count': 0, 'total_ms': 0.0})
+                stats['count'] += 1
+                stats['total_ms'] += elapsed_ms
+
+    def _transcribe(self, audio_data: np.ndarray) -> str:
+        return self.whisper_model.transcribe(audio_data, fp16=torch.cuda.is_available())['text'].strip()
 
-    def _perceive_audio(self) -> (str, str):
+    def _on_utterance(self, utterance: dict):
+        """Startet die Transkription, sobald der Sprecher eine Pause macht (läuft im Zuhör-Thread)."""
+        if not self.audio_enabled:
+            return
+        with self._stage_lock:
+            self.audio_stats['utterances'] += 1
+        future = self._speech_pool.submit(self._transcribe_utterance, utterance)
+        with self._transcriptions_lock:
+            self._transcriptions.append(future)
+
+    def _transcribe_utterance(self, utterance: dict) -> Optional[dict]:
+        """Transkribiert eine Äußerung; schlägt das fehl, gibt es None und die übrigen bleiben erhalten."""
+        try:
+            text = self._timed(None, 'transcribe', self._transcribe, utterance['audio'])
+        except Exception as e:
+            print(f"WARNING: Could not transcribe an utterance: {e}")
+            with self._stage_lock:
+                self.audio_stats['failed'] += 1
+            return None
+        latency_ms = 1000 * (time.time() - utterance['ended_at'])
+        with self._stage_lock:
+            self.audio_stats['transcribed'] += 1
+            self.audio_stats['speech_to_text_ms'] += latency_ms
+        return {'text': text, 'latency_ms': latency_ms}
+
+    def _classify_sound(self, audio_data: np.ndarray) -> str:
+        sound_results = self.sound_classifier(audio_data, top_k=1)
+        return sound_results[0]['label'] if sound_results else "Silence"
+
+    def _perceive_audio(self, timings: Optional[Dict[str, float]] = None) -> (str, str):
         """
-        FINALE VERSION: Radikal vereinfachte und stabile Audio-Aufnahme.
+        Wertet das fortlaufend Gehörte aus, ohne aufzunehmen: Die Geräuscherkennung
+        läuft auf den letzten Sekunden (bei Stille gar nicht), die Transkripte der
+        seit dem letzten Zyklus beendeten Äußerungen werden eingesammelt.
         """
         if not self.audio_enabled:
             return "Auditory perception is disabled.", ""
+        if not self._ensure_models(self._whisper_key, self._classifier_key):
+            self.audio_enabled = False
+            return "Auditory perception is disabled.", ""
         try:
-            samplerate = 16000
-            duration = 5  # Ein fester, großzügiger 5-Sekunden-Aufnahmezeitraum.
+            self.listener.drain()
+            with self._transcriptions_lock:
+                pending, self._transcriptions = self._transcriptions, []
 
-            print(f"Listening for {duration} seconds...")
-            audio_data = sd.rec(int(samplerate * duration), samplerate=samplerate, channels=1, dtype='float32')
-            sd.wait()
-            audio_data = audio_data.flatten()
+            ambient = self.listener.recent(AUDIO_WINDOW_S)
+            if self.listener.is_silent(ambient):
+                with self._stage_lock:
+                    self.audio_stats['silent_windows'] += 1
+                inferred_class = "Silence"
+            else:
+                inferred_class = self._timed(timings, 'classify', self._classify_sound, ambient)
 
-            # Transkription
-            transcription = self.whisper_model.transcribe(audio_data, fp16=torch.cuda.is_available())['text'].strip()
-
-            # Geräuscherkennung
-            sound_results = self.sound_classifier(audio_data, top_k=1)
-            inferred_class = sound_results[0]['label'] if sound_results else "Silence"
+            # Noch laufende Transkriptionen werden abgewartet.
+            results = self._timed(timings, 'transcribe_wait', lambda: [future.result() for future in pending])
+            results = [result for result in results if result is not None]
+            if results and timings is not None:
+                timings['speech_to_text'] = max(result['latency_ms'] for result in results)
+            transcription = " ".join(result['text'] for result in results if result['text'])
 
             sound_desc = f"I hear ambient sounds like: {inferred_class}."
             speech_desc = f"I hear someone say: '{transcription}'" if transcription else ""
@@ -95,23 +260,60 @@ class PerceptionSubsystem:
     def perceive(self) -> dict:
         """
         FINALE VERSION: Gibt einen strukturierten Dictionary mit den getrennten
-        Sinnesdaten zurück, anstatt eines formatierten Strings.
+        Sinnesdaten zurück, anstatt eines formatierten Strings. Unter
+        'timings_ms' stehen die Dauern der einzelnen Stufen und des ganzen Zyklus.
         """
         print("\n--- Perception Cycle ---")
+        start = time.perf_counter()
+        timings: Dict[str, float] = {}
 
-        vision_report = self._perceive_vision()
-        sound_report, speech_report = self._perceive_audio()
+        # Das Sehen läuft parallel zu den Audiomodellen; die Dauer nähert sich
+        # damit dem langsamsten Modell statt der Summe.
+        vision = self._pool.submit(self._timed, timings, 'vision', self._perceive_vision)
+        sound_report, speech_report = self._perceive_audio(timings)
+        vision_report = vision.result()
+        timings['total'] = 1000 * (time.perf_counter() - start)
+        self.last_timings = timings
 
         # Gib die Rohdaten als strukturiertes Objekt zurück
         sensory_data = {
             "vision": vision_report,
             "sound": sound_report,
-            "speech": speech_report
+            "speech": speech_report,
+            "timings_ms": timings,
         }
 
         # Formatiere den Output nur für die Konsole
         print("Sensory Input:")
-        for key, value in sensory_data.items():
-            if value: print(f"- {key.capitalize()}: {value}")
+        for key in ("vision", "sound", "speech"):
+            if sensory_data[key]: print(f"- {key.capitalize()}: {sensory_data[key]}")
+        print("Perception timings: " + ", ".join(f"{stage} {ms:.0f}ms" for stage, ms in timings.items()))
+
+        return sensory_data
+
+    def get_stats(self) -> dict:
+        with self._stage_lock:
+            audio_stats = dict(self.audio_stats)
+            stage_stats = {stage: dict(s) for stage, s in self.stage_stats.items()}
+        transcribed = audio_stats['transcribed']
+        return {
+            'camera': self.camera.get_stats(),
+            'scene': self.scene.get_stats() if self.scene is not None else None,
+            'audio': self.listener.get_stats() if self.listener is not None else None,
+            'utterances': audio_stats['utterances'],
+            'transcribed': transcribed,
+            'failed_transcriptions': audio_stats['failed'],
+            'silent_windows': audio_stats['silent_windows'],
+            'avg_speech_to_text_ms': audio_stats['speech_to_text_ms'] / transcribed if transcribed else 0.0,
+            'last_timings_ms': self.last_timings,
+            'stages': {stage: dict(stats, avg_ms=stats['total_ms'] / stats['count'])
+                       for stage, stats in stage_stats.items()},
+        }
 
-        return sensory_data
\ No newline at end of file
+    def close(self):
+        """Gibt Kamera und Audioquelle frei und beendet die Thread-Pools."""
+        self.camera.close()
+        if self.listener is not None:
+            self.listener.close()
+        self._speech_pool.shutdown(wait=True)
+        self._pool.shutdown(wait=True)
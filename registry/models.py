@@ -0,0 +1,133 @@
+# registry/models.py
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Iterable, Optional
+
+
+class ModelRegistry:
+    """
+    Prozessweites Register für große Modelle.
+
+    Jedes Modell wird über einen Schlüssel (z.B. ("seq2seq", "google/flan-t5-xl", None, "cpu"))
+    identifiziert und erst beim ersten Zugriff geladen. Alle Agenten und
+    Subsysteme, die denselben Schlüssel anfragen, teilen sich eine Instanz.
+    Mit `preload` kann das Laden vorab in einem Hintergrund-Thread starten;
+    ein gleichzeitiger `get` wartet dann auf dieses Laden, statt doppelt zu laden.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._key_locks: Dict[Hashable, threading.Lock] = {}
+        self._loaders: Dict[Hashable, Callable[[], Any]] = {}
+        self._instances: Dict[Hashable, Any] = {}
+        self._load_times: Dict[Hashable, float] = {}
+        self._errors: Dict[Hashable, Exception] = {}
+        self.hits = 0
+        self.loads = 0
+
+    def register(self, key: Hashable, loader: Callable[[], Any]):
+        """Hinterlegt die Ladefunktion für einen Schlüssel, ohne zu laden."""
+        with self._lock:
+            self._loaders.setdefault(key, loader)
+
+    def _key_lock(self, key: Hashable) -> threading.Lock:
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def get(self, key: Hashable, loader: Optional[Callable[[], Any]] = None) -> Any:
+        """
+        Gibt die geteilte Instanz zurück und lädt sie beim ersten Zugriff.
+
+        Args:
+            key: Der Schlüssel des Modells.
+            loader (Callable, optional): Ladefunktion, falls der Schlüssel noch nicht registriert ist.
+        """
+        with self._lock:
+            if key in self._instances:
+                self.hits += 1
+                return self._instances[key]
+        if loader is not None:
+            self.register(key, loader)
+
+        # Pro Schlüssel ein eigener Lock: verschiedene Modelle laden parallel,
+        # dasselbe Modell wird nur einmal geladen.
+        with self._key_lock(key):
+            with self._lock:
+                if key in self._instances:
+                    self.hits += 1
+                    return self._instances[key]
+                registered = self._loaders.get(key)
+            if registered is None:
+                raise KeyError(f"Für das Modell {key!r} ist keine Ladefunktion registriert.")
+
+            start = time.perf_counter()
+            try:
+                instance = registered()
+            except Exception as e:
+                with self._lock:
+                    self._errors[key] = e
+                raise
+            with self._lock:
+                self._instances[key] = instance
+                self._load_times[key] = time.perf_counter() - start
+                self._errors.pop(key, None)
+                self.loads += 1
+            return instance
+
+    def preload(self, keys: Iterable[Hashable], background: bool = True) -> Optional[threading.Thread]:
+        """
+        Lädt die angegebenen (registrierten) Modelle vorab.
+
+        Fehler beim Laden im Hintergrund werden nur gemeldet; der nächste
+        `get` versucht das Laden erneut und wirft den Fehler dann selbst.
+
+        Returns:
+            Optional[threading.Thread]: Der Lade-Thread bei background=True, sonst None.
+        """
+        keys = list(keys)
+
+        def load_all():
+            for key in keys:
+                try:
+                    self.get(key)
+                except Exception as e:
+                    print(f"WARNUNG: Vorladen von {key!r} fehlgeschlagen: {e}")
+
+        if not background:
+            load_all()
+            return None
+        thread = threading.Thread(target=load_all, name="model-preload", daemon=True)
+        thread.start()
+        return thread
+
+    def is_loaded(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._instances
+
+    def unload(self, key: Hashable) -> bool:
+        """Gibt die Instanz frei (die Ladefunktion bleibt registriert). True, falls sie geladen war."""
+        with self._key_lock(key), self._lock:
+            self._load_times.pop(key, None)
+            return self._instances.pop(key, None) is not None
+
+    def clear(self):
+        """Gibt alle geladenen Instanzen frei."""
+        with self._lock:
+            self._instances.clear()
+            self._load_times.clear()
+
+    def get_stats(self) -> dict:
+        """Gibt für jedes bekannte Modell zurück, ob es geladen ist und wie lange das Laden dauerte."""
+        with self._lock:
+            models = {}
+            for key in self._loaders:
+                models[key] = {
+                    'loaded': key in self._instances,
+                    'load_time_s': self._load_times.get(key),
+                    'error': str(self._errors[key]) if key in self._errors else None,
+                }
+            return {'models': models, 'loads': self.loads, 'hits': self.hits}
+
+
+# Das gemeinsame Register des Prozesses.
+default_registry = ModelRegistry()
@@ -62,6 +62,8 @@ def main():
     parser = argparse.ArgumentParser(description="Startet den verkörperten CAPA-Agenten.")
     parser.add_argument("--verbose", "-v", action="store_true", help="Zeigt die vollständigen Prompts an.")
     parser.add_argument("--cycle_time", type=int, default=5, help="Zeit in Sekunden zwischen den autonomen Zyklen.")
+    parser.add_argument("--memory_backend", default="chroma", choices=["chroma", "numpy", "numpy_ivf"],
+                        help="Speicher-Backend des Langzeitgedächtnisses.")
     args = parser.parse_args()
 
     print("--- SYSTEMSTART: VERKÖRPERTER MODUS ---")
@@ -75,20 +77,19 @@ def main():
     # 2. DIE SUBSYSTEME HIER ERSTELLEN (Bleibt gleich)
     pag_model = PAG_Model(model_name="google/flan-t5-xl")
     asc = AffectiveStateCore()
-    memory_system = MemorySubs--ystem(db_path=db_path)  # <-- Unser korrektes Gedächtnis mit 5 Einträgen
+    memory_system = MemorySubsystem(db_path=db_path, persist_embedding_cache=True, backend=args.memory_backend)  # <-- Unser korrektes Gedächtnis mit 5 Einträgen
 
-    # 3. AGENT ERSTELLEN UND DANN DAS GEDÄCHTNIS ZUWEISEN (Die neue Logik)
-
-    # Zuerst den Agenten so erstellen, wie er es erwartet (ohne Gedächtnis-Argument).
-    # Er wird intern ein leeres Gedächtnis erstellen.
+    # 3. AGENT MIT UNSEREM GEDÄCHTNIS ERSTELLEN
     agent = CAPA_Agent(
         pag_model=pag_model,
-        asc=asc
+        asc=asc,
+        memory=memory_system
     )
 
-    # JETZT überschreiben wir sein leeres Gedächtnis mit unserer
-    # Instanz, die die Daten aus der Datenbank geladen hat.
-    agent.memory = memory_system
+    # Die Modelle laden im Hintergrund, während die Hotkeys eingerichtet werden.
+    pag_model.preload()
+    memory_system.preload()
+    agent.perception.preload()
 
     # --- KORREKTUR ENDET HIER ---
     input_handler = InputHandler()
@@ -139,10 +140,10 @@ def main():
                     for i, mem in enumerate(memories): print(f"Neueste-{i}: {mem['text']} | Meta: {mem['metadata']}")
                 else:
                     # Jede andere Eingabe wird als Sprach-Input behandelt
-                    agent.update(verbose=args.verbose, text_override=command_input)
+                    agent.update(verbose=args.verbose, text_override=command_input, stream=True)
             else:
                 # Autonomer Zyklus, wenn keine Eingabe erfolgt
-                agent.update(verbose=args.verbose)
+                agent.update(verbose=args.verbose, stream=True)
 
             print("-" * 70)
             time.sleep(args.cycle_time)
@@ -150,15 +151,13 @@ def main():
     except KeyboardInterrupt:
         print("\n\n--- SYSTEM WIRD HERUNTERGEFAHREN ---")
         keyboard.unhook_all()
-        if agent.memory:
-            agent.memory.shutdown()
+        agent.shutdown()
         print("System erfolgreich heruntergefahren.")
 
     finally:
         # Dieser finally-Block stellt sicher, dass das Herunterfahren immer versucht wird.
         keyboard.unhook_all()
-        if hasattr(agent, 'memory') and agent.memory is not None:
-            agent.memory.shutdown()
+        agent.shutdown()
         print("System erfolgreich heruntergefahren.")
 
 
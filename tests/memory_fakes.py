@@ -0,0 +1,51 @@
+# tests/memory_fakes.py
+import threading
+from typing import Optional, Sequence
+
+import numpy as np
+
+from memory.subsystem import MemorySubsystem
+
+
+class FakeEncoder:
+    """
+    Ein Platzhalter für den SentenceTransformer: ein Vektor-Eintrag pro Schlüsselwort,
+    dazu `length_weight * len(text)` und ein konstanter `bias`.
+
+    Texte mit denselben Schlüsselwörtern erhalten so (fast) denselben Vektor.
+    `calls` hält die Stapelgröße jedes Aufrufs fest. Mit `gated=True` wird erst
+    kodiert, wenn `gate` gesetzt ist.
+    """
+
+    KEYWORDS = ("hallo", "lärm", "sonne", "regen", "katze")
+
+    def __init__(self, keywords: Sequence[str] = KEYWORDS, length_weight: float = 0.01, bias: float = 0.0,
+                 gated: bool = False):
+        self.keywords = tuple(keywords)
+        self.length_weight = length_weight
+        self.bias = bias
+        self.gate = threading.Event()
+        if not gated:
+            self.gate.set()
+        self.calls = []
+
+    def encode(self, texts):
+        self.gate.wait(5)
+        single = isinstance(texts, str)
+        texts = [texts] if single else texts
+        self.calls.append(len(texts))
+        vectors = np.array([[float(word in text.lower()) for word in self.keywords]
+                            + [self.length_weight * len(text) + self.bias] for text in texts], dtype=np.float32)
+        return vectors[0] if single else vectors
+
+
+class FakeEncoderMemory(MemorySubsystem):
+    """Ein `MemorySubsystem`, das statt des echten Modells einen `FakeEncoder` benutzt."""
+
+    def __init__(self, *args, encoder: Optional[FakeEncoder] = None, **kwargs):
+        self.encoder = encoder if encoder is not None else FakeEncoder()
+        super().__init__(*args, **kwargs)
+
+    @property
+    def embedding_model(self):
+        return self.encoder
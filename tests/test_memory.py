@@ -48,6 +48,8 @@ class TestMemorySubsystem(unittest.TestCase):
         print("\n--- Test: Persistenz über Instanzen ---")
         self.mem.add_experience("Ein lautes Geräusch hat mich geweckt.", {'x': 90, 'y': -80})
         self.assertEqual(self.mem.get_memory_count(), 1)
+        # Der Schreibpuffer muss geleert sein, bevor eine zweite Instanz die Datenbank liest.
+        self.mem.flush()
 
         # Simuliere einen Neustart, indem eine neue Instanz auf dieselbe DB zugreift
         mem2 = MemorySubsystem(db_path=self.TEST_DB_PATH)
@@ -57,6 +59,48 @@ class TestMemorySubsystem(unittest.TestCase):
         self.assertEqual(results[0]['text'], "Ein lautes Geräusch hat mich geweckt.")
         mem2.reset_database_for_testing()
 
+    def test_add_experiences_bulk(self):
+        """Testet das gebündelte Einfügen des Kurzzeitpuffers."""
+        print("\n--- Test: Gebündeltes Einfügen ---")
+        experiences = [
+            {'text': "Der Nutzer hat mich begrüßt.", 'metadata': {'x': 10, 'y': 20}},
+            {'text': "Ein lautes Geräusch hat mich geweckt.", 'metadata': {'x': 90, 'y': -80}},
+            {'text': "Ich habe über die Sonne nachgedacht.", 'metadata': {'x': 0, 'y': 0}},
+        ]
+        self.mem.add_experiences(experiences)
+        self.mem.add_experiences([])
+        self.assertEqual(self.mem.get_memory_count(), 3)
+        results = self.mem.query_relevant_memories("plötzlicher Lärm", n_results=1)
+        self.assertEqual(results[0]['text'], "Ein lautes Geräusch hat mich geweckt.")
+        metadata = {key: value for key, value in results[0]['metadata'].items() if key != 'seq'}
+        self.assertEqual(metadata, {'x': 90, 'y': -80})
+
+    def test_get_latest_memories_in_insertion_order(self):
+        """Testet, dass die neuesten Erinnerungen in Einfügereihenfolge geliefert werden."""
+        print("\n--- Test: Neueste Erinnerungen ---")
+        state = {'x': 0, 'y': 0}
+        for i in range(5):
+            self.mem.add_experience(f"Erlebnis Nummer {i}", state)
+        self.assertEqual(state, {'x': 0, 'y': 0}, "Die Metadaten des Aufrufers dürfen nicht verändert werden.")
+        latest = self.mem.get_latest_memories(n_results=2)
+        self.assertEqual([m['text'] for m in latest], ["Erlebnis Nummer 3", "Erlebnis Nummer 4"])
+        self.assertEqual([m['metadata']['seq'] for m in latest], [3, 4])
+
+    def test_query_filtered_and_boosted_by_affect(self):
+        """Testet das Eingrenzen und Gewichten der Abfrage nach Affekt und Typ."""
+        print("\n--- Test: Affekt-Filter ---")
+        self.mem.add_experiences([
+            {'text': "Ein lautes Geräusch hat mich erschreckt.", 'metadata': {'x': 90, 'y': -80}},
+            {'text': "Ein leises Geräusch hat mich geweckt.", 'metadata': {'x': -40, 'y': 10}},
+            {'text': "Laute Geräusche bedeuten meist keine Gefahr.", 'metadata': {'type': 'synthesis', 'x': 20, 'y': 0}},
+        ])
+        stressed = self.mem.query_relevant_memories("Geräusch", n_results=3, affect_region='high_stress')
+        self.assertEqual([m['text'] for m in stressed], ["Ein lautes Geräusch hat mich erschreckt."])
+        lessons = self.mem.query_relevant_memories("Geräusch", n_results=3, memory_type='synthesis')
+        self.assertEqual([m['metadata']['type'] for m in lessons], ['synthesis'])
+        calm = self.mem.query_relevant_memories("Geräusch", n_results=1, boost_state={'x': -40, 'y': 10}, affect_weight=10.0)
+        self.assertEqual(calm[0]['text'], "Ein leises Geräusch hat mich geweckt.")
+
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,145 @@
+# tests/test_memory_ann.py
+import unittest
+import unittest.mock
+import sys, os
+import contextlib
+import io
+import shutil
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from memory.ann import recall_at_k
+from memory.backends import NumpyBackend
+
+
+def clustered_vectors(n: int, dim: int = 16, clusters: int = 20, seed: int = 0) -> np.ndarray:
+    """Embeddings mit Clusterstruktur, wie sie echte Satz-Embeddings zeigen."""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim))
+    return (centers[rng.integers(0, clusters, n)] + 0.3 * rng.standard_normal((n, dim))).astype(np.float32)
+
+
+class TestIVFIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.backend = NumpyBackend(self.tmp_dir, ann=True, nprobe=4, min_train_size=500)
+
+    def tearDown(self):
+        self.backend.close()
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def _add(self, vectors: np.ndarray, offset: int = 0):
+        n = len(vectors)
+        self.backend.add(ids=[f"m{offset + i}" for i in range(n)], embeddings=vectors.tolist(),
+                         metadatas=[{'seq': offset + i} for i in range(n)], documents=[f"doc {offset + i}" for i in range(n)])
+
+    def test_exact_below_training_size(self):
+        self._add(clustered_vectors(100))
+        self.assertFalse(self.backend.ann.ready)
+        query = clustered_vectors(1, seed=1)[0]
+        self.assertEqual(self.backend.query(query, n_results=5)['ids'],
+                         self.backend.query(query, n_results=5, exact=True)['ids'])
+
+    def test_recall_against_exact_search(self):
+        self._add(clustered_vectors(2000))
+        self.backend.ann.wait_for_rebuild()
+        self.assertTrue(self.backend.ann.ready)
+        queries = clustered_vectors(20, seed=1)
+        self.assertGreaterEqual(recall_at_k(self.backend, queries, k=10), 0.8)
+        # Alle Zellen zu durchsuchen ist exakt.
+        nlist = self.backend.ann.get_stats()['nlist']
+        self.assertEqual(recall_at_k(self.backend, queries, k=10, nprobe=nlist), 1.0)
+
+    def test_incremental_insert_and_reopen(self):
+        self._add(clustered_vectors(600))
+        self.backend.ann.wait_for_rebuild()
+        rebuilds = self.backend.ann.rebuilds
+        # Ein neuer, einzigartiger Vektor ist ohne Neutraining sofort auffindbar.
+        unique = np.zeros((1, 16), dtype=np.float32); unique[0, 0] = 1.0
+        self._add(unique, offset=600)
+        self.assertEqual(self.backend.ann.rebuilds, rebuilds)
+        self.assertEqual(self.backend.query(unique[0], n_results=1)['ids'], ["m600"])
+
+        self.backend.delete(["m600"])
+        self.assertNotIn("m600", self.backend.query(unique[0], n_results=3)['ids'])
+        self.backend.close()
+        self.backend = NumpyBackend(self.tmp_dir, ann=True, nprobe=4, min_train_size=500)
+        self.assertTrue(self.backend.ann.ready, "Der Index wird von der Platte geladen, nicht neu trainiert.")
+        self.assertEqual(self.backend.ann.rebuilds, 0)
+        self.assertEqual(self.backend.ann.size, 601)
+
+    def test_background_rebuild_on_growth(self):
+        self._add(clustered_vectors(600))
+        self.backend.ann.wait_for_rebuild()
+        self._add(clustered_vectors(700, seed=2), offset=600)
+        self.backend.ann.wait_for_rebuild()
+        stats = self.backend.get_stats()['ann']
+        self.assertEqual(stats['rebuilds'], 2)
+        self.assertEqual(stats['trained_size'], 1300)
+
+    def test_synchronous_rebuild_blocks_a_second_training(self):
+        self._add(clustered_vectors(100))
+        ann = self.backend.ann
+        release, vectors_fn = threading.Event(), ann.vectors_fn
+
+        def slow_vectors():
+            release.wait(5)
+            return vectors_fn()
+        ann.vectors_fn = slow_vectors
+        worker = threading.Thread(target=ann.rebuild, kwargs={'background': False})
+        worker.start()
+        deadline = time.perf_counter() + 5
+        while not ann.get_stats()['rebuilding'] and time.perf_counter() < deadline:
+            time.sleep(0.001)
+        self.assertIsNone(ann.rebuild(background=True), "Während des Trainings startet kein zweites.")
+        ann.wait_for_rebuild(timeout=0.01)
+        self.assertTrue(ann.get_stats()['rebuilding'])
+
+        release.set()
+        ann.wait_for_rebuild()
+        worker.join()
+        self.assertFalse(ann.get_stats()['rebuilding'])
+        self.assertEqual(ann.rebuilds, 1)
+
+    def test_failed_background_rebuild_is_reported_and_retried(self):
+        self._add(clustered_vectors(100))
+        ann, vectors_fn = self.backend.ann, self.backend.ann.vectors_fn
+
+        def broken_vectors():
+            raise RuntimeError("Speicher wird gerade vergrößert")
+        ann.vectors_fn = broken_vectors
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            ann.rebuild(background=True)
+            ann.wait_for_rebuild()
+        self.assertIn("fehlgeschlagen", output.getvalue())
+        self.assertFalse(ann.get_stats()['rebuilding'])
+
+        ann.vectors_fn = vectors_fn
+        ann.rebuild(background=False)
+        self.assertEqual(ann.rebuilds, 1)
+
+    def test_growing_the_store_never_unmaps_the_vectors(self):
+        self._add(clustered_vectors(10))
+        old = self.backend._vectors
+        during_growth = []
+        memmap = np.memmap
+
+        def recording_memmap(*args, **kwargs):
+            # Was ein Neutraining im Hintergrund in diesem Moment über `vectors_fn` sähe.
+            during_growth.append(self.backend.ann.vectors_fn())
+            return memmap(*args, **kwargs)
+        with unittest.mock.patch("memory.backends.np.memmap", side_effect=recording_memmap):
+            self._add(clustered_vectors(self.backend.capacity, seed=3), offset=10)
+        self.assertEqual(len(during_growth), 1)
+        self.assertIs(during_growth[0], old)
+        np.testing.assert_array_equal(old[:10], self.backend._vectors[:10])
+
+if __name__ == '__main__':
+    unittest.main()
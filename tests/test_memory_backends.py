@@ -0,0 +1,88 @@
+# tests/test_memory_backends.py
+import unittest
+import sys, os
+import shutil
+import tempfile
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from memory.backends import MemoryBackend, NumpyBackend, matches_where
+
+
+class TestNumpyBackend(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.backend = NumpyBackend(self.tmp_dir)
+        self.backend.add(
+            ids=["a", "b", "c"],
+            embeddings=[[1.0, 0.0, 0.0], [0.0, 1.0, 0.0], [0.7, 0.7, 0.0]],
+            metadatas=[{'x': 90, 'seq': 0}, {'x': 0, 'seq': 1}, {'x': 50, 'type': 'synthesis', 'seq': 2}],
+            documents=["Stress", "Ruhe", "Lektion"],
+        )
+
+    def tearDown(self):
+        self.backend.close()
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_query_returns_cosine_top_k(self):
+        results = self.backend.query([2.0, 0.1, 0.0], n_results=2)
+        self.assertEqual(results['documents'], ["Stress", "Lektion"])
+        self.assertLess(results['distances'][0], results['distances'][1])
+        filtered = self.backend.query([2.0, 0.1, 0.0], n_results=2, where={"type": "synthesis"})
+        self.assertEqual(filtered['ids'], ["c"])
+
+    def test_get_with_ids_and_where(self):
+        self.assertEqual(self.backend.get(ids=["b"])['documents'], ["Ruhe"])
+        self.assertEqual(sorted(self.backend.get(where={"seq": {"$gte": 1}})['ids']), ["b", "c"])
+        self.assertIsNone(self.backend.get(include_documents=False)['documents'])
+
+    def test_update_delete_and_reopen(self):
+        self.backend.update(["a"], [{'x': 10, 'seq': 0}])
+        self.backend.delete(["b"])
+        self.backend.add(ids=["d"], embeddings=[[0.0, 0.0, 1.0]], metadatas=[{'seq': 3}], documents=["Neu"])
+        self.backend.close()
+
+        self.backend = NumpyBackend(self.tmp_dir)
+        self.assertEqual(self.backend.count(), 3)
+        self.assertEqual(self.backend.get(ids=["a"])['metadatas'], [{'x': 10, 'seq': 0}])
+        self.assertEqual(self.backend.get(ids=["b"])['ids'], [])
+        self.assertEqual(self.backend.query([0.0, 1.0, 0.0], n_results=1)['ids'], ["c"])
+        self.assertEqual(self.backend.query([0.0, 0.0, 1.0], n_results=1)['documents'], ["Neu"])
+
+    def test_grows_beyond_initial_capacity(self):
+        n = NumpyBackend.INITIAL_CAPACITY + 10
+        self.backend.add(ids=[f"m{i}" for i in range(n)], embeddings=[[0.0, 1.0, float(i == n - 1)] for i in range(n)],
+                         metadatas=[{'seq': 3 + i} for i in range(n)], documents=[f"doc {i}" for i in range(n)])
+        self.assertEqual(self.backend.count(), n + 3)
+        self.assertEqual(self.backend.query([0.0, 0.0, 1.0], n_results=1)['ids'], [f"m{n - 1}"])
+        with self.assertRaises(ValueError):
+            self.backend.add(ids=["a"], embeddings=[[1.0, 0.0, 0.0]], metadatas=[{}], documents=["doppelt"])
+
+    def test_filtered_query_uses_affect_index(self):
+        where = {"$and": [{"x": {"$gte": 40}}, {"seq": {"$lte": 1}}]}
+        self.assertEqual(self.backend.query([0.0, 1.0, 0.0], n_results=3, where=where)['ids'], ["a"])
+        self.backend.delete(["a"])
+        self.assertEqual(self.backend.get(where={"x": {"$gte": 40}})['ids'], ["c"])
+        self.backend.close()
+        self.backend = NumpyBackend(self.tmp_dir)
+        self.assertEqual(self.backend.get(where={"type": "synthesis"})['ids'], ["c"])
+
+    def test_matches_where(self):
+        meta = {'x': 80, 'y': -20, 'type': 'synthesis'}
+        self.assertTrue(matches_where(meta, {"$and": [{"x": {"$gte": 70}}, {"type": "synthesis"}]}))
+        self.assertFalse(matches_where(meta, {"y": {"$gt": 0}}))
+        self.assertFalse(matches_where(meta, {"missing": {"$lt": 1}}))
+        self.assertTrue(matches_where(meta, {"type": {"$in": ["synthesis", "experience"]}}))
+
+    def test_incomplete_backend_fails_at_construction(self):
+        class ReadOnlyBackend(MemoryBackend):
+            def get(self, ids=None, where=None, include_documents=True, include_embeddings=False):
+                return {'ids': [], 'documents': [], 'metadatas': []}
+
+        with self.assertRaises(TypeError):
+            ReadOnlyBackend()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+# tests/test_memory_cache.py
+import unittest
+import sys, os
+import shutil
+import tempfile
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from memory.cache import EmbeddingCache
+
+
+class FakeEncoder:
+    """Ein Platzhalter für den SentenceTransformer, der jeden encode-Aufruf protokolliert."""
+
+    def __init__(self):
+        self.batches = []
+
+    def __call__(self, texts):
+        self.batches.append(list(texts))
+        return np.array([[len(t), t.count(" "), 1.0] for t in texts], dtype=np.float32)
+
+
+class TestEmbeddingCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.encoder = FakeEncoder()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_identical_texts_skip_the_encoder(self):
+        cache = EmbeddingCache(model_name="minilm")
+        first = cache.encode(["Hallo", "Wie geht es?", "Hallo"], self.encoder)
+        second = cache.encode(["Wie geht es?"], self.encoder)
+        self.assertEqual(self.encoder.batches, [["Hallo", "Wie geht es?"]], "Nur ein Aufruf, ohne Duplikate.")
+        np.testing.assert_array_equal(first[0], first[2])
+        np.testing.assert_array_equal(first[1], second[0])
+        stats = cache.get_stats()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 3))
+
+    def test_memory_budget_evicts_least_recently_used(self):
+        # Jeder Vektor belegt 3 * 4 Bytes; das Budget reicht für zwei.
+        cache = EmbeddingCache(max_bytes=24)
+        cache.encode(["a", "b", "c"], self.encoder)
+        stats = cache.get_stats()
+        self.assertEqual(stats['entries'], 2)
+        self.assertLessEqual(stats['bytes'], 24)
+        self.assertIsNone(cache.get("a"))
+
+    def test_cached_rows_do_not_keep_the_batch_alive(self):
+        cache = EmbeddingCache()
+        batch = np.ones((4, 3), dtype=np.float32)
+        cache.put_many(["a", "b", "c", "d"], batch)
+        batch[:] = 0.0
+        self.assertIsNone(cache.get("a").base, "Jede Zeile ist eine eigene Kopie, keine Sicht auf den Batch.")
+        np.testing.assert_array_equal(cache.get("a"), np.ones(3, dtype=np.float32))
+
+    def test_persists_across_instances(self):
+        path = os.path.join(self.tmp_dir, "embeddings.sqlite")
+        cache = EmbeddingCache(model_name="minilm", path=path)
+        expected = cache.encode(["Ein lautes Geräusch"], self.encoder)[0]
+        cache.close()
+
+        reopened = EmbeddingCache(model_name="minilm", path=path)
+        np.testing.assert_array_equal(reopened.get("Ein lautes Geräusch"), expected)
+        self.assertEqual(reopened.get_stats()['disk_hits'], 1)
+        other_model = EmbeddingCache(model_name="anderes-modell", path=path)
+        self.assertIsNone(other_model.get("Ein lautes Geräusch"))
+        other_model.close()
+        reopened.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
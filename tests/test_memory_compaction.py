@@ -0,0 +1,75 @@
+# tests/test_memory_compaction.py
+import unittest
+import sys, os
+import shutil
+import tempfile
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from memory.compaction import find_near_duplicates
+from tests.memory_fakes import FakeEncoderMemory
+
+
+class TestFindNearDuplicates(unittest.TestCase):
+
+    def test_clusters_by_similarity_and_group(self):
+        vectors = np.array([[1, 0], [0.999, 0.04], [0, 1], [0.998, 0.06], [0.05, 0.999]], dtype=np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        self.assertEqual(find_near_duplicates(vectors, range(5), threshold=0.99), [[0, 1, 3], [2, 4]])
+        # Nur Kandidat 4 wird verglichen; seine Partner werden trotzdem gefunden.
+        self.assertEqual(find_near_duplicates(vectors, [4], threshold=0.99), [[2, 4]])
+        groups = ['a', 'a', 'a', 'synthesis', 'a']
+        self.assertEqual(find_near_duplicates(vectors, range(5), threshold=0.99, groups=groups), [[0, 1], [2, 4]])
+        self.assertEqual(find_near_duplicates(vectors, range(5), threshold=0.99, block_bytes=8),
+                         [[0, 1, 3], [2, 4]], "Die Blockgröße darf das Ergebnis nicht ändern.")
+
+
+class TestCompaction(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.mem = FakeEncoderMemory(db_path=self.tmp_dir, embedding_cache_mb=0, backend="numpy")
+
+    def tearDown(self):
+        self.mem.shutdown()
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_merges_duplicates_and_reclaims_space(self):
+        self.mem.add_experiences([{'text': f"Hallo, sagte der Nutzer {i}.", 'metadata': {'x': i}} for i in range(6)])
+        self.mem.add_experience("Draußen scheint die Sonne.", {'x': 0})
+        self.mem.add_experience("Hallo, sagte der Nutzer 9.", {'type': 'synthesis'})
+
+        report = self.mem.compact()
+        self.assertEqual((report['clusters'], report['removed']), (1, 5))
+        self.assertEqual(report['memories_after'], 3)
+        self.assertGreater(report['bytes_reclaimed'], 0)
+        self.assertEqual(self.mem.get_memory_count(), 3)
+
+        greetings = self.mem.query_relevant_memories("hallo", n_results=3)
+        merged = [m for m in greetings if 'merged' in m['metadata']]
+        self.assertEqual(len(merged), 1)
+        self.assertEqual(merged[0]['metadata']['merged'], 6)
+        self.assertEqual(merged[0]['metadata']['x'], 5, "Die neueste Erinnerung des Clusters bleibt erhalten.")
+        self.assertEqual([m['text'] for m in self.mem.get_latest_memories(2)],
+                         ["Draußen scheint die Sonne.", "Hallo, sagte der Nutzer 9."])
+
+    def test_incremental_and_reopen(self):
+        self.mem.add_experiences([{'text': "Es regnet.", 'metadata': {}}, {'text': "Es regnet!", 'metadata': {}}])
+        self.assertEqual(self.mem.compact()['removed'], 1)
+        self.assertEqual(self.mem.compact()['clusters'], 0, "Ohne neue Erinnerungen gibt es nichts zu tun.")
+        self.mem.add_experience("Es regnet?", {})
+        self.assertEqual(self.mem.compact()['removed'], 1)
+        self.mem.add_experience("Die Sonne scheint.", {})
+        self.mem.shutdown()
+
+        self.mem = FakeEncoderMemory(db_path=self.tmp_dir, embedding_cache_mb=0, backend="numpy")
+        self.assertEqual(self.mem.sequence_index.count, 2, "Der Index bleibt nach dem Löschen konsistent.")
+        self.assertEqual(self.mem.get_memory_count(), 2)
+        self.assertEqual(self.mem.get_latest_memories(1)[0]['text'], "Die Sonne scheint.")
+        self.assertEqual(self.mem.get_latest_memories(2)[0]['metadata']['merged'], 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
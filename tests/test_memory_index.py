@@ -0,0 +1,99 @@
+# tests/test_memory_index.py
+import unittest
+import sys, os
+import shutil
+import tempfile
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from memory.index import AffectIndex, SequenceIndex
+
+
+class TestSequenceIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, "seq_index.json")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_reserve_is_monotonic(self):
+        index = SequenceIndex()
+        self.assertEqual(index.reserve(3), [0, 1, 2])
+        self.assertEqual(index.reserve(1), [3])
+
+    def test_latest_returns_newest_in_insertion_order(self):
+        index = SequenceIndex(capacity=3)
+        for i in range(5):
+            index.record(index.reserve(1), [f"id-{i}"])
+        self.assertEqual(index.latest(2), [(3, "id-3"), (4, "id-4")])
+        self.assertIsNone(index.latest(4), "Über die Kapazität hinaus muss der Aufrufer filtern.")
+        self.assertEqual(index.count, 5)
+
+    def test_saves_lazily(self):
+        index = SequenceIndex(path=self.path, save_every=3)
+        index.record(index.reserve(2), ["a", "b"])
+        self.assertFalse(os.path.exists(self.path), "Nicht jeder Einfügevorgang schreibt die Datei.")
+        index.record(index.reserve(1), ["c"])
+        self.assertEqual(SequenceIndex(path=self.path).count, 3)
+        index.record(index.reserve(1), ["d"])
+        self.assertEqual(SequenceIndex(path=self.path).count, 3, "Ein veralteter Stand wird am count erkannt.")
+        index.close()
+        self.assertEqual(SequenceIndex(path=self.path).latest(1), [(3, "d")])
+
+    def test_persists_and_rebuilds(self):
+        index = SequenceIndex(path=self.path)
+        self.assertFalse(index.loaded)
+        index.record(index.reserve(2), ["a", "b"])
+        index.close()
+
+        reopened = SequenceIndex(path=self.path)
+        self.assertTrue(reopened.loaded)
+        self.assertEqual((reopened.next_seq, reopened.count), (2, 2))
+        self.assertEqual(reopened.latest(1), [(1, "b")])
+
+        reopened.rebuild([(7, "x"), (3, "y")], count=2)
+        self.assertEqual(reopened.next_seq, 8)
+        self.assertEqual(reopened.latest(2), [(3, "y"), (7, "x")])
+
+
+class TestAffectIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.index = AffectIndex(cell_size=20.0)
+        self.metadatas = [
+            {'x': 90, 'y': -80},
+            {'x': 75, 'y': 10, 'type': 'synthesis'},
+            {'x': 60, 'y': 0},
+            {'x': -50, 'y': 40, 'type': 'synthesis'},
+            {'seq': 4},
+        ]
+        for row, metadata in enumerate(self.metadatas):
+            self.index.add(row, metadata)
+
+    def test_split_where(self):
+        conditions, residual = AffectIndex.split_where(
+            {"$and": [{"x": {"$gte": 70}}, {"type": "synthesis"}, {"seq": {"$gte": 2}}]})
+        self.assertEqual(sorted(conditions), [('type', '$eq', 'synthesis'), ('x', '$gte', 70)])
+        self.assertEqual(residual, {"seq": {"$gte": 2}})
+        self.assertEqual(AffectIndex.split_where({"$or": [{"x": 1}, {"y": 2}]})[0], [])
+
+    def test_candidates_match_exact_filter(self):
+        self.assertEqual(self.index.candidates([('x', '$gte', 70)]).tolist(), [0, 1])
+        self.assertEqual(self.index.candidates([('x', '$gt', 60), ('y', '$lte', 0)]).tolist(), [0])
+        self.assertEqual(self.index.candidates([('type', '$eq', 'synthesis')]).tolist(), [1, 3])
+        self.assertEqual(self.index.candidates([('type', '$in', ['lesson'])]).tolist(), [])
+        self.assertEqual(self.index.candidates([('x', '$gte', 500)]).tolist(), [])
+        self.assertIsNone(self.index.candidates([]))
+
+    def test_update_and_remove(self):
+        self.index.update(0, {'x': -90, 'y': -80})
+        self.index.remove(1)
+        self.assertEqual(self.index.candidates([('x', '$gte', 70)]).tolist(), [])
+        self.assertEqual(self.index.candidates([('x', '$lte', -60)]).tolist(), [0])
+        self.assertEqual(self.index.candidates([('type', '$eq', 'synthesis')]).tolist(), [3])
+
+
+if __name__ == '__main__':
+    unittest.main()
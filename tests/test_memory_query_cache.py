@@ -0,0 +1,76 @@
+# tests/test_memory_query_cache.py
+import unittest
+import sys, os
+import shutil
+import tempfile
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from memory.cache import QueryResultCache
+from tests.memory_fakes import FakeEncoderMemory
+
+
+class TestQueryResultCache(unittest.TestCase):
+
+    def test_generation_invalidates_and_results_are_copies(self):
+        cache = QueryResultCache(max_entries=2)
+        key = cache.make_key("hallo", n_results=3)
+        self.assertIsNone(cache.get(key))
+        cache.put(key, [{'text': "a", 'metadata': {'x': 1}}], compute_time_s=0.01)
+        result = cache.get(key)
+        result[0]['metadata']['x'] = 99
+        self.assertEqual(cache.get(key)[0]['metadata']['x'], 1)
+        self.assertNotEqual(key, cache.make_key("hallo", n_results=4))
+
+        cache.invalidate()
+        self.assertIsNone(cache.get(cache.make_key("hallo", n_results=3)))
+        stats = cache.get_stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['generation']), (2, 2, 1))
+        self.assertGreater(stats['saved_ms'], 0)
+
+
+class TestQueryCacheInSubsystem(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.mem = FakeEncoderMemory(db_path=self.tmp_dir, embedding_cache_mb=0, backend="numpy", hot_tier_size=0)
+
+    def tearDown(self):
+        self.mem.shutdown()
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_repeated_query_skips_embedding_and_search(self):
+        self.mem.add_experiences([{'text': "Hallo, sagte der Nutzer.", 'metadata': {'x': 0}},
+                                  {'text': "Draußen scheint die Sonne.", 'metadata': {'x': 1}}])
+        first = self.mem.query_relevant_memories("Hallo?", n_results=1)
+        calls = len(self.mem.encoder.calls)
+        self.assertEqual(self.mem.query_relevant_memories("Hallo?", n_results=1), first)
+        self.assertEqual(len(self.mem.encoder.calls), calls, "Ein Treffer darf weder einbetten noch suchen.")
+        # Andere Optionen sind ein anderer Schlüssel.
+        self.mem.query_relevant_memories("Hallo?", n_results=2)
+        self.assertGreater(len(self.mem.encoder.calls), calls)
+
+        stats = self.mem.get_stats()['query_cache']
+        self.assertEqual((stats['hits'], stats['misses']), (1, 2))
+        self.assertAlmostEqual(stats['hit_rate'], 1 / 3)
+
+    def test_store_invalidates_cached_results(self):
+        self.mem.add_experience("Draußen scheint die Sonne.", {'x': 1})
+        self.assertEqual(self.mem.query_relevant_memories("Regen", n_results=1)[0]['text'], "Draußen scheint die Sonne.")
+        self.mem.add_experience("Es regnet, Regen prasselt.", {'x': 2})
+        self.assertEqual(self.mem.query_relevant_memories("Regen", n_results=1)[0]['text'], "Es regnet, Regen prasselt.")
+        self.assertEqual(self.mem.get_stats()['query_cache']['hits'], 0)
+
+    def test_disabled_cache(self):
+        mem = FakeEncoderMemory(db_path=os.path.join(self.tmp_dir, "off"), embedding_cache_mb=0, backend="numpy",
+                                query_cache_size=0)
+        try:
+            mem.add_experience("Hallo, sagte der Nutzer.", {'x': 0})
+            self.assertEqual(mem.query_relevant_memories("Hallo?", n_results=1)[0]['text'], "Hallo, sagte der Nutzer.")
+            self.assertIsNone(mem.get_stats()['query_cache'])
+        finally:
+            mem.shutdown()
+
+
+if __name__ == '__main__':
+    unittest.main()
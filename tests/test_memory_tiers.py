@@ -0,0 +1,115 @@
+# tests/test_memory_tiers.py
+import unittest
+import sys, os
+import shutil
+import tempfile
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from memory.tiers import HotTier
+from tests.memory_fakes import FakeEncoderMemory
+
+
+class TestHotTier(unittest.TestCase):
+
+    def test_search_and_eviction(self):
+        tier = HotTier(capacity=2)
+        tier.add("a", "Stress", {'x': 90}, embedding=[1.0, 0.0], pinned=True)
+        tier.add("b", "Ruhe", {'x': -50}, embedding=[0.0, 1.0])
+        self.assertEqual([r['id'] for r in tier.search([1.0, 0.1], 2)], ["a", "b"])
+        self.assertEqual([r['id'] for r in tier.search([1.0, 0.1], 2, where={'x': {'$lt': 0}})], ["b"])
+        # "a" ist angeheftet: verdrängt wird der älteste nicht angeheftete Eintrag.
+        tier.add("c", "Neu", {}, embedding=[0.7, 0.7])
+        self.assertIn("a", tier)
+        self.assertNotIn("b", tier)
+
+    def test_missing_embeddings_and_l2(self):
+        tier = HotTier(capacity=4, metric="l2")
+        tier.add("a", "ohne Embedding", {})
+        self.assertEqual(tier.search([1.0, 0.0], 1), [])
+        self.assertEqual(tier.missing_embeddings(), [("a", "ohne Embedding")])
+        tier.set_embeddings(["a"], [[3.0, 4.0]])
+        self.assertAlmostEqual(tier.search([0.0, 0.0], 1)[0]['distance'], 25.0)
+
+
+class TestTieredMemory(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.mem = FakeEncoderMemory(db_path=self.tmp_dir, embedding_cache_mb=0, backend="numpy", hot_tier_size=4,
+                                     query_cache_size=0)
+
+    def tearDown(self):
+        self.mem.shutdown()
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_short_term_experience_is_searchable_and_consolidated_once(self):
+        memory_id = self.mem.remember_short_term("Eine Katze sitzt am Fenster.", {'x': 0, 'y': 10})
+        results = self.mem.query_relevant_memories("katze", n_results=1)
+        self.assertEqual(results[0]['text'], "Eine Katze sitzt am Fenster.")
+        self.assertEqual(self.mem.get_memory_count(), 0, "Der Kurzzeitpuffer wird nicht geschrieben.")
+
+        self.mem.add_experiences([{'id': memory_id, 'text': "Eine Katze sitzt am Fenster.", 'metadata': {'x': 0, 'y': 10}}])
+        self.mem.flush()
+        self.assertEqual(self.mem.get_memory_count(), 1)
+        results = self.mem.query_relevant_memories("katze und sonne", n_results=3)
+        self.assertEqual([r['text'] for r in results], ["Eine Katze sitzt am Fenster."], "Keine Doppelung über beide Stufen.")
+
+    def test_frequent_recalls_are_promoted(self):
+        self.mem.add_experiences([{'text': f"Erlebnis {word}", 'metadata': {}} for word in ("hallo", "lärm", "sonne", "regen", "katze")])
+        self.mem.flush()
+        # Nur die vier neuesten passen in die heiße Stufe.
+        self.assertNotIn(self.mem.backend.get(where={'seq': 0})['ids'][0], self.mem.hot_tier)
+
+        self.mem.query_relevant_memories("hallo", n_results=1)
+        self.assertEqual(self.mem.tier_stats['cold_results'], 1)
+        self.mem.query_relevant_memories("hallo", n_results=1)
+        self.assertEqual(self.mem.tier_stats['promotions'], 1)
+
+        results = self.mem.query_relevant_memories("hallo", n_results=1)
+        self.assertEqual(results[0]['text'], "Erlebnis hallo")
+        stats = self.mem.get_tier_stats()
+        self.assertEqual(stats['served_from_hot'], 0, "Nach einer Verdrängung wird das Backend immer befragt.")
+        self.assertEqual((stats['hot_results'], stats['cold_results']), (1, 2))
+        self.assertAlmostEqual(stats['hot_hit_rate'], 1 / 3)
+
+    def test_closer_cold_match_beats_similar_hot_hits(self):
+        self.mem.add_experience("Katze", {})
+        for i in range(4):
+            self.mem.add_experience(f"Die Katze schläft auf dem Sofa ({i}).", {})
+        self.mem.flush()
+        self.assertEqual(len(self.mem.hot_tier), 4, "'Katze' liegt nur noch im Backend.")
+
+        results = self.mem.query_relevant_memories("katze", n_results=1)
+        self.assertEqual(results[0]['text'], "Katze")
+        self.assertEqual((self.mem.tier_stats['served_from_hot'], self.mem.tier_stats['cold_results']), (0, 1))
+
+    def test_backend_skipped_while_hot_tier_holds_everything(self):
+        self.mem.add_experiences([{'text': "Hallo, sagte der Nutzer.", 'metadata': {}},
+                                  {'text': "Draußen scheint die Sonne.", 'metadata': {}}])
+        results = self.mem.query_relevant_memories("sonne", n_results=2)
+        self.assertEqual(results[0]['text'], "Draußen scheint die Sonne.")
+        self.assertEqual(len(results), 2)
+        self.assertEqual(self.mem.tier_stats['served_from_hot'], 1)
+
+    def test_reset_clears_sequence_index_and_recall_counts(self):
+        mem = FakeEncoderMemory(db_path=os.path.join(self.tmp_dir, "test_reset"), embedding_cache_mb=0,
+                                backend="numpy", hot_tier_size=1, query_cache_size=0)
+        try:
+            mem.add_experiences([{'text': "Hallo", 'metadata': {}}, {'text': "Regen", 'metadata': {}}])
+            mem.query_relevant_memories("hallo", n_results=1)
+            self.assertTrue(mem._recall_counts)
+
+            mem.reset_database_for_testing()
+            self.assertEqual((mem.sequence_index.next_seq, mem.sequence_index.count), (0, 0))
+            self.assertEqual(mem._recall_counts, {})
+            self.assertEqual(mem.get_latest_memories(5), [])
+            mem.add_experience("Sonne", {})
+            mem.flush()
+            self.assertEqual([m['metadata']['seq'] for m in mem.get_latest_memories(5)], [0])
+        finally:
+            mem.shutdown()
+
+
+if __name__ == '__main__':
+    unittest.main()
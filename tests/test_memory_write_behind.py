@@ -0,0 +1,103 @@
+# tests/test_memory_write_behind.py
+import unittest
+import sys, os
+import shutil
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from tests.memory_fakes import FakeEncoder, FakeEncoderMemory
+
+
+class TestWriteBehind(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.encoder = FakeEncoder(gated=True)
+        # Ohne heiße Stufe, damit jede Abfrage das Backend (und damit den Schreibpuffer) erreicht.
+        self.mem = FakeEncoderMemory(db_path=self.tmp_dir, embedding_cache_mb=0, backend="numpy", hot_tier_size=0,
+                                     encoder=self.encoder)
+
+    def tearDown(self):
+        self.encoder.gate.set()
+        self.mem.shutdown()
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_add_returns_before_write_and_reads_see_it(self):
+        self.mem.add_experience("erstes", {'x': 1})
+        self.mem.add_experiences([{'text': f"zweites {i}", 'metadata': {'x': 2}} for i in range(3)])
+        # Das Embedding wartet noch, trotzdem sind die Einträge sichtbar.
+        self.assertEqual(self.mem.backend.count(), 0)
+        self.assertEqual(self.mem.get_memory_count(), 4)
+        self.assertEqual([m['text'] for m in self.mem.get_latest_memories(2)], ["zweites 1", "zweites 2"])
+
+        self.encoder.gate.set()
+        results = self.mem.query_relevant_memories("erstes", n_results=4)
+        self.assertEqual(len(results), 4, "Abfragen nach dem Einfügen sehen alle eingereihten Einträge.")
+        self.mem.flush()
+        self.assertEqual(self.mem.backend.count(), 4)
+        self.assertLess(self.mem.get_stats()['write_behind']['batches'], 4, "Der Worker schreibt gebündelt.")
+
+    def test_query_does_not_wait_for_a_slow_commit(self):
+        self.encoder.gate.set()
+        release = threading.Event()
+        add = self.mem.backend.add
+
+        def slow_add(**kwargs):
+            release.wait(5)
+            add(**kwargs)
+        self.mem.backend.add = slow_add
+        self.mem.add_experience("Die Sonne scheint.", {'x': 1})
+        self.mem.add_experience("Es regnet.", {'x': 2})
+        try:
+            start = time.perf_counter()
+            results = self.mem.query_relevant_memories("regen", n_results=1)
+            self.assertLess(time.perf_counter() - start, 1.0, "Die Abfrage wartet nicht auf das Schreiben.")
+            self.assertEqual(results[0]['text'], "Es regnet.")
+        finally:
+            release.set()
+        self.mem.flush()
+        self.assertEqual(self.mem.backend.count(), 2)
+
+    def test_shutdown_drains_queue(self):
+        self.mem.add_experiences([{'text': f"Erlebnis {i}", 'metadata': {}} for i in range(5)])
+        self.encoder.gate.set()
+        self.mem.shutdown()
+        reopened = FakeEncoderMemory(db_path=self.tmp_dir, embedding_cache_mb=0, backend="numpy", hot_tier_size=0,
+                                     encoder=self.encoder)
+        self.assertEqual(reopened.get_memory_count(), 5)
+        self.assertEqual(reopened.get_latest_memories(1)[0]['metadata']['seq'], 4)
+        self.mem = reopened
+
+    def test_flush_reports_failed_write(self):
+        self.encoder.gate.set()
+        self.mem.add_experience("gut", {})
+        self.mem.flush()
+
+        def failing_add(**kwargs):
+            raise ValueError("ungültige Metadaten")
+        self.mem.backend.add = failing_add
+        self.mem.add_experience("kaputt", {})
+        with self.assertRaises(RuntimeError):
+            self.mem.flush()
+        self.assertEqual(self.mem.get_memory_count(), 1)
+        self.mem.flush()
+
+    def test_shutdown_closes_backend_after_failed_write(self):
+        self.encoder.gate.set()
+        closed = []
+
+        def failing_add(**kwargs):
+            raise ValueError("ungültige Metadaten")
+        self.mem.backend.add = failing_add
+        self.mem.backend.close = lambda: closed.append(True)
+        self.mem.add_experience("kaputt", {})
+        with self.assertRaises(RuntimeError):
+            self.mem.shutdown()
+        self.assertEqual(closed, [True])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -10,7 +10,8 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')
 from modulation.functions import (
     modulate_temperature,
     modulate_attention_scores,
-    calculate_layer_drop_rate
+    calculate_layer_drop_rate,
+    calculate_token_budget
 )
 
 
@@ -83,6 +84,23 @@ class TestModulationFunctions(unittest.TestCase):
         # Testet den Clamp bei Werten > 100
         self.assertAlmostEqual(calculate_layer_drop_rate(110), 0.5)
 
+    def test_calculate_token_budget(self):
+        """Testet das Token-Budget basierend auf x- und y-Werten."""
+        # Neutraler Zustand -> Basis-Budget
+        self.assertEqual(calculate_token_budget(0, 0), 48)
+        # Negative Valenz verlängert die Gedanken nicht
+        self.assertEqual(calculate_token_budget(0, -100), 48)
+        # Positive Valenz -> längere Gedanken
+        self.assertEqual(calculate_token_budget(0, 100), 80)
+
+        # Hohes Arousal verkürzt das Budget
+        self.assertEqual(calculate_token_budget(75, 0), 30)  # 48 * (1 - 0.375)
+        self.assertEqual(calculate_token_budget(100, 0), 12)  # 48 * 0.25
+        self.assertLess(calculate_token_budget(90, 100), calculate_token_budget(0, 100))
+
+        # Werte außerhalb des Bereichs bleiben geklemmt
+        self.assertEqual(calculate_token_budget(150, 0), 12)
+
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,92 @@
+# tests/test_pag_cache.py
+import unittest
+import sys, os
+import shutil
+import tempfile
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from pag.cache import LRUCache, ResponseCache
+
+
+class TestLRUCache(unittest.TestCase):
+
+    def setUp(self):
+        # Jeder Wert ist ein String; seine Länge zählt als Größe in Bytes.
+        self.cache = LRUCache(max_bytes=10, size_fn=len)
+
+    def test_hit_and_miss_counters(self):
+        self.assertIsNone(self.cache.get("a"))
+        self.cache.put("a", "xyz")
+        self.assertEqual(self.cache.get("a"), "xyz")
+        stats = self.cache.get_stats()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 1))
+        self.assertAlmostEqual(stats['hit_rate'], 0.5)
+
+    def test_evicts_least_recently_used_within_budget(self):
+        self.cache.put("a", "1234")
+        self.cache.put("b", "1234")
+        self.cache.get("a")            # "a" ist jetzt zuletzt genutzt
+        self.cache.put("c", "1234")    # 12 Bytes > 10 -> "b" muss weichen
+        self.assertIn("a", self.cache)
+        self.assertNotIn("b", self.cache)
+        self.assertIn("c", self.cache)
+        self.assertLessEqual(self.cache.current_bytes, 10)
+        self.assertEqual(self.cache.get_stats()['evictions'], 1)
+
+    def test_overwrite_updates_size(self):
+        self.cache.put("a", "12345678")
+        self.cache.put("a", "12")
+        self.assertEqual(self.cache.current_bytes, 2)
+        self.assertEqual(len(self.cache), 1)
+
+    def test_oversized_value_is_not_stored(self):
+        self.cache.put("big", "x" * 11)
+        self.assertNotIn("big", self.cache)
+        self.assertEqual(self.cache.current_bytes, 0)
+
+
+class TestResponseCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, "responses.sqlite")
+        self.cache = ResponseCache(path=self.path, max_temperature=0.35)
+
+    def tearDown(self):
+        self.cache.close()
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_roundtrip_within_temperature_bucket(self):
+        self.cache.put("flan", "Prompt", 0.30, "Antwort")
+        self.assertEqual(self.cache.get("flan", "Prompt", 0.31), "Antwort")
+        self.assertIsNone(self.cache.get("flan", "Prompt", 0.10), "Anderer Bucket darf nicht treffen.")
+        self.assertIsNone(self.cache.get("anderes-modell", "Prompt", 0.30))
+
+    def test_high_temperature_bypasses_cache(self):
+        self.cache.put("flan", "Prompt", 1.5, "kreativ")
+        self.assertIsNone(self.cache.get("flan", "Prompt", 1.5))
+        stats = self.cache.get_stats()
+        self.assertEqual(stats['entries'], 0)
+        self.assertEqual(stats['bypassed'], 1)
+
+    def test_persists_across_instances(self):
+        self.cache.put("flan", "Prompt", 0.3, "Antwort")
+        self.cache.close()
+        self.cache = ResponseCache(path=self.path)
+        self.assertEqual(self.cache.get("flan", "Prompt", 0.3), "Antwort")
+
+    def test_size_based_eviction(self):
+        cache = ResponseCache(max_bytes=10)
+        cache.put("flan", "a", 0.3, "12345")
+        cache.put("flan", "b", 0.3, "12345")
+        cache.put("flan", "c", 0.3, "12345")
+        stats = cache.get_stats()
+        self.assertLessEqual(stats['bytes'], 10)
+        self.assertEqual(stats['evictions'], 1)
+        self.assertEqual(cache.get("flan", "c", 0.3), "12345")
+        cache.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -47,6 +47,73 @@ class TestPagUpgrade(unittest.TestCase):
             self.assertIsInstance(o, str)
             self.assertTrue(len(o) > 5, "Jede valide kreative Antwort sollte mehr als nur ein Wort sein.")
 
+    def test_d_batch_inference(self):
+        """Test D: Liefert infer_batch die Antworten in Eingabereihenfolge, mit eigener Temperatur pro Zeile?"""
+        print("\n--- Test D: Gebündelte Inferenz ---")
+        prompts = [
+            "Answer the following question based on the context. Context: The sun is a massive star that provides heat. Question: What does the sun provide?",
+            "Translate to German: The sky is blue.",
+            "Write a short, poetic sentence about the moon.",
+        ]
+        outputs = self.pag.infer_batch(prompts, temperatures=[0.01, 0.01, 1.8])
+        print(f"Erhaltene Antworten: {outputs}")
+        self.assertEqual(len(outputs), len(prompts))
+        self.assertIn("heat", outputs[0].lower())
+        self.assertIn("himmel", outputs[1].lower())
+        self.assertEqual(outputs[1], self.pag.infer(prompts[1], temperature=0.01),
+                         "Padding im Batch darf die Antwort einer Zeile nicht verändern.")
+        with self.assertRaises(ValueError):
+            self.pag.infer_batch(prompts, temperatures=[0.5])
+
+    def test_e_int8_quantization(self):
+        """Test E: Beantwortet das int8-quantisierte Modell die Kontextfrage weiterhin korrekt?"""
+        print("\n--- Test E: int8-Quantisierung ---")
+        pag_int8 = PAG_Model(model_name="google/flan-t5-base", quantization="int8")
+        prompt = "Answer the following question based on the context. Context: The sun is a massive star that provides heat. Question: What does the sun provide?"
+        output = pag_int8.infer(prompt, temperature=0.1)
+        print(f"Prompt: {prompt}\nOutput: {output}")
+        self.assertIn("heat", output.lower())
+        with self.assertRaises(ValueError):
+            PAG_Model(model_name="google/flan-t5-base", quantization="int4")
+
+    def test_f_layer_drop(self):
+        """Test F: Überspringt der Tunnelblick Decoder-Layer und stellt das Modell danach wieder her?"""
+        print("\n--- Test F: Layer-Drop (Tunnelblick) ---")
+        total_layers = len(self.pag.model.decoder.block)
+        output = self.pag.infer("Translate to German: The sky is blue.", temperature=0.3, layer_drop_rate=0.5)
+        stats = self.pag.get_stats()['last_call']
+        print(f"Output: {output} | Stats: {stats}")
+        self.assertIsInstance(output, str)
+        self.assertEqual(stats['skipped_layers'], round(0.5 * total_layers))
+        self.assertEqual(len(self.pag.model.decoder.block), total_layers,
+                         "Nach dem Aufruf muss der Decoder wieder vollständig sein.")
+
+    def test_g_generation_budget(self):
+        """Test G: Werden Token-Budget und Satzende-Stopp eingehalten?"""
+        print("\n--- Test G: Generierungs-Budget ---")
+        self.pag.infer("Write a long story about the moon.", temperature=0.5, max_new_tokens=4)
+        self.assertLessEqual(self.pag.get_stats()['last_call']['generated_tokens'], 4)
+
+        outputs = self.pag.infer_batch(["Write a long story about the moon.", "Describe the sun in detail."],
+                                       temperatures=[0.8, 0.8], stop_at_sentence_end=True)
+        print(f"Antworten (ein Satz): {outputs}")
+        for o in outputs:
+            self.assertFalse(any(c in o[:-1] for c in ".!?"), "Nach dem ersten Satz muss Schluss sein.")
+
+    def test_h_assisted_generation(self):
+        """Test H: Liefert Assisted Generation mit Draft-Modell bei greedy Dekodierung dieselbe Antwort?"""
+        print("\n--- Test H: Assisted Generation ---")
+        prompt = "Translate to German: The sky is blue."
+        reference = self.pag.infer(prompt, temperature=0.5, greedy=True)
+        pag_assisted = PAG_Model(model_name="google/flan-t5-base", assistant_model_name="google/flan-t5-small")
+        output = pag_assisted.infer(prompt, temperature=0.5, greedy=True)
+        stats = pag_assisted.get_stats()['assisted']
+        print(f"Output: {output} | Stats: {stats}")
+        self.assertEqual(output, reference, "Das Draft-Modell darf die greedy Antwort nicht verändern.")
+        self.assertEqual(stats['calls'], 1)
+        self.assertGreater(stats['draft_tokens'], 0)
+        self.assertTrue(0.0 <= stats['acceptance_rate'] <= 1.0)
+
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,121 @@
+# tests/test_perception_audio.py
+import unittest
+import sys, os
+import shutil
+import tempfile
+import wave
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from perception.audio import AudioListener, AudioRingBuffer, AudioSource, EnergyVAD, WavFileSource, load_wav
+
+SAMPLERATE = 16000
+
+
+def segment(seconds: float, amplitude: float = 0.0, seed: int = 0) -> np.ndarray:
+    """Leises Rauschen, bei amplitude > 0 mit einem 220-Hz-Ton (als Ersatz für Sprache)."""
+    n = int(seconds * SAMPLERATE)
+    noise = 0.001 * np.random.default_rng(seed).standard_normal(n)
+    return (noise + amplitude * np.sin(2 * np.pi * 220 * np.arange(n) / SAMPLERATE)).astype(np.float32)
+
+
+def write_wav(path: str, samples: np.ndarray, samplerate: int = SAMPLERATE):
+    with wave.open(path, 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(samplerate)
+        wav.writeframes((np.clip(samples, -1, 1) * 32767).astype(np.int16).tobytes())
+
+
+class TestAudioRingBuffer(unittest.TestCase):
+
+    def test_wraps_and_returns_latest_samples(self):
+        buffer = AudioRingBuffer(5)
+        buffer.write(np.arange(3))
+        self.assertEqual(buffer.latest(10).tolist(), [0, 1, 2])
+        buffer.write(np.arange(3, 7))
+        self.assertEqual(buffer.latest(5).tolist(), [2, 3, 4, 5, 6])
+        self.assertEqual(buffer.latest(2).tolist(), [5, 6])
+        buffer.write(np.arange(7, 20))
+        self.assertEqual(buffer.latest(5).tolist(), [15, 16, 17, 18, 19])
+        self.assertEqual(buffer.total_written, 20)
+
+
+class TestEnergyVAD(unittest.TestCase):
+
+    def test_segments_speech_and_ignores_silence_and_clicks(self):
+        vad = EnergyVAD(samplerate=SAMPLERATE)
+        signal = np.concatenate([segment(1.0), segment(0.6, 0.3), segment(0.8), segment(0.03, 0.5),
+                                 segment(0.8), segment(0.5, 0.2)])
+        utterances = []
+        # In unregelmäßigen Blöcken, wie sie vom Mikrofon kommen.
+        for start in range(0, len(signal), 1234):
+            utterances += vad.process(signal[start:start + 1234])
+        self.assertEqual(len(utterances), 1, "Die zweite Äußerung läuft noch.")
+        utterances += vad.flush()
+        self.assertEqual(len(utterances), 2)
+        self.assertEqual(vad.discarded, 1, "Der Klick ist zu kurz für Sprache.")
+        # Vorlauf + Ton + Nachlauf.
+        self.assertAlmostEqual(len(utterances[0]) / SAMPLERATE, 0.2 + 0.6 + 0.4, delta=0.1)
+
+    def test_silence_produces_no_utterances(self):
+        vad = EnergyVAD(samplerate=SAMPLERATE)
+        self.assertEqual(vad.process(segment(3.0)) + vad.flush(), [])
+        self.assertEqual(vad.get_stats()['voiced_ratio'], 0.0)
+
+    def test_constant_noise_raises_the_noise_floor(self):
+        vad = EnergyVAD(samplerate=SAMPLERATE)
+        # Gleichmäßiges Rauschen bei -35 dBFS, also über `threshold_db`.
+        noise = (10 ** (-35 / 20) * np.random.default_rng(1).standard_normal(30 * SAMPLERATE)).astype(np.float32)
+        utterances = []
+        for start in range(0, len(noise), SAMPLERATE):
+            utterances += vad.process(noise[start:start + SAMPLERATE])
+        self.assertLessEqual(len(utterances), 1, "Das Rauschen ist keine endlose Folge von Äußerungen.")
+        self.assertFalse(vad.in_speech)
+        self.assertGreater(vad.get_stats()['noise_floor_db'], -38)
+
+        speech = noise[:int(0.6 * SAMPLERATE)] + segment(0.6, 0.3)
+        utterances = vad.process(np.concatenate([speech, noise[:SAMPLERATE]]))
+        self.assertEqual(len(utterances), 1, "Lautere Sprache wird über dem Rauschen weiter erkannt.")
+
+
+class TestWavFileListener(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_load_wav_resamples_to_target_rate(self):
+        path = os.path.join(self.tmp_dir, "8k.wav")
+        write_wav(path, segment(0.5, 0.3), samplerate=8000)  # 8000 Samples = 1 s
+        self.assertEqual(len(load_wav(path, SAMPLERATE)), SAMPLERATE)
+
+    def test_replays_file_at_max_speed(self):
+        path = os.path.join(self.tmp_dir, "speech.wav")
+        write_wav(path, np.concatenate([segment(0.5), segment(0.7, 0.3), segment(1.0), segment(0.4, 0.3)]))
+        heard = []
+        listener = AudioListener(WavFileSource(path, realtime=False), on_utterance=heard.append)
+        self.assertTrue(listener.start())
+        listener.wait_until_finished(timeout=10)
+        self.assertFalse(listener.is_running)
+        self.assertEqual(len(heard), 2)
+        self.assertEqual(len(listener.drain()), 2)
+        self.assertEqual(listener.drain(), [])
+        self.assertAlmostEqual(listener.get_stats()['seconds_heard'], 2.6, places=2)
+        self.assertFalse(listener.is_silent(listener.recent(1.0)))
+        listener.close()
+
+    def test_source_without_read_fails_at_construction(self):
+        class MuteSource(AudioSource):
+            pass
+
+        with self.assertRaises(TypeError):
+            MuteSource()
+
+
+if __name__ == '__main__':
+    unittest.main()
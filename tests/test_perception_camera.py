@@ -0,0 +1,103 @@
+# tests/test_perception_camera.py
+import unittest
+import unittest.mock
+import sys, os
+import threading
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from perception.camera import FrameGrabber
+
+
+class FakeCapture:
+    """Ein Platzhalter für `cv2.VideoCapture`, der nur auf Freigabe nummerierte Bilder liefert."""
+
+    def __init__(self, device_index, opened: bool = True):
+        self.opened = opened
+        self.allowed = threading.Semaphore(0)
+        self.delivered = 0
+        self.released = False
+
+    def isOpened(self):
+        return self.opened
+
+    def read(self):
+        if not self.allowed.acquire(timeout=0.01):
+            return False, None
+        self.delivered += 1
+        return True, np.full((2, 2, 3), self.delivered, dtype=np.uint8)
+
+    def release(self):
+        self.released = True
+
+    def deliver(self, n: int = 1):
+        for _ in range(n):
+            self.allowed.release()
+
+
+class TestFrameGrabber(unittest.TestCase):
+
+    def setUp(self):
+        self.captures = []
+
+        def open_capture(device_index):
+            capture = FakeCapture(device_index)
+            self.captures.append(capture)
+            return capture
+        patcher = unittest.mock.patch("perception.camera.cv2.VideoCapture", side_effect=open_capture)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.grabber = FrameGrabber(retry_delay_s=0.001)
+        self.addCleanup(self.grabber.close)
+
+    def _wait_for_grabbed(self, n: int):
+        deadline = time.perf_counter() + 2
+        while self.grabber.frames_grabbed < n and time.perf_counter() < deadline:
+            time.sleep(0.001)
+        self.assertEqual(self.grabber.frames_grabbed, n)
+
+    def test_read_waits_for_the_first_frame(self):
+        self.assertTrue(self.grabber.start())
+        threading.Timer(0.1, self.captures[0].deliver).start()
+        start = time.perf_counter()
+        frame = self.grabber.read(timeout=2)
+        self.assertGreaterEqual(time.perf_counter() - start, 0.05)
+        self.assertEqual(frame[0, 0, 0], 1)
+
+    def test_keeps_only_the_latest_frame(self):
+        self.grabber.start()
+        capture = self.captures[0]
+        capture.deliver()
+        self.assertEqual(self.grabber.read()[0, 0, 0], 1)
+        capture.deliver(3)
+        self._wait_for_grabbed(4)
+        self.assertEqual(self.grabber.read()[0, 0, 0], 4, "Zwischenbilder werden übersprungen.")
+        self.assertEqual(self.grabber.read()[0, 0, 0], 4)
+
+        time.sleep(0.05)  # Ohne Freigabe schlägt das Lesen fehl.
+        stats = self.grabber.get_stats()
+        self.assertEqual((stats['frames_grabbed'], stats['frames_read'], stats['frames_dropped']), (4, 3, 2))
+        self.assertGreater(stats['read_failures'], 0)
+
+    def test_close_releases_the_device(self):
+        self.grabber.start()
+        self.captures[0].deliver()
+        self.assertIsNotNone(self.grabber.read())
+        self.grabber.close()
+        self.assertTrue(self.captures[0].released)
+        self.assertFalse(self.grabber.is_open)
+        self.assertIsNone(self.grabber.read(timeout=0.01))
+
+    def test_missing_camera_does_not_start(self):
+        capture = FakeCapture(0, opened=False)
+        with unittest.mock.patch("perception.camera.cv2.VideoCapture", return_value=capture):
+            self.assertFalse(self.grabber.start())
+        self.assertTrue(capture.released)
+        self.assertFalse(self.grabber.is_open)
+
+
+if __name__ == '__main__':
+    unittest.main()
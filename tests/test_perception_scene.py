@@ -0,0 +1,57 @@
+# tests/test_perception_scene.py
+import unittest
+import sys, os
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from perception.scene import SceneChangeDetector, thumbnail
+
+
+def frame(seed: int = 0, shift: int = 0, noise: float = 3.0) -> np.ndarray:
+    """Ein 240x320-BGR-Bild: heller Block vor dunklem Hintergrund, plus Sensorrauschen."""
+    rng = np.random.default_rng(seed)
+    image = np.full((240, 320, 3), 40.0)
+    image[80:160, 100 + shift:180 + shift] = 200.0
+    image += noise * rng.standard_normal(image.shape)
+    return np.clip(image, 0, 255).astype(np.uint8)
+
+
+class TestSceneChangeDetector(unittest.TestCase):
+
+    def test_thumbnail_size_and_range(self):
+        small = thumbnail(frame(), size=32)
+        self.assertEqual(small.shape, (32, 32))
+        self.assertLessEqual(small.max(), 1.0)
+        self.assertEqual(thumbnail(np.zeros((10, 12), np.uint8), size=32).shape, (10, 12))
+
+    def test_skips_static_frames_and_detects_changes(self):
+        detector = SceneChangeDetector(threshold=0.04)
+        self.assertTrue(detector.has_changed(frame(seed=0)), "Ohne Referenz muss beschrieben werden.")
+        detector.accept()
+        # Nur Sensorrauschen: die Beschreibung bleibt gültig.
+        for seed in range(1, 5):
+            self.assertFalse(detector.has_changed(frame(seed=seed)))
+        # Das Objekt bewegt sich deutlich.
+        self.assertTrue(detector.has_changed(frame(seed=5, shift=80)))
+        stats = detector.get_stats()
+        self.assertEqual((stats['frames'], stats['skipped']), (6, 4))
+        self.assertAlmostEqual(stats['skip_rate'], 4 / 6)
+
+    def test_slow_drift_accumulates_against_last_caption(self):
+        detector = SceneChangeDetector(threshold=0.04)
+        detector.has_changed(frame(shift=0))
+        detector.accept()
+        changed_at = None
+        for shift in range(4, 120, 4):
+            if detector.has_changed(frame(shift=shift)):
+                changed_at = shift
+                break
+        self.assertIsNotNone(changed_at, "Kleine Schritte summieren sich gegenüber der Referenz auf.")
+        # Ohne `accept` (z.B. fehlgeschlagene Beschreibung) bleibt die alte Referenz bestehen.
+        self.assertTrue(detector.has_changed(frame(shift=changed_at)))
+
+
+if __name__ == '__main__':
+    unittest.main()
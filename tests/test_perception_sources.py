@@ -0,0 +1,100 @@
+# tests/test_perception_sources.py
+import unittest
+import sys, os
+import shutil
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from perception.audio import WavFileSource
+from perception.sources import ImageDirectorySource, ReplayFrameSource, VideoFileSource, open_replay
+from tests.test_perception_audio import segment, write_wav
+
+
+def numbered_frame(i: int) -> np.ndarray:
+    """Ein einfarbiges Bild, dessen Helligkeit die Bildnummer kodiert."""
+    return np.full((48, 64, 3), 20 * i, dtype=np.uint8)
+
+
+class TestReplaySources(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def _write_images(self, n: int):
+        for i in range(n):
+            cv2.imwrite(os.path.join(self.tmp_dir, f"frame_{i:03d}.png"), numbered_frame(i))
+
+    def test_images_at_max_speed(self):
+        self._write_images(4)
+        source = ImageDirectorySource(self.tmp_dir, realtime=False)
+        self.assertTrue(source.start())
+        values = []
+        while not source.finished:
+            values.append(int(source.read()[0, 0, 0]))
+        self.assertEqual(values, [0, 20, 40, 60])
+        self.assertIsNone(source.read())
+        self.assertEqual(source.get_stats()['frames_skipped'], 0)
+
+    def test_images_in_realtime_skip_like_a_camera(self):
+        self._write_images(6)
+        source = ImageDirectorySource(self.tmp_dir, fps=10.0, realtime=True)
+        source.start()
+        first = source.read()
+        self.assertIs(source.read(), first, "Schneller gelesen als aufgezeichnet: dasselbe Bild.")
+        time.sleep(0.25)
+        self.assertGreaterEqual(int(source.read()[0, 0, 0]), 40)
+        self.assertGreater(source.get_stats()['frames_skipped'], 0)
+        time.sleep(0.5)
+        self.assertIsNone(source.read())
+        self.assertTrue(source.finished)
+
+    def test_video_file_and_directory_replay(self):
+        path = os.path.join(self.tmp_dir, "clip.avi")
+        writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), 10.0, (64, 48))
+        for i in range(5):
+            writer.write(numbered_frame(i))
+        writer.release()
+        write_wav(os.path.join(self.tmp_dir, "a.wav"), segment(0.5, 0.3))
+        write_wav(os.path.join(self.tmp_dir, "b.wav"), segment(0.5, 0.3))
+
+        frames, audio = open_replay(self.tmp_dir, realtime=False)
+        self.assertIsInstance(frames, VideoFileSource)
+        self.assertTrue(frames.start())
+        self.assertEqual((frames.n_frames, frames.fps), (5, 10.0))
+        values = []
+        while not frames.finished:
+            values.append(int(frames.read()[0, 0, 0]))
+        self.assertEqual(len(values), 5)
+        self.assertAlmostEqual(values[-1], 80, delta=4)  # MJPG ist verlustbehaftet.
+        frames.close()
+
+        self.assertIsInstance(audio, WavFileSource)
+        self.assertTrue(audio.start())
+        heard = 0
+        while not audio.finished:
+            heard += len(audio.read())
+        self.assertEqual(heard, 16000 * (0.5 + 1.0 + 0.5), "Zwei Dateien mit einer Sekunde Pause.")
+
+    def test_missing_modality_does_not_start(self):
+        frames, audio = open_replay(self.tmp_dir)
+        self.assertFalse(frames.start())
+        self.assertFalse(audio.start())
+
+    def test_replay_without_load_fails_at_construction(self):
+        class EmptyReplay(ReplayFrameSource):
+            pass
+
+        with self.assertRaises(TypeError):
+            EmptyReplay(n_frames=3, fps=10.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
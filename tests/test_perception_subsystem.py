@@ -0,0 +1,106 @@
+# tests/test_perception_subsystem.py
+import unittest
+import sys, os
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from perception.audio import AudioSource
+from perception.sources import FrameSource
+from perception.subsystem import PerceptionSubsystem
+
+SAMPLERATE = 16000
+MODEL_DELAY_S = 0.3
+
+
+class StillFrameSource(FrameSource):
+    """Ein Platzhalter für die Kamera, der immer dasselbe Bild liefert."""
+
+    def __init__(self):
+        self.open = False
+
+    def start(self) -> bool:
+        self.open = True
+        return True
+
+    @property
+    def is_open(self) -> bool:
+        return self.open
+
+    def read(self, timeout: float = 2.0):
+        return np.zeros((8, 8, 3), dtype=np.uint8)
+
+    def close(self):
+        self.open = False
+
+
+class UtteranceSource(AudioSource):
+    """Ein Platzhalter für das Mikrofon: ein Ton (als Ersatz für Sprache), danach Stille."""
+
+    samplerate = SAMPLERATE
+
+    def __init__(self):
+        t = np.arange(int(0.6 * SAMPLERATE)) / SAMPLERATE
+        self.samples = np.concatenate([0.3 * np.sin(2 * np.pi * 220 * t),
+                                       np.zeros(SAMPLERATE)]).astype(np.float32)
+        self.position = 0
+
+    def read(self, timeout: float = 0.1) -> np.ndarray:
+        chunk = self.samples[self.position:self.position + 1600]
+        self.position += len(chunk)
+        return chunk
+
+    @property
+    def finished(self) -> bool:
+        return self.position >= len(self.samples)
+
+
+class SlowModelsPerception(PerceptionSubsystem):
+    """Ersetzt BLIP, Whisper und HuBERT durch Platzhalter, die jeweils `MODEL_DELAY_S` rechnen."""
+
+    def _ensure_models(self, *keys) -> bool:
+        return True
+
+    def _caption(self, frame: np.ndarray) -> str:
+        time.sleep(MODEL_DELAY_S)
+        return "a desk"
+
+    def _transcribe(self, audio_data: np.ndarray) -> str:
+        time.sleep(MODEL_DELAY_S)
+        return "hallo"
+
+    def _classify_sound(self, audio_data: np.ndarray) -> str:
+        time.sleep(MODEL_DELAY_S)
+        return "Speech"
+
+
+class TestPerceptionCycle(unittest.TestCase):
+
+    def setUp(self):
+        self.perception = SlowModelsPerception(frame_source=StillFrameSource(), audio_source=UtteranceSource(),
+                                               scene_change_threshold=None)
+        self.addCleanup(self.perception.close)
+
+    def test_vision_runs_alongside_audio(self):
+        self.perception.listener.wait_until_finished(timeout=5)
+        result = self.perception.perceive()
+
+        self.assertEqual(result['vision'], "I see: a desk.")
+        self.assertEqual(result['sound'], "I hear ambient sounds like: Speech.")
+        self.assertEqual(result['speech'], "I hear someone say: 'hallo'")
+        timings = result['timings_ms']
+        for stage in ('vision', 'classify', 'total'):
+            self.assertIn(stage, timings)
+        # Nebenläufig dauert der Zyklus so lange wie die langsamste Stufe, nicht wie ihre Summe.
+        self.assertGreaterEqual(timings['total'], max(timings['vision'], timings['classify']))
+        self.assertLess(timings['total'], 0.8 * (timings['vision'] + timings['classify']))
+
+        stats = self.perception.get_stats()
+        self.assertEqual((stats['utterances'], stats['transcribed'], stats['failed_transcriptions']), (1, 1, 0))
+        self.assertEqual(stats['stages']['caption']['count'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+# tests/test_registry.py
+import unittest
+import sys, os
+import threading
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from registry.models import ModelRegistry
+
+
+class CountingLoader:
+    """Ein Platzhalter für ein großes Modell, der zählt, wie oft er geladen wurde."""
+
+    def __init__(self, delay: float = 0.0, fail_times: int = 0):
+        self.delay = delay
+        self.fail_times = fail_times
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        time.sleep(self.delay)
+        if self.calls <= self.fail_times:
+            raise RuntimeError("Download fehlgeschlagen")
+        return {"model": self.calls}
+
+
+class TestModelRegistry(unittest.TestCase):
+
+    def setUp(self):
+        self.registry = ModelRegistry()
+
+    def test_loads_lazily_and_shares_instance(self):
+        loader = CountingLoader()
+        self.registry.register("blip", loader)
+        self.assertEqual(loader.calls, 0, "Registrieren darf noch nicht laden.")
+        self.assertFalse(self.registry.is_loaded("blip"))
+
+        first = self.registry.get("blip")
+        self.assertIs(self.registry.get("blip"), first)
+        self.assertEqual(loader.calls, 1)
+        stats = self.registry.get_stats()
+        self.assertTrue(stats['models']['blip']['loaded'])
+        self.assertEqual((stats['loads'], stats['hits']), (1, 1))
+
+    def test_concurrent_get_loads_once(self):
+        loader = CountingLoader(delay=0.05)
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(self.registry.get("whisper", loader)))
+                   for _ in range(5)]
+        for t in threads: t.start()
+        for t in threads: t.join()
+        self.assertEqual(loader.calls, 1)
+        self.assertTrue(all(r is results[0] for r in results))
+
+    def test_background_preload(self):
+        loader = CountingLoader(delay=0.05)
+        self.registry.register("flan", loader)
+        thread = self.registry.preload(["flan"])
+        # Ein gleichzeitiger Zugriff wartet auf das laufende Vorladen.
+        self.assertEqual(self.registry.get("flan"), {"model": 1})
+        thread.join()
+        self.assertEqual(loader.calls, 1)
+
+    def test_failed_load_is_retried(self):
+        loader = CountingLoader(fail_times=1)
+        self.registry.register("hubert", loader)
+        self.registry.preload(["hubert"], background=False)
+        self.assertFalse(self.registry.is_loaded("hubert"))
+        self.assertIsNotNone(self.registry.get_stats()['models']['hubert']['error'])
+        self.assertEqual(self.registry.get("hubert"), {"model": 2})
+
+    def test_unknown_key_and_unload(self):
+        with self.assertRaises(KeyError):
+            self.registry.get("unbekannt")
+        loader = CountingLoader()
+        self.registry.get("minilm", loader)
+        self.assertTrue(self.registry.unload("minilm"))
+        self.assertEqual(self.registry.get("minilm"), {"model": 2}, "Nach dem Entladen wird neu geladen.")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,127 @@
+# tests/test_scheduler.py
+import unittest
+import sys, os
+import threading
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from pag.scheduler import InferenceScheduler
+
+
+class FakePAG:
+    """Ein Platzhalter für das PAG_Model, der die empfangenen Batches protokolliert."""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.batches = []
+        self.streams = []
+
+    def infer_batch(self, prompts, temperatures, **options):
+        self.batches.append((list(zip(prompts, temperatures)), options))
+        time.sleep(self.delay)
+        return [f"{p}@{t}" for p, t in zip(prompts, temperatures)]
+
+    def infer_stream(self, prompt, temperature, **options):
+        self.streams.append((prompt, temperature, options))
+        for piece in (prompt, "@", str(temperature)):
+            yield piece
+
+
+class TestInferenceScheduler(unittest.TestCase):
+
+    def setUp(self):
+        self.pag = FakePAG(delay=0.01)
+
+    def test_single_request_resolves(self):
+        scheduler = InferenceScheduler(self.pag, max_batch_size=4, max_wait_ms=5)
+        self.assertEqual(scheduler.infer("hallo", 0.5), "hallo@0.5")
+        scheduler.shutdown()
+
+    def test_concurrent_requests_are_batched(self):
+        """Gleichzeitige Aufrufe sollen in einer gemeinsamen Generierung landen."""
+        scheduler = InferenceScheduler(self.pag, max_batch_size=8, max_wait_ms=100)
+        results = {}
+
+        def worker(i):
+            results[i] = scheduler.infer(f"prompt-{i}", 0.1 * (i + 1))
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(6)]
+        for t in threads: t.start()
+        for t in threads: t.join()
+        scheduler.shutdown()
+
+        for i in range(6):
+            self.assertEqual(results[i], f"prompt-{i}@{0.1 * (i + 1)}")
+        self.assertLess(len(self.pag.batches), 6)
+        stats = scheduler.get_stats()
+        self.assertEqual(stats['completed_requests'], 6)
+        self.assertEqual(sum(size * n for size, n in stats['batch_size_histogram'].items()), 6)
+        self.assertEqual(stats['queue_depth'], 0)
+        self.assertGreaterEqual(stats['wait_ms']['max'], stats['wait_ms']['p50'])
+
+    def test_max_batch_size_is_respected(self):
+        scheduler = InferenceScheduler(self.pag, max_batch_size=2, max_wait_ms=50)
+        outputs = scheduler.infer_batch([f"p{i}" for i in range(5)], [1.0] * 5)
+        scheduler.shutdown()
+        self.assertEqual(outputs, [f"p{i}@1.0" for i in range(5)])
+        self.assertTrue(all(len(batch) <= 2 for batch, _ in self.pag.batches))
+
+    def test_requests_with_different_options_are_not_mixed(self):
+        scheduler = InferenceScheduler(self.pag, max_batch_size=8, max_wait_ms=100)
+        futures = [scheduler.submit("a", 1.0), scheduler.submit("b", 1.0, layer_drop_rate=0.5),
+                   scheduler.submit("c", 1.0)]
+        self.assertEqual([f.result() for f in futures], ["a@1.0", "b@1.0", "c@1.0"])
+        scheduler.shutdown()
+        for batch, options in self.pag.batches:
+            prompts = [p for p, _ in batch]
+            if options:
+                self.assertEqual((prompts, options), (["b"], {'layer_drop_rate': 0.5}))
+            else:
+                self.assertNotIn("b", prompts)
+
+    def test_errors_are_forwarded_to_callers(self):
+        class BrokenPAG:
+            def infer_batch(self, prompts, temperatures):
+                raise RuntimeError("Modell defekt")
+
+        scheduler = InferenceScheduler(BrokenPAG(), max_wait_ms=1)
+        with self.assertRaises(RuntimeError):
+            scheduler.infer("hallo", 0.5)
+        scheduler.shutdown()
+        with self.assertRaises(RuntimeError):
+            scheduler.submit("zu spät", 0.5)
+
+    def test_shutdown_between_check_and_enqueue_still_answers(self):
+        scheduler = InferenceScheduler(self.pag, max_wait_ms=1)
+        put = scheduler._queue.put
+        stopper = threading.Thread(target=scheduler.shutdown)
+
+        def put_after_shutdown(request):
+            # Das Herunterfahren fällt genau zwischen die Prüfung und das Einreihen.
+            stopper.start()
+            stopper.join(0.3)
+            put(request)
+        scheduler._queue.put = put_after_shutdown
+        future = scheduler.submit("knapp", 1.0)
+        self.assertEqual(future.result(timeout=2), "knapp@1.0")
+        stopper.join()
+
+    def test_stream_is_passed_through_and_blocks_batches(self):
+        scheduler = InferenceScheduler(self.pag, max_batch_size=4, max_wait_ms=1)
+        cancel_event = threading.Event()
+        stream = scheduler.infer_stream("hallo", 0.5, cancel_event=cancel_event, max_new_tokens=8)
+        pieces = [next(stream)]
+        future = scheduler.submit("parallel", 1.0)
+        time.sleep(0.05)
+        self.assertFalse(future.done(), "Während des Streams darf kein Batch laufen.")
+        pieces += list(stream)
+
+        self.assertEqual("".join(pieces), "hallo@0.5")
+        self.assertEqual(self.pag.streams, [("hallo", 0.5, {'cancel_event': cancel_event, 'max_new_tokens': 8})])
+        self.assertEqual(future.result(timeout=1), "parallel@1.0")
+        scheduler.shutdown()
+
+
+if __name__ == '__main__':
+    unittest.main()